@@ -0,0 +1,222 @@
+# branch_predictor.py - Branch direction predictors and branch target buffer
+
+class DirectionPredictor:
+    """Base class: predicts whether a conditional branch at pc will be taken"""
+    name = "base"
+
+    def predict(self, pc, target):
+        return True
+
+    def update(self, pc, taken):
+        pass
+
+    def describe(self):
+        return self.name
+
+
+class StaticPredictor(DirectionPredictor):
+    """Fixed prediction: always taken, never taken, or backward-taken/forward-not-taken"""
+    MODES = ("taken", "not_taken", "btfn")
+
+    def __init__(self, mode="btfn"):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown static prediction mode: {mode}. Must be one of {list(self.MODES)}")
+        self.mode = mode
+        self.name = f"static-{mode}"
+
+    def predict(self, pc, target):
+        if self.mode == "btfn":
+            return target <= pc
+        return self.mode == "taken"
+
+
+def check_table_size(entries):
+    if not isinstance(entries, int) or entries <= 0 or entries & (entries - 1):
+        raise ValueError(f"Predictor table size must be a positive power of two: {entries}")
+
+
+class BimodalPredictor(DirectionPredictor):
+    """Table of 2-bit saturating counters indexed by the branch address"""
+    name = "bimodal"
+
+    def __init__(self, entries=512):
+        check_table_size(entries)
+        self.entries = entries
+        self.mask = entries - 1
+        self.counters = bytearray([1]) * entries  # Start weakly not-taken
+
+    def index(self, pc):
+        return (pc >> 2) & self.mask
+
+    def predict(self, pc, target):
+        return self.counters[self.index(pc)] >= 2
+
+    def update(self, pc, taken):
+        i = self.index(pc)
+        if taken:
+            if self.counters[i] < 3:
+                self.counters[i] += 1
+        elif self.counters[i] > 0:
+            self.counters[i] -= 1
+
+    def describe(self):
+        return f"{self.name}({self.entries})"
+
+
+class GSharePredictor(BimodalPredictor):
+    """2-bit counters indexed by the branch address XOR the global history of outcomes"""
+    name = "gshare"
+
+    def __init__(self, entries=1024, history_bits=8):
+        super().__init__(entries)
+        if history_bits < 0:
+            raise ValueError(f"History length must be non-negative: {history_bits}")
+        self.history_bits = history_bits
+        self.history = 0
+
+    def index(self, pc):
+        return ((pc >> 2) ^ self.history) & self.mask
+
+    def update(self, pc, taken):
+        super().update(pc, taken)
+        self.history = ((self.history << 1) | int(taken)) & ((1 << self.history_bits) - 1)
+
+    def describe(self):
+        return f"{self.name}({self.entries},h{self.history_bits})"
+
+
+class BranchTargetBuffer:
+    """Direct-mapped table of taken-branch targets; a miss means the fetch redirect comes late"""
+
+    def __init__(self, entries=64):
+        check_table_size(entries)
+        self.entries = entries
+        self.mask = entries - 1
+        self.tags = [-1] * entries
+        self.targets = [0] * entries
+
+    def lookup(self, pc):
+        """Return the predicted target for pc, or None"""
+        i = (pc >> 2) & self.mask
+        return self.targets[i] if self.tags[i] == pc else None
+
+    def insert(self, pc, target):
+        i = (pc >> 2) & self.mask
+        self.tags[i] = pc
+        self.targets[i] = target
+
+
+PREDICTORS = {
+    'static': StaticPredictor,
+    'bimodal': BimodalPredictor,
+    'gshare': GSharePredictor,
+}
+
+
+class BranchUnit:
+    """Front-end branch prediction: a direction predictor for conditional branches plus a BTB.
+
+    Charges timing.branch_penalty for every wrong direction or target and
+    timing.btb_miss_penalty when a taken branch is predicted correctly but its
+    target is not in the BTB. Without a BTB target misses are not modelled, so
+    correctly predicted taken branches cost nothing extra.
+    """
+
+    def __init__(self, predictor, btb=None):
+        self.predictor = predictor
+        self.btb = btb
+        self.timing = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.branches = 0
+        self.conditional = 0
+        self.taken = 0
+        self.mispredictions = 0
+        self.btb_hits = 0
+        self.btb_misses = 0
+        self.predicated = 0
+        self.predicated_skipped = 0
+        self.penalty_cycles = 0
+
+    def set_timing(self, timing):
+        self.timing = timing
+
+    def observe_branch(self, pc, conditional, taken, target):
+        """Record one branch, predicting it before learning the outcome, returns the penalty cycles"""
+        self.branches += 1
+        if taken:
+            self.taken += 1
+
+        predicted_taken = True
+        if conditional:
+            self.conditional += 1
+            predicted_taken = self.predictor.predict(pc, target)
+            self.predictor.update(pc, taken)
+
+        predicted_target = None
+        if self.btb is not None:
+            predicted_target = self.btb.lookup(pc)
+            if predicted_target is not None:
+                self.btb_hits += 1
+            else:
+                self.btb_misses += 1
+            if taken:
+                self.btb.insert(pc, target)
+
+        penalty = 0
+        if predicted_taken != taken or (taken and predicted_target is not None and predicted_target != target):
+            self.mispredictions += 1
+            penalty = self.timing.branch_penalty
+        elif taken and self.btb is not None and predicted_target is None:
+            # Right direction, but the target is only known once the branch is decoded
+            penalty = self.timing.btb_miss_penalty
+        self.penalty_cycles += penalty
+        return penalty
+
+    def observe_predicated(self, executed):
+        """Record a conditional non-branch instruction (resolved in execute, never predicted)"""
+        self.predicated += 1
+        if not executed:
+            self.predicated_skipped += 1
+
+    def describe(self):
+        desc = self.predictor.describe()
+        if self.btb is not None:
+            desc += f"+btb({self.btb.entries})"
+        return desc
+
+    def get_stats(self, instruction_count):
+        correct = self.branches - self.mispredictions
+        return {
+            'predictor': self.describe(),
+            'branches': self.branches,
+            'conditional_branches': self.conditional,
+            'taken': self.taken,
+            'mispredictions': self.mispredictions,
+            'accuracy': correct / self.branches if self.branches > 0 else 0,
+            'mpki': 1000 * self.mispredictions / instruction_count if instruction_count > 0 else 0,
+            'btb_hits': self.btb_hits,
+            'btb_misses': self.btb_misses,
+            'predicated': self.predicated,
+            'predicated_skipped': self.predicated_skipped,
+            'penalty_cycles': self.penalty_cycles
+        }
+
+
+def make_branch_unit(spec):
+    """Create a branch unit from a name or a dict like {"type": "gshare", "entries": 1024, "btb_entries": 64}
+
+    btb_entries of 0 disables the BTB. Returns None when spec is None (no branch modelling).
+    """
+    if spec is None:
+        return None
+    if isinstance(spec, str):
+        spec = {'type': spec}
+    params = dict(spec)
+    kind = params.pop('type', None)
+    if kind not in PREDICTORS:
+        raise ValueError(f"Unknown branch predictor: {kind}. Must be one of {sorted(PREDICTORS)}")
+    btb_entries = params.pop('btb_entries', 64)
+    btb = BranchTargetBuffer(btb_entries) if btb_entries else None
+    return BranchUnit(PREDICTORS[kind](**params), btb)
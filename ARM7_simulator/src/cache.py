@@ -1,7 +1,9 @@
 # cache.py - Fixed version with improved error handling and bounds checking
 
 import math
+from collections import OrderedDict
 from memory import read_word as mem_read_word, write_word as mem_write_word
+from replacement import make_replacement_policy
 
 class CacheBlock:
     def __init__(self, block_size_words):
@@ -9,10 +11,40 @@ class CacheBlock:
         self.dirty = False
         self.tag = 0
         self.data = [0] * max(1, block_size_words)  # Ensure at least 1 word
-        self.lru_counter = 0
+        self.prefetched = False  # Brought in by a prefetch and not yet used by a demand access
+        self.prefetch_time = 0
+
+
+class BlockBitmap:
+    """Set of referenced blocks kept as one bit per block, in pages allocated on first touch.
+
+    Memory grows with the address range touched rather than with the length of the
+    access stream, and never exceeds one bit per block of the 32-bit address space.
+    """
+    PAGE_BITS = 15  # Blocks per page as a power of two (a 4KB bytearray)
+
+    def __init__(self, offset_bits):
+        self.offset_bits = offset_bits
+        self.pages = {}
+
+    def add(self, address):
+        """Mark the block holding address as seen, returns whether it had been seen before"""
+        block = (address & 0xFFFFFFFF) >> self.offset_bits
+        page = self.pages.get(block >> self.PAGE_BITS)
+        if page is None:
+            page = self.pages[block >> self.PAGE_BITS] = bytearray(1 << (self.PAGE_BITS - 3))
+        byte = (block >> 3) & ((1 << (self.PAGE_BITS - 3)) - 1)
+        mask = 1 << (block & 7)
+        seen = page[byte] & mask
+        page[byte] |= mask
+        return seen != 0
+
+WRITE_POLICIES = ("write_back", "write_through")
+INCLUSION_POLICIES = ("non_inclusive", "inclusive", "exclusive")
 
 class Cache:
-    def __init__(self, cache_size, block_size, associativity, write_policy="write_back", next_level=None):
+    def __init__(self, cache_size, block_size, associativity, write_policy="write_back", next_level=None,
+                 replacement="lru", seed=0, write_allocate=True, write_buffer=None, inclusion="non_inclusive"):
         # Validate inputs
         if cache_size <= 0 or block_size <= 0 or associativity <= 0:
             raise ValueError(f"Cache parameters must be positive: cache_size={cache_size}, block_size={block_size}, associativity={associativity}")
@@ -20,12 +52,27 @@ class Cache:
             raise ValueError(f"Cache size ({cache_size}) must be divisible by block size ({block_size})")
         if block_size % 4 != 0:
             raise ValueError(f"Block size ({block_size}) must be divisible by 4 (word size)")
+        if write_policy not in WRITE_POLICIES:
+            raise ValueError(f"Invalid write policy: {write_policy}. Must be one of {WRITE_POLICIES}")
+        if inclusion not in INCLUSION_POLICIES:
+            raise ValueError(f"Invalid inclusion policy: {inclusion}. Must be one of {INCLUSION_POLICIES}")
         
         self.cache_size = cache_size
         self.block_size = block_size
         self.associativity = associativity
         self.write_policy = write_policy
+        self.write_allocate = write_allocate  # Allocate a block on a write miss
+        self.write_buffer = write_buffer  # Optional WriteBuffer in front of the next level
+        if write_buffer is not None:
+            write_buffer.owner = self
         self.next_level = next_level  # Next level cache or main memory
+        self.upper = []  # Caches whose misses this one serves (filled in by the hierarchy)
+        self.inclusion = inclusion  # Relation of this cache's contents to the caches above it
+        self.level = 1  # Position in the hierarchy (1 = closest to the core)
+        self.timing = None  # Optional TimingModel used to charge cycles
+        self.hit_latency = 0
+        self.prefetcher = None  # Optional Prefetcher watching demand accesses
+        self.dram = None  # Optional DRAM timing model, used only when this cache is the last level
         
         # Calculate cache parameters
         self.num_blocks = cache_size // block_size
@@ -52,11 +99,14 @@ class Cache:
             for _ in range(associativity):
                 set_blocks.append(CacheBlock(words_per_block))
             self.blocks.append(set_blocks)
+
+        # Replacement state lives in a policy object chosen per cache
+        self.replacement = make_replacement_policy(replacement, self.num_sets, associativity, seed)
         
         # Initialize statistics
         self.reset_stats()
         
-        print(f"Cache initialized: {cache_size}B, {block_size}B blocks, {associativity}-way, {self.num_sets} sets")
+        print(f"Cache initialized: {cache_size}B, {block_size}B blocks, {associativity}-way, {self.num_sets} sets, {replacement.upper()} replacement")
 
     def reset_stats(self):
         """Reset all statistics counters"""
@@ -64,7 +114,66 @@ class Cache:
         self.misses = 0
         self.writebacks = 0
         self.access_count = 0
-        self.lru_counter = 0  # Global counter for LRU
+        self.cycles = 0  # Cycles charged by the timing model at this level
+        self.write_traffic = 0  # Words written to the next level (writebacks and write-through)
+        self.background_cycles = 0  # Cycles spent off the critical path (prefetches, buffer drains)
+        self.prefetches_issued = 0
+        self.prefetches_useful = 0
+        self.prefetches_late = 0
+        self.prefetches_polluting = 0
+        self.prefetches_useless = 0
+        self.prefetch_evicted = OrderedDict()  # Block addresses pushed out by prefetch fills, most recent num_blocks
+        self.back_invalidations = 0  # Lines above dropped because this (inclusive) cache evicted them
+        self.victim_fills = 0  # Blocks evicted above and moved into this (exclusive) cache
+        # Three-C miss classification
+        self.compulsory_misses = 0
+        self.capacity_misses = 0
+        self.conflict_misses = 0
+        self.seen_blocks = BlockBitmap(self.offset_bits)  # Every block a demand access has referenced
+        self.shadow = OrderedDict()  # Fully-associative LRU cache of equal capacity (block address -> None)
+        if self.write_buffer is not None:
+            self.write_buffer.reset_stats()
+
+    def set_timing(self, timing, level):
+        """Attach a timing model and record this cache's level in the hierarchy"""
+        self.timing = timing
+        self.level = level
+        self.hit_latency = timing.hit_latency(level) if timing else 0
+
+    def attach_prefetcher(self, prefetcher):
+        """Attach a prefetcher that is trained on this cache's demand accesses"""
+        self.prefetcher = prefetcher
+        if prefetcher is not None:
+            prefetcher.attach(self)
+
+    def chain_cycles(self):
+        """Cycles charged at this level and every level below it"""
+        cycles = self.cycles
+        if self.next_level is not None:
+            cycles += self.next_level.chain_cycles()
+        return cycles
+
+    def charge_miss(self, address):
+        """Charge the refill penalty for a miss at this level"""
+        if self.timing is None:
+            return
+        if self.next_level is None and self.dram is not None:
+            # The row buffer decides the access time, the bus still moves the whole block
+            self.cycles += self.dram.access(address) + self.timing.transfer_cycles(self.block_size)
+        elif self.next_level is None:
+            self.cycles += self.timing.memory_penalty(self.block_size)
+        else:
+            # Next level charges its own lookups; we pay for moving the block
+            self.cycles += self.timing.transfer_cycles(self.block_size)
+
+    def charge_writeback(self, address):
+        """Charge the cost of evicting a dirty block"""
+        if self.timing is None:
+            return
+        if self.next_level is None and self.dram is not None:
+            self.cycles += self.timing.writeback_penalty(self.block_size, False) + self.dram.access(address, write=True)
+        else:
+            self.cycles += self.timing.writeback_penalty(self.block_size, self.next_level is None)
 
     def get_cache_info(self, address):
         """Extract tag, index, and word offset from address"""
@@ -107,28 +216,51 @@ class Cache:
                 return i
         return -1
 
-    def find_lru_block(self, index):
-        """Find the LRU block in the set"""
-        if index >= len(self.blocks) or len(self.blocks[index]) == 0:
-            return 0
-            
-        lru_block = 0
-        min_counter = self.blocks[index][0].lru_counter
-        
+    def peek(self, address):
+        """Return the newest copy of the word held at this level (cache or write buffer), or None.
+
+        Does not touch statistics, replacement state or timing.
+        """
+        address &= 0xFFFFFFFF
+        block_address = address & ~(self.block_size - 1)
+        tag = address >> (self.offset_bits + self.index_bits)
+        index = (address >> self.offset_bits) & ((1 << self.index_bits) - 1)
+        block_idx = self.find_block(tag, index)
+        if block_idx != -1:
+            return self.blocks[index][block_idx].data[(address & (self.block_size - 1)) // 4]
+        if self.write_buffer is not None and block_address in self.write_buffer.entries:
+            return self.write_buffer.entries[block_address].get(address & ~3)
+        return None
+
+    def find_victim(self, index):
+        """Pick the block to replace: an invalid block if there is one, otherwise ask the policy"""
         for i, block in enumerate(self.blocks[index]):
-            if block.lru_counter < min_counter:
-                min_counter = block.lru_counter
-                lru_block = i
-        return lru_block
-
-    def update_lru(self, index, block_idx):
-        """Update LRU counters"""
-        if index < len(self.blocks) and block_idx < len(self.blocks[index]):
-            self.lru_counter += 1
-            self.blocks[index][block_idx].lru_counter = self.lru_counter
-
-    def load_block_from_next_level(self, address, block):
-        """Load a block from next level cache or main memory"""
+            if not block.valid:
+                return i
+        return self.replacement.victim(index)
+
+    def holds(self, address):
+        """Whether the block containing address is valid here, without side effects"""
+        address &= 0xFFFFFFFF
+        tag = address >> (self.offset_bits + self.index_bits)
+        index = (address >> self.offset_bits) & ((1 << self.index_bits) - 1)
+        return self.find_block(tag, index) != -1
+
+    def line_of(self, address):
+        """(set index, way, tag, block) of the valid block containing address, or None, without side effects"""
+        address &= 0xFFFFFFFF
+        tag = address >> (self.offset_bits + self.index_bits)
+        index = (address >> self.offset_bits) & ((1 << self.index_bits) - 1)
+        way = self.find_block(tag, index)
+        if way == -1:
+            return None
+        return index, way, tag, self.blocks[index][way]
+
+    def load_block_from_next_level(self, address, block, demand=True):
+        """Load a block from next level cache or main memory, returns True if it arrives dirty.
+
+        Fills that are not demand misses (prefetches) leave the next level's demand statistics alone.
+        """
         # Align address to block boundary
         if self.offset_bits > 0:
             block_address = address & ~((1 << self.offset_bits) - 1)
@@ -141,18 +273,23 @@ class Cache:
         if len(block.data) < words_per_block:
             block.data = [0] * words_per_block
         
-        if self.next_level:
-            # Load from next level cache
-            for i in range(words_per_block):
+        if self.next_level and self.next_level.inclusion == "exclusive":
+            # The block moves up out of an exclusive level, together with its dirty state
+            return self.next_level.take_block(block_address, block.data, demand)
+        elif self.next_level:
+            # Load from next level cache, one lookup per next-level block the refill covers
+            step = min(words_per_block, max(1, self.next_level.block_size // 4))
+            for i in range(0, words_per_block, step):
                 word_addr = block_address + (i * 4)
                 try:
-                    block.data[i] = self.next_level.read(word_addr)
+                    block.data[i:i + step] = self.next_level.read_block(word_addr, step, demand)
                 except Exception as e:
                     # If next level fails, try main memory
-                    try:
-                        block.data[i] = mem_read_word(word_addr)
-                    except:
-                        block.data[i] = 0  # Default value on error
+                    for j in range(i, i + step):
+                        try:
+                            block.data[j] = mem_read_word(block_address + (j * 4))
+                        except:
+                            block.data[j] = 0  # Default value on error
         else:
             # Load from main memory
             for i in range(words_per_block):
@@ -162,6 +299,28 @@ class Cache:
                 except:
                     block.data[i] = 0  # Default value on error
 
+    def write_word_to_next_level(self, address, data):
+        """Write a single word straight to the next level cache or main memory"""
+        self.write_traffic += 1
+        if self.next_level:
+            try:
+                self.next_level.write(address, data)
+                return
+            except Exception as e:
+                pass  # If next level fails, write to main memory
+        try:
+            mem_write_word(address, data)
+        except:
+            pass  # Ignore write errors
+
+    def forward_write(self, address, data):
+        """Send a word to the next level, through the write buffer if one is attached"""
+        if self.write_buffer is not None:
+            # A full buffer stalls the core, but the drained write is charged where it lands (the next level)
+            self.write_buffer.add(address, data)
+        else:
+            self.write_word_to_next_level(address, data)
+
     def write_block_to_next_level(self, address, block):
         """Write a block to next level cache or main memory"""
         # Align address to block boundary
@@ -172,78 +331,346 @@ class Cache:
         
         words_per_block = min(len(block.data), self.block_size // 4)
         
-        if self.next_level:
-            # Write to next level cache
-            for i in range(words_per_block):
-                word_addr = block_address + (i * 4)
-                try:
-                    self.next_level.write(word_addr, block.data[i])
-                except Exception as e:
-                    # If next level fails, write to main memory
-                    try:
-                        mem_write_word(word_addr, block.data[i])
-                    except:
-                        pass  # Ignore write errors
+        for i in range(words_per_block):
+            self.forward_write(block_address + (i * 4), block.data[i])
+
+    def block_address_of(self, tag, index):
+        return (tag << (self.offset_bits + self.index_bits)) | (index << self.offset_bits)
+
+    def evict(self, index, victim_idx, prefetch=False):
+        """Empty one way of a set, writing its block back if dirty (or moving it down to an exclusive level)"""
+        block = self.blocks[index][victim_idx]
+        if not block.valid:
+            return block
+        old_address = self.block_address_of(block.tag, index)
+        if block.prefetched:
+            self.prefetches_useless += 1
+        if prefetch:
+            self.prefetch_evicted[old_address] = None
+            if len(self.prefetch_evicted) > self.num_blocks:
+                # A block evicted a whole cache's worth of prefetch fills ago would have gone anyway
+                self.prefetch_evicted.popitem(last=False)
+        if self.inclusion == "inclusive":
+            self.back_invalidate(old_address, block)
+
+        if self.next_level is not None and self.next_level.inclusion == "exclusive":
+            # Clean victims move down too: an exclusive level is only ever filled this way
+            self.next_level.insert_victim(old_address, block.data, block.dirty)
+            if block.dirty:
+                self.writebacks += 1
+                self.charge_writeback(old_address)
+            elif self.timing is not None:
+                self.cycles += self.timing.transfer_cycles(self.block_size)
+        elif block.dirty:
+            self.write_block_to_next_level(old_address, block)
+            self.writebacks += 1
+            self.charge_writeback(old_address)
+        block.valid = False
+        block.dirty = False
+        return block
+
+    def back_invalidate(self, block_address, block):
+        """Inclusion: drop every copy of an evicted block above, folding their dirty words into it"""
+        for upper in self.upper:
+            lines, dirty = upper.invalidate_range(block_address, self.block_size)
+            self.back_invalidations += lines
+            for address, value in dirty.items():
+                block.data[(address - block_address) // 4] = value
+                block.dirty = True
+
+    def invalidate_range(self, start, size):
+        """Invalidate the blocks overlapping [start, start + size) here and in the caches above.
+
+        Returns (lines invalidated here, {word address: value} of the dirty words they held),
+        where words from further up override this cache's older copies.
+        """
+        lines = 0
+        dirty = {}
+        for address in range(start & ~(self.block_size - 1), start + size, self.block_size):
+            tag = address >> (self.offset_bits + self.index_bits)
+            index = (address >> self.offset_bits) & ((1 << self.index_bits) - 1)
+            block_idx = self.find_block(tag, index)
+            if block_idx == -1:
+                continue
+            block = self.blocks[index][block_idx]
+            if block.dirty:
+                for i, value in enumerate(block.data):
+                    if start <= address + 4 * i < start + size:
+                        dirty[address + 4 * i] = value
+            block.valid = False
+            block.dirty = False
+            block.prefetched = False
+            lines += 1
+        for upper in self.upper:
+            dirty.update(upper.invalidate_range(start, size)[1])
+        return lines, dirty
+
+    def take_block(self, block_address, data, demand=True):
+        """Exclusion: hand a whole block to the cache above and drop it here, returns True if it was dirty
+
+        Counted like the single lookup of a non-exclusive fill (read_block), so the policies
+        compare directly; a miss refills from the next level without allocating here.
+        """
+        words = len(data)
+        self.access_count += 1
+        self.cycles += self.hit_latency
+        if self.write_buffer is not None:
+            self.write_buffer.tick()
+        tag, index, _ = self.get_cache_info(block_address)
+        block_idx = self.find_block(tag, index)
+        if demand:
+            self.classify_access(block_address, block_idx != -1)
+
+        if block_idx != -1:
+            block = self.blocks[index][block_idx]
+            data[:] = block.data[:words]
+            dirty = block.dirty
+            if demand:
+                self.hits += 1
+                if self.prefetcher is not None:
+                    self.note_demand_hit(block)
+            block.valid = False
+            block.dirty = False
         else:
-            # Write to main memory
-            for i in range(words_per_block):
-                word_addr = block_address + (i * 4)
-                try:
-                    mem_write_word(word_addr, block.data[i])
-                except:
-                    pass  # Ignore write errors
+            self.charge_miss(block_address)
+            if demand:
+                self.misses += 1
+                if self.prefetcher is not None:
+                    self.note_demand_miss(block_address)
+            if self.write_buffer is not None:
+                self.write_buffer.drain_block(block_address)
+            refill = CacheBlock(words)
+            dirty = bool(self.load_block_from_next_level(block_address, refill, demand))
+            data[:] = refill.data
+        if self.prefetcher is not None and demand:
+            self.run_prefetcher(block_address, None, block_idx != -1)
+        return dirty
 
-    def read(self, address):
-        """Read data from cache"""
+    def insert_victim(self, block_address, data, dirty):
+        """Exclusion: keep a block evicted from a cache above"""
+        self.victim_fills += 1
+        tag, index, _ = self.get_cache_info(block_address)
+        block_idx = self.find_block(tag, index)
+        if block_idx != -1:
+            # Another cache above held a copy too; a clean copy is never newer than this one
+            block = self.blocks[index][block_idx]
+            if dirty:
+                block.data[:] = data
+                block.dirty = True
+            self.replacement.touch(index, block_idx)
+            return
+        victim_idx = self.find_victim(index)
+        block = self.evict(index, victim_idx)
+        block.data[:] = data
+        block.valid = True
+        block.dirty = dirty
+        block.tag = tag
+        block.prefetched = False
+        self.replacement.fill(index, victim_idx)
+
+    def allocate_block(self, address, tag, index, prefetch=False, demand=True):
+        """Evict a victim from the set (writing it back if dirty) and fill it with the block at address.
+
+        prefetch marks a fill this cache's prefetcher asked for; demand=False is a fill on
+        behalf of a prefetch further up. Neither counts as a demand access below.
+        """
+        victim_idx = self.find_victim(index)
+        block = self.evict(index, victim_idx, prefetch)
+        
+        # Pending buffered writes to this block must reach the next level before we read it
+        if self.write_buffer is not None:
+            self.write_buffer.drain_block(address)
+        
+        # Load new block from next level
+        dirty = self.load_block_from_next_level(address, block, demand and not prefetch)
+        block.valid = True
+        block.dirty = bool(dirty)
+        block.tag = tag
+        block.prefetched = prefetch
+        block.prefetch_time = self.access_count
+        self.replacement.fill(index, victim_idx)
+        return block
+
+    def note_demand_hit(self, block):
+        """Credit a prefetch the first time a demand access uses the block it brought in"""
+        if block.prefetched:
+            block.prefetched = False
+            self.prefetches_useful += 1
+            if self.access_count - block.prefetch_time <= self.prefetcher.late_window:
+                self.prefetches_late += 1
+
+    def note_demand_miss(self, address):
+        """Count misses to blocks that a prefetch evicted"""
+        block_address = address & ~(self.block_size - 1)
+        if block_address in self.prefetch_evicted:
+            del self.prefetch_evicted[block_address]
+            self.prefetches_polluting += 1
+
+    def classify_access(self, address, hit):
+        """Replay a demand access in the shadow cache and classify it if it missed in the real one.
+
+        Compulsory: first reference to the block. Conflict: the fully-associative
+        shadow would have hit. Capacity: even the shadow missed.
+        """
+        block_address = address & ~(self.block_size - 1)
+        shadow_hit = block_address in self.shadow
+        if shadow_hit:
+            self.shadow.move_to_end(block_address)
+        else:
+            self.shadow[block_address] = None
+            if len(self.shadow) > self.num_blocks:
+                self.shadow.popitem(last=False)
+        seen = self.seen_blocks.add(block_address)
+        if not hit:
+            if not seen:
+                self.compulsory_misses += 1
+            elif shadow_hit:
+                self.conflict_misses += 1
+            else:
+                self.capacity_misses += 1
+
+    def prefetch(self, address):
+        """Bring a block in ahead of demand without touching demand statistics here or below"""
+        address &= 0xFFFFFFFF
+        tag, index, _ = self.get_cache_info(address)
+        if self.find_block(tag, index) != -1:
+            return
+        self.prefetches_issued += 1
+        # Prefetch fills happen in the background and do not stall the core
+        before = self.chain_cycles()
+        self.allocate_block(address, tag, index, prefetch=True)
+        self.background_cycles += self.chain_cycles() - before
+
+    def run_prefetcher(self, address, pc, hit):
+        for prefetch_address in self.prefetcher.observe(address, pc, hit):
+            self.prefetch(prefetch_address)
+
+    def read(self, address, pc=None):
+        """Read data from cache (pc is the address of the instruction making the access, if known)"""
         self.access_count += 1
+        self.cycles += self.hit_latency
+        if self.write_buffer is not None:
+            self.write_buffer.tick()
         tag, index, word_offset = self.get_cache_info(address)
         
         # Bounds checking
         if index >= len(self.blocks) or word_offset >= len(self.blocks[index][0].data):
             # Fallback to main memory for invalid cache access
             self.misses += 1
+            self.classify_access(address, False)
+            if self.timing is not None:
+                self.cycles += self.timing.memory_penalty(4)
             try:
                 return mem_read_word(address)
             except:
                 return 0
         
         block_idx = self.find_block(tag, index)
+        self.classify_access(address, block_idx != -1)
         
         if block_idx != -1:  # Cache hit
             self.hits += 1
             block = self.blocks[index][block_idx]
-            self.update_lru(index, block_idx)
-            return block.data[word_offset]
+            self.replacement.touch(index, block_idx)
+            if self.prefetcher is not None:
+                self.note_demand_hit(block)
         else:  # Cache miss
             self.misses += 1
-            # Find LRU block to replace
-            lru_idx = self.find_lru_block(index)
-            block = self.blocks[index][lru_idx]
-            
-            # Write back if dirty
-            if block.valid and block.dirty:
-                old_address = (block.tag << (self.offset_bits + self.index_bits)) | (index << self.offset_bits)
-                self.write_block_to_next_level(old_address, block)
-                self.writebacks += 1
-            
-            # Load new block from next level
-            self.load_block_from_next_level(address, block)
-            block.valid = True
-            block.dirty = False
-            block.tag = tag
-            self.update_lru(index, lru_idx)
-            
-            return block.data[word_offset]
+            self.charge_miss(address)
+            if self.prefetcher is not None:
+                self.note_demand_miss(address)
+            block = self.allocate_block(address, tag, index)
+        
+        data = block.data[word_offset]
+        if self.prefetcher is not None:
+            self.run_prefetcher(address, pc, block_idx != -1)
+        return data
+
+    def read_block(self, address, words, demand=True):
+        """Serve a refill of the cache above: words consecutive words from address, all in one block here.
+
+        The refill is a single lookup, counted and charged as one access; the cache
+        above pays for moving the block. A refill for a prefetch above (demand=False)
+        still costs cycles but is not a demand hit or miss and does not train prefetchers.
+        """
+        self.access_count += 1
+        self.cycles += self.hit_latency
+        if self.write_buffer is not None:
+            self.write_buffer.tick()
+        tag, index, word_offset = self.get_cache_info(address)
+        block_idx = self.find_block(tag, index)
+        if not demand:
+            if block_idx != -1:
+                block = self.blocks[index][block_idx]
+            else:
+                self.charge_miss(address)
+                block = self.allocate_block(address, tag, index, demand=False)
+            return block.data[word_offset:word_offset + words]
+        self.classify_access(address, block_idx != -1)
+
+        if block_idx != -1:
+            self.hits += 1
+            block = self.blocks[index][block_idx]
+            self.replacement.touch(index, block_idx)
+            if self.prefetcher is not None:
+                self.note_demand_hit(block)
+        else:
+            self.misses += 1
+            self.charge_miss(address)
+            if self.prefetcher is not None:
+                self.note_demand_miss(address)
+            block = self.allocate_block(address, tag, index)
+
+        data = block.data[word_offset:word_offset + words]
+        if self.prefetcher is not None:
+            self.run_prefetcher(address, None, block_idx != -1)
+        return data
 
-    def write(self, address, data):
-        """Write data to cache"""
+    def read_line(self, line, address, pc=None):
+        """Read hit on a line found earlier by line_of, skipping the address decode and tag search.
+
+        The caller must check the line still holds address. Statistics, replacement,
+        timing and prefetching are updated exactly as for a hit through read().
+        """
+        index, way, _, block = line
         self.access_count += 1
+        self.cycles += self.hit_latency
+        if self.write_buffer is not None:
+            self.write_buffer.tick()
+        self.classify_access(address, True)
+        self.hits += 1
+        self.replacement.touch(index, way)
+        data = block.data[(address & (self.block_size - 1)) >> 2]
+        if self.prefetcher is not None:
+            self.note_demand_hit(block)
+            self.run_prefetcher(address, pc, True)
+        return data
+
+    def note_line_hits(self, count):
+        """Count hits served from the hierarchy's line buffer since it was filled by read_line.
+
+        Nothing else accessed this cache in between, so the replacement and 3C state
+        are already what count more hits on the same line would leave.
+        """
+        self.access_count += count
+        self.hits += count
+        self.cycles += count * self.hit_latency
+
+    def write(self, address, data, pc=None):
+        """Write data to cache, honoring the write-hit (back/through) and write-miss (allocate or not) policies"""
+        self.access_count += 1
+        self.cycles += self.hit_latency
+        if self.write_buffer is not None:
+            self.write_buffer.tick()
         tag, index, word_offset = self.get_cache_info(address)
         
         # Bounds checking
         if index >= len(self.blocks) or word_offset >= len(self.blocks[index][0].data):
             # Fallback to main memory for invalid cache access
             self.misses += 1
+            self.classify_access(address, False)
+            if self.timing is not None:
+                self.cycles += self.timing.memory_penalty(4)
             try:
                 mem_write_word(address, data)
             except:
@@ -251,42 +678,98 @@ class Cache:
             return
         
         block_idx = self.find_block(tag, index)
+        self.classify_access(address, block_idx != -1)
         
         if block_idx != -1:  # Cache hit
             self.hits += 1
             block = self.blocks[index][block_idx]
-            block.data[word_offset] = data
-            block.dirty = True
-            self.update_lru(index, block_idx)
+            self.replacement.touch(index, block_idx)
+            if self.prefetcher is not None:
+                self.note_demand_hit(block)
         else:  # Cache miss
             self.misses += 1
-            # Find LRU block to replace
-            lru_idx = self.find_lru_block(index)
-            block = self.blocks[index][lru_idx]
-            
-            # Write back if dirty
-            if block.valid and block.dirty:
-                old_address = (block.tag << (self.offset_bits + self.index_bits)) | (index << self.offset_bits)
-                self.write_block_to_next_level(old_address, block)
-                self.writebacks += 1
-            
-            # Load new block from next level (write-allocate policy)
-            self.load_block_from_next_level(address, block)
-            block.valid = True
-            block.tag = tag
-            block.data[word_offset] = data
+            if self.prefetcher is not None:
+                self.note_demand_miss(address)
+            if not self.write_allocate or self.inclusion == "exclusive":
+                # No-write-allocate: send the word on without bringing the block in
+                # (an exclusive level only takes blocks evicted from above)
+                self.forward_write(address, data)
+                if self.prefetcher is not None:
+                    self.run_prefetcher(address, pc, False)
+                return
+            self.charge_miss(address)
+            block = self.allocate_block(address, tag, index)
+
+        block.data[word_offset] = data
+        if self.write_policy == "write_through":
+            self.forward_write(address, data)
+        else:
             block.dirty = True
-            self.update_lru(index, lru_idx)
+        # Only once the miss is handled, so a prefetch never refills the block being written
+        if self.prefetcher is not None:
+            self.run_prefetcher(address, pc, block_idx != -1)
+
+    def occupancy(self):
+        """Bytes held in valid blocks"""
+        return sum(block.valid for set_blocks in self.blocks for block in set_blocks) * self.block_size
+
+    def duplicated_bytes(self):
+        """Bytes held here that a cache above also holds"""
+        duplicated = {}  # start address -> bytes, so a chunk held in two caches above counts once
+        for upper in self.upper:
+            for index, set_blocks in enumerate(upper.blocks):
+                for block in set_blocks:
+                    if not block.valid:
+                        continue
+                    address = upper.block_address_of(block.tag, index)
+                    if upper.block_size <= self.block_size:
+                        if self.holds(address):
+                            duplicated[address] = max(duplicated.get(address, 0), upper.block_size)
+                    else:
+                        for sub in range(address, address + upper.block_size, self.block_size):
+                            if self.holds(sub):
+                                duplicated[sub] = max(duplicated.get(sub, 0), self.block_size)
+        return sum(duplicated.values())
 
     def get_stats(self):
         """Return cache statistics"""
         total_accesses = self.hits + self.misses
         hit_rate = self.hits / total_accesses if total_accesses > 0 else 0
         
-        return {
+        stats = {
             'hits': self.hits,
             'misses': self.misses,
             'writebacks': self.writebacks,
             'access_count': self.access_count,
-            'hit_rate': hit_rate
-        }
\ No newline at end of file
+            'cycles': self.cycles,
+            'write_traffic': self.write_traffic,
+            'buffer_stalls': 0,
+            'hit_rate': hit_rate,
+            'compulsory_misses': self.compulsory_misses,
+            'capacity_misses': self.capacity_misses,
+            'conflict_misses': self.conflict_misses,
+            'inclusion': self.inclusion,
+            'back_invalidations': self.back_invalidations,
+            'victim_fills': self.victim_fills
+        }
+        if self.upper:
+            # Capacity that holds blocks the caches above do not already have
+            occupancy = self.occupancy()
+            stats['occupancy'] = occupancy
+            stats['effective_capacity'] = occupancy - self.duplicated_bytes()
+        if self.write_buffer is not None:
+            buffer_stats = self.write_buffer.get_stats()
+            stats['buffer_stalls'] = buffer_stats['stalls']
+            stats['write_buffer'] = buffer_stats
+        stats['background_cycles'] = self.background_cycles
+        if self.prefetcher is not None:
+            stats['prefetch'] = {
+                'prefetcher': self.prefetcher.describe(),
+                'issued': self.prefetches_issued,
+                'useful': self.prefetches_useful,
+                'late': self.prefetches_late,
+                'polluting': self.prefetches_polluting,
+                'useless': self.prefetches_useless,
+                'accuracy': self.prefetches_useful / self.prefetches_issued if self.prefetches_issued > 0 else 0
+            }
+        return stats
@@ -0,0 +1,149 @@
+# coherence.py - MESI snooping coherence for private data caches over a shared bus
+
+from cache import Cache
+
+MODIFIED = 'M'
+EXCLUSIVE = 'E'
+SHARED = 'S'
+INVALID = 'I'
+
+
+class SnoopBus:
+    """Broadcast bus connecting the private data caches; every request is snooped by the others"""
+
+    def __init__(self):
+        self.caches = []
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.bus_reads = 0             # BusRd: read miss
+        self.bus_read_exclusive = 0    # BusRdX: write miss
+        self.upgrades = 0              # BusUpgr: write hit on a shared block
+        self.invalidations = 0         # Copies invalidated in other caches
+        self.interventions = 0         # Modified blocks flushed to the shared level on a snoop
+
+    def attach(self, cache):
+        cache.bus = self
+        self.caches.append(cache)
+
+    def broadcast(self, requester, address, exclusive):
+        """Snoop every other cache, returns True if any of them held the block"""
+        shared = False
+        for cache in self.caches:
+            if cache is requester:
+                continue
+            held, flushed = cache.snoop(address, exclusive)
+            if held:
+                shared = True
+                if exclusive:
+                    self.invalidations += 1
+            if flushed:
+                self.interventions += 1
+        return shared
+
+    def read_miss(self, requester, address):
+        self.bus_reads += 1
+        return self.broadcast(requester, address, False)
+
+    def read_exclusive(self, requester, address):
+        self.bus_read_exclusive += 1
+        self.broadcast(requester, address, True)
+
+    def upgrade(self, requester, address):
+        self.upgrades += 1
+        self.broadcast(requester, address, True)
+
+    def get_stats(self):
+        return {
+            'bus_reads': self.bus_reads,
+            'bus_read_exclusive': self.bus_read_exclusive,
+            'upgrades': self.upgrades,
+            'transactions': self.bus_reads + self.bus_read_exclusive + self.upgrades,
+            'invalidations': self.invalidations,
+            'interventions': self.interventions
+        }
+
+
+class CoherentCache(Cache):
+    """Write-back, write-allocate private cache whose blocks carry a MESI state.
+
+    Bus requests are made before the base Cache fills a block, so a Modified copy
+    elsewhere is flushed to the shared level in time for the fill to see it.
+    """
+
+    def __init__(self, cache_size, block_size, associativity, next_level=None, replacement="lru", seed=0, core_id=0):
+        super().__init__(cache_size, block_size, associativity, "write_back", next_level,
+                         replacement=replacement, seed=seed)
+        self.core_id = core_id
+        self.bus = None
+        for cache_set in self.blocks:
+            for block in cache_set:
+                block.state = INVALID
+
+    def reset_stats(self):
+        super().reset_stats()
+        self.coherence_misses = 0       # Misses to blocks another core invalidated
+        self.invalidations_received = 0
+        self.interventions = 0
+        self.invalidated_blocks = set()
+
+    def lookup(self, address):
+        """Return the valid block holding address, or None"""
+        tag, index, _ = self.get_cache_info(address)
+        block_idx = self.find_block(tag, index)
+        return self.blocks[index][block_idx] if block_idx != -1 else None
+
+    def note_coherence_miss(self, address):
+        block_address = address & ~(self.block_size - 1)
+        if block_address in self.invalidated_blocks:
+            self.invalidated_blocks.discard(block_address)
+            self.coherence_misses += 1
+
+    def read(self, address, pc=None):
+        if self.lookup(address) is not None:
+            return super().read(address, pc)
+        shared = self.bus.read_miss(self, address)
+        self.note_coherence_miss(address)
+        data = super().read(address, pc)
+        self.lookup(address).state = SHARED if shared else EXCLUSIVE
+        return data
+
+    def write(self, address, data, pc=None):
+        block = self.lookup(address)
+        if block is None:
+            self.bus.read_exclusive(self, address)
+            self.note_coherence_miss(address)
+        elif block.state == SHARED:
+            self.bus.upgrade(self, address)
+        # Exclusive and Modified blocks are written without a bus transaction
+        super().write(address, data, pc)
+        self.lookup(address).state = MODIFIED
+
+    def snoop(self, address, exclusive):
+        """React to another cache's request, returns (held the block, flushed a modified copy)"""
+        block = self.lookup(address)
+        if block is None:
+            return False, False
+        block_address = address & ~(self.block_size - 1)
+        flushed = block.state == MODIFIED
+        if flushed:
+            self.write_block_to_next_level(block_address, block)
+            block.dirty = False
+            self.interventions += 1
+        if exclusive:
+            block.valid = False
+            block.state = INVALID
+            self.invalidations_received += 1
+            self.invalidated_blocks.add(block_address)
+        else:
+            block.state = SHARED
+        return True, flushed
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats['coherence'] = {
+            'coherence_misses': self.coherence_misses,
+            'invalidations_received': self.invalidations_received,
+            'interventions': self.interventions
+        }
+        return stats
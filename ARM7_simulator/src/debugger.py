@@ -0,0 +1,181 @@
+# debugger.py - Breakpoints, watchpoints and step debugging for the fetch loop
+
+import operator
+import re
+
+import registers
+from flags import flag
+from registers import NUM_REGISTERS, PC
+
+CONDITION_OPS = {
+    '==': operator.eq, '!=': operator.ne,
+    '<=': operator.le, '>=': operator.ge,
+    '<': operator.lt, '>': operator.gt,
+}
+CONDITION_PATTERN = re.compile(r'^\s*r(\d+)\s*(==|!=|<=|>=|<|>)\s*(-?(?:0x[0-9a-f]+|\d+))\s*$', re.IGNORECASE)
+
+HELP = """Commands:
+  s [N]              step N instructions (default 1)
+  c                  continue until a breakpoint, watchpoint or condition triggers
+  b ADDR             break when the PC reaches ADDR
+  d ADDR             delete the breakpoint at ADDR
+  w ADDR [r|w|rw]    watch reads and/or writes of the word at ADDR (default w)
+  dw ADDR            delete the watchpoint at ADDR
+  cond rN OP VALUE   break when a register condition becomes true (OP: == != < <= > >=)
+  dcond              delete all register conditions
+  info               list breakpoints, watchpoints and conditions
+  regs               show registers and flags
+  mem ADDR [WORDS]   show memory as the core sees it (caches included)
+  q                  stop the simulation"""
+
+
+def parse_address(text):
+    return int(text, 0) & 0xFFFFFFFF
+
+
+class Debugger:
+    """Stops the fetch loop on breakpoints, watchpoints, register conditions or single steps.
+
+    run_program only calls should_stop() when a debugger is attached, and that check
+    is a set lookup unless conditions are set or a step count is pending, so runs
+    without breakpoints keep the plain loop. Watchpoints are reported by the memory
+    hierarchy through on_access(), which it only calls while a debugger is attached.
+    Commands come from the given iterable first (a script), then from input().
+    """
+
+    def __init__(self, hierarchy, commands=None, stop_at_start=True):
+        self.hierarchy = hierarchy
+        self.breakpoints = set()
+        self.watch_reads = set()
+        self.watch_writes = set()
+        self.conditions = []  # [text, register, op, value, held at the last check]
+        self.commands = iter(commands) if commands is not None else iter(())
+        self.steps = 1 if stop_at_start else 0
+        self.triggered = None  # Watchpoint/condition message waiting to be reported
+        hierarchy.watcher = self
+
+    def detach(self):
+        self.hierarchy.watcher = None
+
+    def should_stop(self, pc):
+        """Called before each instruction, returns True when the loop should hand control to prompt()"""
+        if self.steps:
+            self.steps -= 1
+            if self.steps == 0:
+                return True
+        if pc in self.breakpoints or self.triggered is not None:
+            return True
+        if self.conditions:
+            # Conditions trigger when they become true, not on every instruction while they hold
+            for condition in self.conditions:
+                text, reg, op, value, held = condition
+                condition[4] = op(registers.registers[reg], value)
+                if condition[4] and not held:
+                    self.triggered = f"condition {text} holds"
+            return self.triggered is not None
+        return False
+
+    def on_access(self, kind, address, value, pc):
+        """Memory hierarchy callback for every data read ('r') or write ('w')"""
+        address &= ~3
+        watched = self.watch_reads if kind == 'r' else self.watch_writes
+        if address in watched:
+            action = "read" if kind == 'r' else "write"
+            where = f" by PC=0x{pc:08X}" if pc is not None else ""
+            self.triggered = f"watchpoint: {action} of 0x{value & 0xFFFFFFFF:08X} at 0x{address:08X}{where}"
+
+    def next_command(self):
+        for line in self.commands:
+            print(f"(dbg) {line}")
+            return line
+        try:
+            return input("(dbg) ")
+        except EOFError:
+            # No more input: drop every stop point and run to completion
+            print("\nEnd of debugger input, continuing without stops")
+            self.breakpoints.clear()
+            self.watch_reads.clear()
+            self.watch_writes.clear()
+            self.conditions = []
+            self.steps = 0
+            return 'c'
+
+    def prompt(self, pc):
+        """Report why execution stopped and run commands until one resumes it, returns False to quit"""
+        reason = self.triggered or ("breakpoint" if pc in self.breakpoints else "step")
+        self.triggered = None
+        print(f"\nStopped at PC=0x{pc:08X} ({reason}): next instruction 0x{self.hierarchy.peek(pc):08X}")
+        while True:
+            line = self.next_command().strip()
+            if not line:
+                continue
+            try:
+                resume = self.execute(line)
+            except (ValueError, IndexError) as e:
+                print(f"Bad command '{line}': {str(e)}")
+                continue
+            if resume is not None:
+                return resume
+
+    def execute(self, line):
+        """Run one command, returns True/False to resume/quit or None to keep prompting"""
+        words = line.split()
+        cmd, args = words[0].lower(), words[1:]
+        if cmd in ('s', 'step'):
+            self.steps = int(args[0], 0) if args else 1
+            return True
+        if cmd in ('c', 'continue'):
+            return True
+        if cmd in ('q', 'quit'):
+            return False
+        if cmd in ('b', 'break'):
+            self.breakpoints.add(parse_address(args[0]))
+        elif cmd in ('d', 'delete'):
+            self.breakpoints.discard(parse_address(args[0]))
+        elif cmd in ('w', 'watch'):
+            address = parse_address(args[0]) & ~3
+            mode = args[1].lower() if len(args) > 1 else 'w'
+            if mode not in ('r', 'w', 'rw'):
+                raise ValueError(f"watch mode must be r, w or rw: {mode}")
+            if 'r' in mode:
+                self.watch_reads.add(address)
+            if 'w' in mode:
+                self.watch_writes.add(address)
+        elif cmd == 'dw':
+            address = parse_address(args[0]) & ~3
+            self.watch_reads.discard(address)
+            self.watch_writes.discard(address)
+        elif cmd == 'cond':
+            self.add_condition(" ".join(args))
+        elif cmd == 'dcond':
+            self.conditions = []
+        elif cmd == 'info':
+            print(f"Breakpoints: {', '.join(f'0x{a:08X}' for a in sorted(self.breakpoints)) or 'none'}")
+            print(f"Read watchpoints: {', '.join(f'0x{a:08X}' for a in sorted(self.watch_reads)) or 'none'}")
+            print(f"Write watchpoints: {', '.join(f'0x{a:08X}' for a in sorted(self.watch_writes)) or 'none'}")
+            print(f"Register conditions: {', '.join(c[0] for c in self.conditions) or 'none'}")
+        elif cmd in ('r', 'regs'):
+            self.print_registers()
+        elif cmd in ('m', 'mem'):
+            start = parse_address(args[0]) & ~3
+            count = int(args[1], 0) if len(args) > 1 else 4
+            for address in range(start, start + 4 * count, 4):
+                print(f"0x{address:08X}: 0x{self.hierarchy.peek(address) & 0xFFFFFFFF:08X}")
+        elif cmd in ('h', 'help', '?'):
+            print(HELP)
+        else:
+            raise ValueError("unknown command (try 'help')")
+        return None
+
+    def add_condition(self, text):
+        match = CONDITION_PATTERN.match(text)
+        if not match or int(match.group(1)) >= NUM_REGISTERS:
+            raise ValueError(f"expected 'rN OP VALUE', got '{text}'")
+        reg, op, value = int(match.group(1)), CONDITION_OPS[match.group(2)], int(match.group(3), 0)
+        self.conditions.append([text.strip(), reg, op, value, op(registers.registers[reg], value)])
+
+    def print_registers(self):
+        for i in range(NUM_REGISTERS):
+            name = "PC" if i == PC else f"R{i}"
+            print(f"{name:<3}: 0x{registers.registers[i] & 0xFFFFFFFF:08X}  {registers.registers[i]}")
+        print(f"Flags: Z={int(flag['z'])} N={int(flag['n'])} C={int(flag['c'])} V={int(flag['v'])}")
@@ -29,11 +29,23 @@ def decode_instruction(raw):
         inst.mnemonic = "B"
         inst.immediate = raw & 0x00FFFFFF
         if inst.immediate & 0x00800000:
-            inst.immediate |= 0xFF000000 
+            inst.immediate -= 0x01000000  # Sign-extend the 24-bit offset
         inst.immediate <<= 2
         inst.rd = 15  # target is PC
         return inst
 
+    # Software interrupt, used as a halt request
+    elif (raw & 0x0F000000) == 0x0F000000:
+        inst.mnemonic = "SWI"
+        inst.immediate = raw & 0x00FFFFFF
+        return inst
+
+    # Breakpoint, also treated as a halt
+    elif (raw & 0x0FF000F0) == 0x01200070:
+        inst.mnemonic = "BKPT"
+        inst.immediate = ((raw >> 4) & 0xFFF0) | (raw & 0xF)
+        return inst
+
     # Single data transfer (LDR/STR)
     elif (raw & 0x0C000000) == 0x04000000:
         inst.is_memory_op = True
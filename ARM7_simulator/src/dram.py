@@ -0,0 +1,127 @@
+# dram.py - Main-memory timing: channels, banks and row buffers behind the last-level cache
+
+PAGE_POLICIES = ("open", "closed")
+
+
+class DRAM:
+    """Row-buffer timing of main memory, charged on last-level refills and writebacks.
+
+    Physical addresses are split row:bank:channel:column, so consecutive rows of
+    row_size bytes are interleaved over the channels first and then the banks.
+    With an open-page policy a bank keeps its last row open: an access to that row
+    pays tCAS, one to an idle bank tRCD + tCAS and one to another row
+    tRP + tRCD + tCAS. A closed-page policy precharges after every access, so each
+    one pays tRCD + tCAS. Timings are in DRAM clocks, clock_ratio core cycles each.
+    Accesses are serviced one at a time; bank parallelism is not modelled.
+    """
+
+    def __init__(self, channels=1, banks=8, row_size=2048, page_policy="open", t_rcd=14, t_cas=14, t_rp=14,
+                 clock_ratio=3):
+        for name, value in (('channels', channels), ('banks', banks), ('row_size', row_size)):
+            if not isinstance(value, int) or value <= 0 or value & (value - 1):
+                raise ValueError(f"DRAM {name} must be a positive power of two: {value}")
+        if page_policy not in PAGE_POLICIES:
+            raise ValueError(f"Unknown page policy: {page_policy}. Must be one of {PAGE_POLICIES}")
+        if min(t_rcd, t_cas, t_rp, clock_ratio) < 0:
+            raise ValueError("DRAM timings must be non-negative")
+        self.channels = channels
+        self.banks = banks
+        self.row_size = row_size
+        self.page_policy = page_policy
+        self.t_rcd = t_rcd
+        self.t_cas = t_cas
+        self.t_rp = t_rp
+        self.clock_ratio = clock_ratio
+        self.column_bits = row_size.bit_length() - 1
+        self.channel_bits = channels.bit_length() - 1
+        self.bank_bits = banks.bit_length() - 1
+        self.open_rows = [None] * (channels * banks)  # Row held in each bank's row buffer
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset the counters; rows stay open, like cache contents"""
+        self.reads = 0
+        self.writes = 0
+        self.row_hits = 0
+        self.row_empty = 0
+        self.row_conflicts = 0
+        self.cycles = 0
+        self.bank_accesses = [0] * (self.channels * self.banks)
+
+    def map(self, address):
+        """(channel, bank, row) of a physical address"""
+        address = (address & 0xFFFFFFFF) >> self.column_bits
+        channel = address & (self.channels - 1)
+        address >>= self.channel_bits
+        bank = address & (self.banks - 1)
+        return channel, bank, address >> self.bank_bits
+
+    def access(self, address, write=False):
+        """Core cycles to open the row holding address and start the burst (transfer time not included)"""
+        channel, bank, row = self.map(address)
+        slot = channel * self.banks + bank
+        if write:
+            self.writes += 1
+        else:
+            self.reads += 1
+        self.bank_accesses[slot] += 1
+        open_row = self.open_rows[slot]
+        if self.page_policy == "closed":
+            # Auto-precharge after the previous access leaves every bank idle
+            self.row_empty += 1
+            latency = self.t_rcd + self.t_cas
+        elif open_row == row:
+            self.row_hits += 1
+            latency = self.t_cas
+        elif open_row is None:
+            self.row_empty += 1
+            latency = self.t_rcd + self.t_cas
+        else:
+            self.row_conflicts += 1
+            latency = self.t_rp + self.t_rcd + self.t_cas
+        if self.page_policy == "open":
+            self.open_rows[slot] = row
+        cycles = latency * self.clock_ratio
+        self.cycles += cycles
+        return cycles
+
+    def describe(self):
+        return (f"{self.channels}ch-{self.banks}bank-{self.row_size}B-{self.page_policy}-"
+                f"{self.t_rcd}/{self.t_cas}/{self.t_rp}x{self.clock_ratio}")
+
+    def to_dict(self):
+        return {
+            'channels': self.channels,
+            'banks': self.banks,
+            'row_size': self.row_size,
+            'page_policy': self.page_policy,
+            't_rcd': self.t_rcd,
+            't_cas': self.t_cas,
+            't_rp': self.t_rp,
+            'clock_ratio': self.clock_ratio
+        }
+
+    def get_stats(self):
+        accesses = self.reads + self.writes
+        return {
+            'model': self.describe(),
+            'reads': self.reads,
+            'writes': self.writes,
+            'row_hits': self.row_hits,
+            'row_empty': self.row_empty,
+            'row_conflicts': self.row_conflicts,
+            'row_hit_rate': self.row_hits / accesses if accesses > 0 else 0,
+            'cycles': self.cycles,
+            'bank_accesses': list(self.bank_accesses)
+        }
+
+
+def make_dram(spec):
+    """Create a DRAM model from True/"default" or a dict of DRAM parameters, or None when spec is None/False"""
+    if spec is None or spec is False:
+        return None
+    if spec is True or spec == "default":
+        return DRAM()
+    if not isinstance(spec, dict):
+        raise ValueError(f"DRAM spec must be a dict of parameters: {spec}")
+    return DRAM(**spec)
@@ -0,0 +1,125 @@
+# energy.py - Energy and area model for cache configurations, and Pareto fronts over experiment results
+
+import json
+import math
+
+# Defaults in picojoules, square millimetres and cycles
+DEFAULT_PARAMETERS = {
+    'access_energy': 5.0,         # One lookup in a 1KB direct-mapped cache
+    'word_energy': 2.0,           # Moving one word of a block between levels
+    'leakage_per_kb': 0.5,        # Static energy per KB of cache per cycle
+    'area_per_kb': 0.01,          # Data array area per KB
+    'memory_access_energy': 640.0,  # One main-memory burst, plus word_energy per word moved
+    'instruction_energy': 10.0,   # Core energy per instruction
+}
+TABLE_KEYS = {'size', 'block_size', 'associativity', 'access_energy', 'refill_energy', 'leakage_per_cycle', 'area'}
+
+# Objectives a configuration must not be beaten on by another to be Pareto-optimal
+PARETO_OBJECTIVES = ('total_cycles', 'energy', 'area')
+
+
+class EnergyModel:
+    """Per-access, per-refill and leakage energy of each cache, plus main-memory and core energy.
+
+    A table entry matching a cache's size, block size and associativity gives its
+    parameters directly; caches without one are scaled from the defaults: access
+    energy grows with the square root of the size and with the log of the ways,
+    refills add the energy of moving every word of the block, and leakage and area
+    grow with capacity (area also with the tag overhead of small blocks and many ways).
+    """
+
+    def __init__(self, table=None, **parameters):
+        unknown = set(parameters) - set(DEFAULT_PARAMETERS)
+        if unknown:
+            raise ValueError(f"Unknown energy parameters: {sorted(unknown)}")
+        self.parameters = dict(DEFAULT_PARAMETERS, **parameters)
+        if any(value < 0 for value in self.parameters.values()):
+            raise ValueError("Energy parameters must be non-negative")
+        self.table = {}
+        for entry in table or []:
+            unknown = set(entry) - TABLE_KEYS
+            if unknown:
+                raise ValueError(f"Unknown keys in energy table entry: {sorted(unknown)}")
+            self.table[(entry['size'], entry['block_size'], entry['associativity'])] = dict(entry)
+
+    @classmethod
+    def from_dict(cls, spec):
+        """Build a model from {"caches": [table entries], "<parameter>": value, ...}"""
+        spec = dict(spec)
+        return cls(spec.pop('caches', None), **spec)
+
+    @classmethod
+    def from_file(cls, filepath):
+        """Load an energy table from a JSON file"""
+        with open(filepath, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self):
+        return dict(self.parameters, caches=list(self.table.values()))
+
+    def cache_parameters(self, size, block_size, associativity):
+        """Energy and area figures for one cache geometry"""
+        p = self.parameters
+        ways_factor = 1 + 0.15 * math.log2(max(associativity, 1))
+        access = p['access_energy'] * math.sqrt(size / 1024) * ways_factor
+        tag_overhead = 1 + 4 / block_size + 0.05 * math.log2(max(associativity, 1))
+        params = {
+            'access_energy': access,
+            'refill_energy': access + p['word_energy'] * max(1, block_size // 4),
+            'leakage_per_cycle': p['leakage_per_kb'] * size / 1024,
+            'area': p['area_per_kb'] * size / 1024 * tag_overhead
+        }
+        params.update({key: value for key, value in self.table.get((size, block_size, associativity), {}).items()
+                       if key in params})
+        return params
+
+    def memory_energy(self, block_size):
+        """Energy of moving one block to or from main memory"""
+        return self.parameters['memory_access_energy'] + self.parameters['word_energy'] * max(1, block_size // 4)
+
+    def evaluate(self, caches, last_level, total_cycles, instruction_count):
+        """Energy breakdown of a run from its Cache objects (name -> Cache) and cycle count
+
+        Every access pays the access energy, every miss (refill) and writeback moves a
+        block, and misses and writebacks of the last-level caches also reach main memory.
+        """
+        dynamic = 0
+        leakage_per_cycle = 0
+        memory = 0
+        area = 0
+        for name, cache in caches.items():
+            params = self.cache_parameters(cache.cache_size, cache.block_size, cache.associativity)
+            dynamic += cache.access_count * params['access_energy'] + \
+                (cache.misses + cache.writebacks) * params['refill_energy']
+            leakage_per_cycle += params['leakage_per_cycle']
+            area += params['area']
+            if name in last_level:
+                memory += (cache.misses + cache.writebacks) * self.memory_energy(cache.block_size)
+        leakage = leakage_per_cycle * total_cycles
+        core = self.parameters['instruction_energy'] * instruction_count
+        total = dynamic + leakage + memory + core
+        return {
+            'dynamic': dynamic,
+            'leakage': leakage,
+            'memory': memory,
+            'core': core,
+            'total': total,
+            'edp': total * total_cycles,
+            'area': area
+        }
+
+
+def pareto_front(results, objectives=PARETO_OBJECTIVES):
+    """Results not dominated by any other (no worse in every objective and better in one), in input order"""
+    def values(result):
+        return tuple(result['energy']['total'] if name == 'energy' else
+                     result['energy']['area'] if name == 'area' else result[name] for name in objectives)
+
+    points = [values(result) for result in results]
+    front = []
+    for i, point in enumerate(points):
+        dominated = any(all(o <= p for o, p in zip(other, point)) and other != point
+                        for j, other in enumerate(points) if j != i)
+        if not dominated:
+            front.append(results[i])
+    return front
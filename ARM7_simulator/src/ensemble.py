@@ -0,0 +1,489 @@
+# ensemble.py - Lockstep execution of one binary over many initial states with NumPy
+
+import json
+import os
+import time
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for ensemble runs
+    np = None
+
+from decoder import decode_instruction
+from executor import HALT_ADDRESS
+from memory import MEMORY_SIZE
+from registers import NUM_REGISTERS, PC
+
+WORDS = MEMORY_SIZE // 4
+COMPARE_OPCODES = (0x8, 0x9, 0xA, 0xB)
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("Ensemble mode needs NumPy (pip install numpy)")
+
+
+def sets_flags(raw):
+    """Whether flags.check updates the flags for a data-processing instruction"""
+    return (raw >> 20) & 0x1 == 1 or (raw >> 21) & 0xF in COMPARE_OPCODES
+
+
+def signed32(values):
+    """Same conversion as flags.overflow: values at or above 2**31 wrap to negative"""
+    return np.where(values < 0x80000000, values, values - 0x100000000)
+
+
+def to_int64(value):
+    """Wrap a Python integer the way the int64 state arrays would"""
+    return (value + 0x8000000000000000) % 0x10000000000000000 - 0x8000000000000000
+
+
+def condition_holds(cond, z, n, c, v):
+    """Scalar form of Ensemble.condition_mask"""
+    if cond == 0x0: return z
+    if cond == 0x1: return not z
+    if cond == 0x2: return c
+    if cond == 0x3: return not c
+    if cond == 0x4: return n
+    if cond == 0x5: return not n
+    if cond == 0x6: return v
+    if cond == 0x7: return not v
+    if cond == 0x8: return c and not z
+    if cond == 0x9: return not c or z
+    if cond == 0xA: return n == v
+    if cond == 0xB: return n != v
+    if cond == 0xC: return not z and n == v
+    if cond == 0xD: return z or n != v
+    return cond == 0xE
+
+
+def alu(mnemonic, rn, operand, carry):
+    """Vector form of the data-processing results in executor.execute_instruction"""
+    if mnemonic == "AND":
+        return rn & operand
+    if mnemonic == "EOR":
+        return rn ^ operand
+    if mnemonic in ("SUB", "SUBS"):
+        return rn - operand
+    if mnemonic == "RSB":
+        return operand - rn
+    if mnemonic == "ADD":
+        return rn + operand
+    if mnemonic == "ADC":
+        return rn + operand + carry
+    if mnemonic == "SBC":
+        return rn - operand - (1 - carry)
+    if mnemonic == "RSC":
+        return operand - rn - (1 - carry)
+    if mnemonic == "ORR":
+        return rn | operand
+    if mnemonic == "MOV":
+        return operand
+    if mnemonic == "BIC":
+        return rn & ~operand
+    if mnemonic == "MVN":
+        return ~operand & 0xFFFFFFFF
+    return None  # Compares and unknown mnemonics store nothing
+
+
+def negative_result(opcode, rn, rm, carry):
+    """Vector form of flags.negative"""
+    if opcode in (0x0, 0x8):
+        result = rn & rm
+    elif opcode in (0x1, 0x9):
+        result = rn ^ rm
+    elif opcode in (0x2, 0xA):
+        result = rn - rm
+    elif opcode == 0x3:
+        result = rm - rn
+    elif opcode in (0x4, 0xB):
+        result = rn + rm
+    elif opcode == 0x5:
+        result = rn + rm + carry
+    elif opcode == 0x6:
+        result = rn - rm - (1 - carry)
+    elif opcode == 0x7:
+        result = rm - rn - (1 - carry)
+    elif opcode == 0xC:
+        result = rn | rm
+    elif opcode == 0xD:
+        result = rm
+    elif opcode == 0xE:
+        result = rn & ~rm
+    else:
+        result = ~rm & 0xFFFFFFFF
+    return ((result >> 31) & 0x1) == 1
+
+
+class Ensemble:
+    """N copies of the machine running one program in lockstep.
+
+    Registers are an (N x 16) array, flags are four length-N boolean arrays and
+    memory is an (N x words) array, so each instruction is applied to every
+    instance of a group with a handful of array operations. A group is a set of
+    instances that share a PC; condition codes become a per-instance mask, and
+    when instances disagree on the next PC the group splits. Groups never merge
+    again, even if their PCs meet later; a group down to one instance leaves the
+    arrays and runs to the end on plain integers (run_one). Only the architectural
+    state is modelled: there are no caches, branch predictor or pipeline, so no cost
+    or cycle counts.
+    Instructions are fetched from the loaded image, which stores do not modify, and
+    addresses outside memory read as 0 and drop stores (a scalar run can keep such
+    words in its caches until they are evicted).
+    """
+
+    def __init__(self, binary_file, size):
+        require_numpy()
+        if size <= 0:
+            raise ValueError(f"Ensemble size must be positive: {size}")
+        self.size = size
+        self.registers = np.zeros((size, NUM_REGISTERS), dtype=np.int64)
+        self.z = np.zeros(size, dtype=bool)
+        self.n = np.zeros(size, dtype=bool)
+        self.c = np.zeros(size, dtype=bool)
+        self.v = np.zeros(size, dtype=bool)
+        self.memory = np.zeros((size, WORDS), dtype=np.int64)
+        self.instruction_counts = np.zeros(size, dtype=np.int64)
+        self.stores = np.zeros(size, dtype=np.int64)
+        self.loop_states = {}  # backward branch pc -> (state of each instance when it last took it, seen mask)
+        self.halt_reasons = [None] * size
+        self.decoded = {}  # raw instruction -> Instruction, shared by every instance
+
+        with open(binary_file, 'rb') as f:
+            image = f.read()
+        self.file_length = len(image)
+        # Same word layout as file_reader.load_binary
+        words = [int.from_bytes(image[i:i + 4], byteorder='little') for i in range(0, len(image) - 3, 4)]
+        words = words[:WORDS - 1]  # memory.write_word ignores the last word of memory
+        self.memory[:, :len(words)] = words
+        self.program = words  # Fetched from here: as with the split L1I/L1D, data stores never reach fetch
+
+    def set_registers(self, instance, values):
+        """Set initial registers from {register number or 'rN': value}"""
+        for reg, value in values.items():
+            reg = int(reg[1:]) if isinstance(reg, str) and reg.lower().startswith('r') else int(reg)
+            if not 0 <= reg < NUM_REGISTERS:
+                raise ValueError(f"Register out of range: {reg}")
+            self.registers[instance, reg] = int(value, 0) if isinstance(value, str) else int(value)
+
+    def set_memory(self, instance, values):
+        """Set initial memory words from {address: value}"""
+        for address, value in values.items():
+            address = int(address, 0) if isinstance(address, str) else int(address)
+            if address < 0 or address + 3 >= MEMORY_SIZE:
+                raise ValueError(f"Memory address out of range: 0x{address:X}")
+            self.memory[instance, address >> 2] = int(value, 0) if isinstance(value, str) else int(value)
+
+    def word_index(self, addresses):
+        """Word index for each address as the data cache sees it, and which addresses reach memory"""
+        addresses = (addresses & 0xFFFFFFFF) & ~3
+        valid = addresses + 3 < MEMORY_SIZE
+        return np.where(valid, addresses >> 2, 0), valid
+
+    def condition_mask(self, cond, idx):
+        """Per-instance result of flags.check's condition table"""
+        z, n, c, v = self.z[idx], self.n[idx], self.c[idx], self.v[idx]
+        if cond == 0x0: return z
+        if cond == 0x1: return ~z
+        if cond == 0x2: return c
+        if cond == 0x3: return ~c
+        if cond == 0x4: return n
+        if cond == 0x5: return ~n
+        if cond == 0x6: return v
+        if cond == 0x7: return ~v
+        if cond == 0x8: return c & ~z
+        if cond == 0x9: return ~c | z
+        if cond == 0xA: return n == v
+        if cond == 0xB: return n != v
+        if cond == 0xC: return ~z & (n == v)
+        if cond == 0xD: return z | (n != v)
+        if cond == 0xE: return np.ones(len(idx), dtype=bool)
+        return np.zeros(len(idx), dtype=bool)
+
+    def update_flags(self, raw, idx):
+        """Vector form of the flag update in flags.check, for the instances that executed"""
+        rn = (raw >> 16) & 0xF
+        i_bit = (raw >> 25) & 0x1
+        rm = raw & 0xFF if i_bit else raw & 0xF
+        opcode = (raw >> 21) & 0xF
+        rn1 = self.registers[idx, rn]
+        # get_register() returns 0 outside the register file
+        rm1 = self.registers[idx, rm] if rm < NUM_REGISTERS else np.zeros(len(idx), dtype=np.int64)
+        total = rn1 + rm1
+        self.n[idx] = negative_result(opcode, rn1, rm1, self.c[idx].astype(np.int64))
+        self.z[idx] = total == 0
+        self.c[idx] = total > 0xFFFFFFFF
+        signed = signed32(rn1) + signed32(rm1)
+        self.v[idx] = (signed > 0x7FFFFFFF) | (signed < -0x80000000)
+
+    def step(self, idx, pc):
+        """Execute the instruction at pc for the instances in idx
+
+        Returns a list of (instances, next pc) groups; halted instances are left out.
+        """
+        raw = self.program[pc >> 2] if pc >= 0 and pc % 4 == 0 and pc >> 2 < len(self.program) else 0
+        inst = self.decoded.get(raw)
+        if inst is None:
+            inst = self.decoded[raw] = decode_instruction(raw)
+        if not inst.is_valid:
+            self.halt(idx, "invalid_instruction")
+            return []
+
+        self.registers[idx, PC] = pc
+        cond = (raw >> 28) & 0xF
+        mask = self.condition_mask(cond, idx)
+        self.instruction_counts[idx] += 1
+        active = idx[mask]
+        if len(active) == 0:
+            return [(idx, pc + 4)]
+
+        halted = None
+        if inst.mnemonic == "B":
+            target = pc + 8 + inst.immediate
+            if target <= pc:
+                idle = self.check_idle_loop(pc, active)
+                if idle.any():
+                    self.halt(active[idle], "idle_loop")
+                    keep = ~np.isin(idx, active[idle])
+                    idx, mask = idx[keep], mask[keep]
+            return self.regroup(idx, np.where(mask, target, pc + 4))
+        if inst.mnemonic in ("SWI", "BKPT"):
+            halted = active
+            self.halt(active, inst.mnemonic.lower())
+        elif inst.is_memory_op:
+            addresses = self.registers[active, inst.rn] + inst.offset
+            words, in_range = self.word_index(addresses)
+            if inst.mnemonic == "LDR":
+                self.registers[active, inst.rd] = np.where(in_range, self.memory[active, words], 0)
+            else:
+                exiting = (addresses & 0xFFFFFFFF) == HALT_ADDRESS
+                if exiting.any():
+                    halted = active[exiting]
+                    self.halt(halted, "halt_address")
+                self.stores[active[~exiting]] += 1
+                store = ~exiting & in_range
+                self.memory[active[store], words[store]] = self.registers[active[store], inst.rd]
+        else:
+            if sets_flags(raw):
+                self.update_flags(raw, active)
+            rn1 = self.registers[active, inst.rn]
+            operand = np.full(len(active), inst.immediate, dtype=np.int64) if inst.immediate \
+                else self.registers[active, inst.rm]
+            result = alu(inst.mnemonic, rn1, operand, self.c[active].astype(np.int64))
+            if result is not None:
+                self.registers[active, inst.rd] = result
+
+        # Instances whose PC was left alone move on to the next instruction
+        next_pc = self.registers[idx, PC]
+        next_pc = np.where(next_pc == pc, pc + 4, next_pc)
+        if halted is not None:
+            keep = ~np.isin(idx, halted)
+            idx, next_pc = idx[keep], next_pc[keep]
+        return self.regroup(idx, next_pc)
+
+    def regroup(self, idx, next_pc):
+        if len(idx) == 0:
+            return []
+        self.registers[idx, PC] = next_pc
+        first = next_pc[0]
+        if (next_pc == first).all():
+            return [(idx, int(first))]
+        return [(idx[next_pc == target], int(target)) for target in np.unique(next_pc)]
+
+    def halt(self, idx, reason):
+        for i in idx:
+            self.halt_reasons[i] = reason
+
+    def check_idle_loop(self, pc, idx):
+        """Mask of the instances taking the backward branch at pc in the same state as last time
+
+        Same test as run_program: registers, flags and the number of stores must all match.
+        """
+        state = np.column_stack((self.registers[idx], self.z[idx], self.n[idx], self.c[idx], self.v[idx],
+                                 self.stores[idx]))
+        previous, seen = self.loop_history(pc)
+        idle = seen[idx] & (previous[idx] == state).all(axis=1)
+        previous[idx] = state
+        seen[idx] = True
+        return idle
+
+    def loop_history(self, pc):
+        """(state of each instance when it last took the backward branch at pc, seen mask)"""
+        if pc not in self.loop_states:
+            self.loop_states[pc] = (np.zeros((self.size, NUM_REGISTERS + 5), dtype=np.int64),
+                                    np.zeros(self.size, dtype=bool))
+        return self.loop_states[pc]
+
+    def run_one(self, i, pc, max_instructions):
+        """Run instance i alone from pc to completion, returns the number of steps taken
+
+        Same semantics as step() on a group of one, on Python integers and lists
+        instead of array slices; the state is written back to the arrays at the end.
+        """
+        regs = self.registers[i].tolist()
+        z, n, c, v = bool(self.z[i]), bool(self.n[i]), bool(self.c[i]), bool(self.v[i])
+        memory = self.memory[i].tolist()
+        count = int(self.instruction_counts[i])
+        stores = int(self.stores[i])
+        program = self.program
+        steps = 0
+        while True:
+            if pc >= self.file_length:
+                reason = "end_of_program"
+                break
+            if count >= max_instructions:
+                reason = "max_instructions"
+                break
+            steps += 1
+            raw = program[pc >> 2] if pc >= 0 and pc % 4 == 0 and pc >> 2 < len(program) else 0
+            inst = self.decoded.get(raw)
+            if inst is None:
+                inst = self.decoded[raw] = decode_instruction(raw)
+            if not inst.is_valid:
+                reason = "invalid_instruction"
+                break
+
+            regs[PC] = pc
+            count += 1
+            if not condition_holds((raw >> 28) & 0xF, z, n, c, v):
+                pc += 4
+                continue
+
+            if inst.mnemonic == "B":
+                target = pc + 8 + inst.immediate
+                if target <= pc:
+                    previous, seen = self.loop_history(pc)
+                    state = regs + [z, n, c, v, stores]
+                    idle = seen[i] and previous[i].tolist() == state
+                    previous[i] = [to_int64(value) for value in state]
+                    seen[i] = True
+                    if idle:
+                        reason = "idle_loop"
+                        break
+                pc = target
+                continue
+            if inst.mnemonic in ("SWI", "BKPT"):
+                reason = inst.mnemonic.lower()
+                break
+            if inst.is_memory_op:
+                address = regs[inst.rn] + inst.offset
+                word = (address & 0xFFFFFFFF) & ~3
+                in_range = word + 3 < MEMORY_SIZE
+                if inst.mnemonic == "LDR":
+                    regs[inst.rd] = memory[word >> 2] if in_range else 0
+                else:
+                    if address & 0xFFFFFFFF == HALT_ADDRESS:
+                        reason = "halt_address"
+                        break
+                    stores += 1
+                    if in_range:
+                        memory[word >> 2] = regs[inst.rd]
+            else:
+                if sets_flags(raw):
+                    rm = raw & 0xFF if (raw >> 25) & 0x1 else raw & 0xF
+                    rn1 = regs[(raw >> 16) & 0xF]
+                    rm1 = regs[rm] if rm < NUM_REGISTERS else 0
+                    total = rn1 + rm1
+                    n = negative_result((raw >> 21) & 0xF, rn1, rm1, int(c))
+                    z = total == 0
+                    c = total > 0xFFFFFFFF
+                    signed = (rn1 if rn1 < 0x80000000 else rn1 - 0x100000000) + \
+                        (rm1 if rm1 < 0x80000000 else rm1 - 0x100000000)
+                    v = signed > 0x7FFFFFFF or signed < -0x80000000
+                operand = inst.immediate if inst.immediate else regs[inst.rm]
+                result = alu(inst.mnemonic, regs[inst.rn], operand, int(c))
+                if result is not None:
+                    regs[inst.rd] = result
+
+            # The PC moves on unless the instruction wrote it
+            pc = pc + 4 if regs[PC] == pc else regs[PC]
+
+        regs[PC] = pc
+        self.registers[i] = [to_int64(value) for value in regs]
+        self.memory[i] = [to_int64(value) for value in memory]
+        self.z[i], self.n[i], self.c[i], self.v[i] = z, n, c, v
+        self.instruction_counts[i] = count
+        self.stores[i] = stores
+        self.halt_reasons[i] = reason
+        return steps
+
+    def run(self, max_instructions=1000):
+        """Run every instance to completion, returns the number of lockstep steps taken"""
+        groups = [(np.arange(self.size), 0)]
+        steps = 0
+        while groups:
+            idx, pc = groups.pop()
+            while True:
+                if len(idx) == 1:
+                    steps += self.run_one(int(idx[0]), pc, max_instructions)
+                    break
+                if pc >= self.file_length:
+                    self.halt(idx, "end_of_program")
+                    break
+                # Instances of a group have always executed the same number of instructions
+                if self.instruction_counts[idx[0]] >= max_instructions:
+                    self.halt(idx, "max_instructions")
+                    break
+                steps += 1
+                successors = self.step(idx, pc)
+                if len(successors) != 1:
+                    groups.extend(successors)
+                    break
+                idx, pc = successors[0]
+        return steps
+
+    def get_results(self):
+        """Final state of every instance as JSON-serializable dicts"""
+        return [{
+            'instance': i,
+            'instructions': int(self.instruction_counts[i]),
+            'halt_reason': self.halt_reasons[i],
+            'registers': [int(value) for value in self.registers[i]],
+            'flags': {'z': bool(self.z[i]), 'n': bool(self.n[i]), 'c': bool(self.c[i]), 'v': bool(self.v[i])}
+        } for i in range(self.size)]
+
+
+def load_instances(filepath):
+    """Read a JSON list of initial states: [{"registers": {"r0": 1}, "memory": {"0x100": 7}}, ...]"""
+    with open(filepath, 'r') as f:
+        instances = json.load(f)
+    if not isinstance(instances, list) or not instances:
+        raise ValueError("Ensemble file must hold a non-empty list of initial states")
+    return instances
+
+
+def run_ensemble(binary_file, instances, max_instructions=1000):
+    """Run one binary from every initial state in lockstep and save the final states"""
+    print(f"Running ensemble of {len(instances)} instances with {binary_file}")
+    ensemble = Ensemble(binary_file, len(instances))
+    for i, instance in enumerate(instances):
+        ensemble.set_registers(i, instance.get('registers', {}))
+        ensemble.set_memory(i, instance.get('memory', {}))
+
+    start = time.perf_counter()
+    steps = ensemble.run(max_instructions)
+    elapsed = time.perf_counter() - start
+    results = ensemble.get_results()
+    instructions = sum(result['instructions'] for result in results)
+
+    reasons = {}
+    for result in results:
+        reasons[result['halt_reason']] = reasons.get(result['halt_reason'], 0) + 1
+    print(f"Simulated {instructions} instructions in {steps} lockstep steps ({elapsed:.3f}s, "
+          f"{instructions / elapsed if elapsed > 0 else 0:.0f} instructions/s)")
+    print("Halt reasons: " + ", ".join(f"{count} {reason.replace('_', ' ')}" for reason, count in sorted(reasons.items())))
+
+    output_file = f"ensemble_results_{os.path.basename(binary_file).split('.')[0]}.json"
+    try:
+        with open(output_file, 'w') as f:
+            json.dump({
+                'binary_file': binary_file,
+                'instances': len(results),
+                'max_instructions': max_instructions,
+                'lockstep_steps': steps,
+                'results': results
+            }, f, indent=2)
+        print(f"Results saved to {output_file}")
+    except Exception as e:
+        print(f"Error saving results: {str(e)}")
+    return 0
@@ -3,8 +3,15 @@
 from registers import get_register, set_register
 from decoder import Instruction
 from memory_hierarchy import read_data_with_cache, write_data_with_cache
+from mmu import TranslationFault
+
+# A store to this address asks the simulator to stop (the stored value is the exit code)
+HALT_ADDRESS = 0xFFFFFFFC
+# Per-instruction trace output; run_program turns it off for quiet and debugger runs
+trace = {'enabled': True}
 
 def execute_instruction(inst: Instruction, C):
+    """Execute one instruction, returns a halt reason if the program asked to stop, otherwise None"""
     if not inst.is_valid:
         print(f"Invalid instruction: 0x{inst.raw:08X}")
         return
@@ -14,25 +21,35 @@ def execute_instruction(inst: Instruction, C):
     rn1 = get_register(inst.rn)
     rm1 = get_register(inst.rm)
 
-    print(f"Executing {inst.mnemonic}, destination register: R{inst.rd}")
+    if trace['enabled']:
+        print(f"Executing {inst.mnemonic}, destination register: R{inst.rd}")
 
     # Handle branch instructions first
     if inst.mnemonic == "B":
         offset = inst.immediate
-        new_pc = pc + offset  # Offset is already adjusted in decoder
+        new_pc = pc + 8 + offset  # Offset is relative to the PC two instructions ahead
         set_register(15, new_pc)
-        print(f"Branch to 0x{new_pc:08X}")
+        if trace['enabled']:
+            print(f"Branch to 0x{new_pc:08X}")
         return
 
+    if inst.mnemonic in ("SWI", "BKPT"):
+        if trace['enabled']:
+            print(f"{inst.mnemonic} #{inst.immediate}: halting")
+        return inst.mnemonic.lower()
+
     # Handle memory operations
     if inst.is_memory_op:
         if inst.mnemonic == "LDR":
             # Load from memory
             address = rn1 + inst.offset
             try:
-                data = read_data_with_cache(address)
+                data = read_data_with_cache(address, pc)
                 set_register(inst.rd, data)
-                print(f"LDR: Loaded 0x{data:08X} from address 0x{address:08X} into R{inst.rd}")
+                if trace['enabled']:
+                    print(f"LDR: Loaded 0x{data:08X} from address 0x{address:08X} into R{inst.rd}")
+            except TranslationFault:
+                raise  # Data aborts stop the run
             except Exception as e:
                 print(f"LDR error at address 0x{address:08X}: {str(e)}")
                 
@@ -40,9 +57,16 @@ def execute_instruction(inst: Instruction, C):
             # Store to memory  
             address = rn1 + inst.offset
             data = get_register(inst.rd)
+            if address & 0xFFFFFFFF == HALT_ADDRESS:
+                if trace['enabled']:
+                    print(f"STR to halt address: exiting with code {data}")
+                return "halt_address"
             try:
-                write_data_with_cache(address, data)
-                print(f"STR: Stored 0x{data:08X} from R{inst.rd} to address 0x{address:08X}")
+                write_data_with_cache(address, data, pc)
+                if trace['enabled']:
+                    print(f"STR: Stored 0x{data:08X} from R{inst.rd} to address 0x{address:08X}")
+            except TranslationFault:
+                raise
             except Exception as e:
                 print(f"STR error at address 0x{address:08X}: {str(e)}")
         return
@@ -115,9 +139,11 @@ def execute_instruction(inst: Instruction, C):
         set_register(inst.rd, result)
 
     elif inst.mnemonic in ["CMP", "CMN", "TST", "TEQ"]:
-        print(f"Known instruction: {inst.mnemonic}, flags updated, no value stored")
+        if trace['enabled']:
+            print(f"Known instruction: {inst.mnemonic}, flags updated, no value stored")
 
     else:
         print(f"Unknown instruction: {inst.mnemonic}")
 
-    print(f"Executed: {inst.mnemonic}")
\ No newline at end of file
+    if trace['enabled']:
+        print(f"Executed: {inst.mnemonic}")
\ No newline at end of file
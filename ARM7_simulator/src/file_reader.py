@@ -17,10 +17,10 @@ __updated__ = "2025-06-24"
 from memory import write_word
 
 
-def load_binary(filename):
+def load_binary(filename, base=0):
     try:
         with open(filename, "rb") as file:
-            address = 0
+            address = base
             while True:
                 buffer = file.read(4)
                 if len(buffer) < 4:
@@ -9,7 +9,7 @@ __updated__ = "2025-06-26"
 -------------------------------------------------------
 """
 # Imports
-from executor import execute_instruction
+from executor import execute_instruction, trace
 from registers import get_register
 # Constants
 flag = {
@@ -63,20 +63,27 @@ def check(raw, decode):
     }
     S = (raw >> 20) & 0x1
     opcode = (raw >> 21) & 0xF
-    print(f"Condition {cond:#X} - {condsNames.get(cond)}")
-    print(
-        f"Current flags, Z={flag['z']}, N={flag['n']}, C={flag['c']}, V={flag['v']}")
+    if trace['enabled']:
+        print(f"Condition {cond:#X} - {condsNames.get(cond)}")
+        print(
+            f"Current flags, Z={flag['z']}, N={flag['n']}, C={flag['c']}, V={flag['v']}")
     if conds.get(cond, False):
-        print("Condition met")
+        if trace['enabled']:
+            print("Condition met")
+        # Only data-processing instructions set flags (bit 20 means something else elsewhere)
+        if decode.mnemonic in ("B", "SWI", "BKPT") or decode.is_memory_op:
+            return True
         if S == 1 or opcode in (0x8, 0x9, 0xA, 0xB):
             flag['z'] = zero(rn, rm)
             flag['n'] = negative(rn, rm, opcode, flag['c'])
             flag['c'] = carry(rn, rm)
             flag['v'] = overflow(rn, rm)
-            print(
-                f"flags updated, Z={flag['z']}, N={flag['n']}, C={flag['c']}, V={flag['v']}")
+            if trace['enabled']:
+                print(
+                    f"flags updated, Z={flag['z']}, N={flag['n']}, C={flag['c']}, V={flag['v']}")
         return True
-    print("Condition not met")
+    if trace['enabled']:
+        print("Condition not met")
     return False
 
 
@@ -0,0 +1,127 @@
+# intervals.py - Interval statistics: per-cache counters sampled every K instructions
+
+import csv
+import json
+from array import array
+
+COUNTERS = ('hits', 'misses', 'writebacks')
+DEFAULT_CAPACITY = 4096  # Snapshots kept in memory; older ones survive only in the output file
+
+
+class IntervalRecorder:
+    """Samples per-cache hits, misses and writebacks plus instruction and cycle counts.
+
+    Each snapshot holds the counts for one interval (the change since the previous
+    snapshot) and is written into a preallocated ring of integers, so a long run
+    keeps only the most recent `capacity` snapshots in memory. If an output file is
+    given (.csv or .jsonl) every snapshot is also appended to it as soon as it is taken.
+    """
+
+    def __init__(self, hierarchy, interval, capacity=DEFAULT_CAPACITY, output=None):
+        if interval <= 0:
+            raise ValueError(f"Interval must be positive: {interval}")
+        if capacity <= 0:
+            raise ValueError(f"Ring capacity must be positive: {capacity}")
+        self.hierarchy = hierarchy
+        self.interval = interval
+        self.capacity = capacity
+        self.names = list(hierarchy.caches)
+        self.l1_names = set(hierarchy.levels[0])
+        # Row layout: interval number, warm-up flag, first and last instruction, cycles, then the cache counters
+        self.columns = ['interval', 'warmup', 'start', 'end', 'cycles'] + \
+                       [f"{name}_{counter}" for name in self.names for counter in COUNTERS]
+        self.width = len(self.columns)
+        self.ring = array('q', bytes(8 * self.width * capacity))
+        self.count = 0
+        self.start = 0
+        self.warmup = False
+        self.previous = self.totals()
+
+        self.file = None
+        self.writer = None
+        if output is not None:
+            if output.endswith('.csv'):
+                self.file = open(output, 'w', newline='')
+                self.writer = csv.writer(self.file)
+                self.writer.writerow(self.columns + ['cost'])
+            elif output.endswith('.jsonl'):
+                self.file = open(output, 'w')
+            else:
+                raise ValueError(f"Interval output must be a .csv or .jsonl file: {output}")
+
+    def totals(self):
+        """Cumulative cycles and cache counters of the hierarchy right now"""
+        hierarchy = self.hierarchy
+        hierarchy.settle_fetches()
+        l1_accesses = sum(hierarchy.caches[name].access_count for name in self.l1_names)
+        # Same sequential estimate as get_total_stats, without branch penalties
+        cycles = hierarchy.core_cycles + hierarchy.foreground_cycles() - l1_accesses * hierarchy.timing.hit_latency(1)
+        values = [cycles]
+        for cache in hierarchy.caches.values():
+            values += [cache.hits, cache.misses, cache.writebacks]
+        return values
+
+    def sample(self, instruction_count):
+        """Close the current interval at instruction_count"""
+        if instruction_count <= self.start:
+            return
+        totals = self.totals()
+        row = [self.count, int(self.warmup), self.start, instruction_count] + \
+              [now - before for now, before in zip(totals, self.previous)]
+        base = (self.count % self.capacity) * self.width
+        self.ring[base:base + self.width] = array('q', row)
+        self.count += 1
+        self.start = instruction_count
+        self.previous = totals
+        if self.file is not None:
+            self.write(row)
+
+    def begin_warmup(self):
+        """Mark the snapshots taken from now on as warm-up"""
+        self.warmup = True
+
+    def end_warmup(self, instruction_count):
+        """Close the warm-up interval before the hierarchy's counters are reset"""
+        self.sample(instruction_count)
+        self.warmup = False
+
+    def counters_reset(self):
+        """The hierarchy's counters were reset: measure the next interval from zero"""
+        self.previous = self.totals()
+
+    def row_cost(self, row):
+        """Cost of one interval, with the same weights as MemoryHierarchy.get_total_stats"""
+        cost = 0
+        for i, name in enumerate(self.names):
+            base = 5 + i * len(COUNTERS)
+            cost += row[base + 1] * (0.5 if name in self.l1_names else 1) + row[base + 2]
+        return cost
+
+    def write(self, row):
+        if self.writer is not None:
+            self.writer.writerow(row + [self.row_cost(row)])
+        else:
+            record = dict(zip(self.columns, row))
+            record['warmup'] = bool(record['warmup'])
+            record['cost'] = self.row_cost(row)
+            self.file.write(json.dumps(record) + "\n")
+
+    def finish(self, instruction_count):
+        """Record the last, possibly partial, interval and close the output file"""
+        self.sample(instruction_count)
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def snapshots(self):
+        """The snapshots still held in the ring, oldest first, as dicts"""
+        first = max(0, self.count - self.capacity)
+        rows = []
+        for n in range(first, self.count):
+            base = (n % self.capacity) * self.width
+            row = list(self.ring[base:base + self.width])
+            record = dict(zip(self.columns, row))
+            record['warmup'] = bool(record['warmup'])
+            record['cost'] = self.row_cost(row)
+            rows.append(record)
+        return rows
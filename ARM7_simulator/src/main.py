@@ -11,13 +11,26 @@ __updated__ = "2025-07-27"
 import sys
 import os
 import json
+import time
+import argparse
+import registers
 from file_reader import load_binary
-from memory import init_memory, read_word
-from registers import init_registers, get_register, set_register, print_registers
+from memory import init_memory, read_word, MEMORY_SIZE
+from registers import init_registers, get_register, set_register, print_registers, NUM_REGISTERS
 from decoder import decode_instruction
-from executor import execute_instruction
+from executor import execute_instruction, trace
 from flags import check, flag
-from memory_hierarchy import init_memory_hierarchy, read_instruction_with_cache
+from memory_hierarchy import init_memory_hierarchy, read_instruction_with_cache, load_topology, COST_FORMULA
+from timing import TimingModel
+from energy import EnergyModel, pareto_front, PARETO_OBJECTIVES
+from debugger import Debugger
+from intervals import IntervalRecorder
+from timeline import TimelineExporter, CLOCKS, DEFAULT_INTERVAL, DEFAULT_EVENTS_PER_INTERVAL
+from mmu import TranslationFault
+from multicore import MultiCoreSystem
+from result_store import ResultStore, DEFAULT_STORE_DIR, DEFAULT_MAX_BYTES, hash_file, result_key
+from sweep import (DEFAULT_SWEEP, DEFAULT_OPTIONS, BranchAndBound, load_sweep_spec, expand_sweep,
+                   config_name, describe_associativity, hierarchy_arguments)
 
 
 def get_bin_file_length(filepath):
@@ -25,219 +38,471 @@ def get_bin_file_length(filepath):
     return os.path.getsize(filepath)
 
 
-def run_single_simulation(binary_file):
-    """Run simulation with default cache configuration"""
-    print(f"Running single simulation with {binary_file}")
-    
-    # Initialize components
-    init_memory()
-    init_registers()
-    
-    if not init_memory_hierarchy():  # Use default configuration
-        print("Failed to initialize memory hierarchy")
-        return 1
+def run_program(file_length, max_instructions=1000, verbose=True, bound=None, check_interval=64, timeout=None,
+                debugger=None, warmup=0, recorder=None, tracer=None):
+    """Run the fetch/decode/execute loop, returns (instructions executed, halt reason)
 
-    if load_binary(binary_file) != 0:
-        print("Failed to load binary file.")
-        return 1
+    The run halts when the PC leaves the program, on SWI/BKPT or a store to HALT_ADDRESS, on an MMU fault,
+    when a backward branch is taken with no change in registers, flags or memory since the
+    last time it was taken (an idle loop), or when the instruction or time budget runs out.
+    If a bound is given, it is consulted every check_interval instructions and the run stops
+    early once bound.exceeded(memory_hierarchy) returns True. A debugger, if given, is asked
+    before every instruction whether to stop and hand control to the user.
 
-    file_length = get_bin_file_length(binary_file)
-    print(f"File length: {file_length} bytes")
-    
+    After the first `warmup` instructions every statistic is reset (cache contents are kept),
+    so the final cost covers only the rest of the run; pruning waits until then. A recorder
+    (IntervalRecorder) is sampled every recorder.interval instructions, and a tracer
+    (TimelineExporter) is told about every instruction and where the core goes next.
+    """
+    from memory_hierarchy import memory_hierarchy
+
+    trace['enabled'] = verbose
     instruction_count = 0
-    max_instructions = 1000  # Safety limit to prevent infinite loops
+    halt_reason = "end_of_program"
+    deadline = time.monotonic() + timeout if timeout else None
+    stores = 0
+    loop_states = {}  # backward branch pc -> machine state when it was last taken
+    if recorder is not None and warmup > 0:
+        recorder.begin_warmup()
+    if tracer is not None and warmup > 0:
+        tracer.begin_warmup()
 
-    while get_register(15) < file_length and instruction_count < max_instructions:
+    while True:
         pc = get_register(15)
-        
+        if pc >= file_length:
+            break
+        if instruction_count >= max_instructions:
+            halt_reason = "max_instructions"
+            break
+        if debugger is not None and debugger.should_stop(pc) and not debugger.prompt(pc):
+            halt_reason = "debugger"
+            break
+
         try:
             # Fetch instruction through cache
             instruction = read_instruction_with_cache(pc)
-            
+
             # Decode instruction
             decoded = decode_instruction(instruction)
             if not decoded.is_valid:
-                print(f"Invalid instruction at PC=0x{pc:08X}: 0x{instruction:08X}")
+                if verbose:
+                    print(f"Invalid instruction at PC=0x{pc:08X}: 0x{instruction:08X}")
+                halt_reason = "invalid_instruction"
                 break
 
-            print(f"\nPC=0x{pc:08X}: {decoded.mnemonic}")
-            
+            if verbose:
+                print(f"\nPC=0x{pc:08X}: {decoded.mnemonic}")
+
             # Check condition and execute
-            if check(instruction, decoded):
-                execute_instruction(decoded, 1 if flag['c'] else 0)
-            
+            halt = None
+            executed = check(instruction, decoded)
+            if executed:
+                halt = execute_instruction(decoded, 1 if flag['c'] else 0)
+                if decoded.mnemonic == "STR":
+                    stores += 1
+
+            # Conditional instructions and branches are reported to the branch unit
+            conditional = (instruction >> 28) & 0xF != 0xE
+            if decoded.mnemonic == "B":
+                memory_hierarchy.record_branch(pc, conditional, executed, pc + 8 + decoded.immediate)
+            elif conditional:
+                memory_hierarchy.record_predicated(executed)
+
+            instruction_count += 1
+            memory_hierarchy.charge_instruction(instruction, decoded, executed)
+            if recorder is not None and instruction_count % recorder.interval == 0:
+                recorder.sample(instruction_count)
+            if instruction_count == warmup:
+                if recorder is not None:
+                    recorder.end_warmup(instruction_count)
+                if tracer is not None:
+                    tracer.end_warmup(instruction_count)
+                memory_hierarchy.begin_measurement()
+                if recorder is not None:
+                    recorder.counters_reset()
+                if tracer is not None:
+                    tracer.counters_reset()
+            if halt is not None:
+                halt_reason = halt
+                break
+
+            # A taken backward branch that finds the machine exactly as last time can never exit
+            branched = executed and decoded.mnemonic == "B"
+            if branched and get_register(15) <= pc:
+                state = (tuple(registers.registers), tuple(flag.values()), stores)
+                if loop_states.get(pc) == state:
+                    if verbose:
+                        print(f"Idle loop detected at PC=0x{pc:08X}, halting")
+                    halt_reason = "idle_loop"
+                    break
+                loop_states[pc] = state
+
             # Update PC if not modified by instruction
-            if get_register(15) == pc:
+            if get_register(15) == pc and not branched:
                 set_register(15, pc + 4)
-            
-            instruction_count += 1
-            
+            if tracer is not None:
+                tracer.step(pc, get_register(15), instruction_count)
+
+            if instruction_count % check_interval == 0:
+                if bound is not None and instruction_count >= warmup and bound.exceeded(memory_hierarchy):
+                    halt_reason = "pruned"
+                    break
+                if deadline is not None and time.monotonic() > deadline:
+                    halt_reason = "timeout"
+                    break
+
+        except TranslationFault as e:
+            print(f"{str(e)} (PC=0x{pc:08X})")
+            halt_reason = "translation_fault"
+            break
         except Exception as e:
             print(f"Error executing instruction at PC=0x{pc:08X}: {str(e)}")
+            halt_reason = "error"
             break
 
-    print(f"\nSimulation completed after {instruction_count} instructions")
+    memory_hierarchy.drain_write_buffers()
+    return instruction_count, halt_reason
+
+
+def run_single_simulation(binary_file, timing=None, levels=None, max_instructions=1000, timeout=None,
+                          branch_predictor=None, pipeline=None, debug_commands=None, interval=None,
+                          interval_output=None, warmup=0, mmu=None, energy=None, dram=None, timeline=None):
+    """Run simulation with the default cache configuration or an explicit topology
+
+    If debug_commands is given (a list of debugger commands, possibly empty) the run starts
+    stopped in the debugger, without per-instruction tracing. With an interval, per-cache
+    counters are sampled every interval instructions (and streamed to interval_output).
+    timeline is a dict of TimelineExporter arguments ('output', 'clock', 'interval',
+    'events_per_interval') to stream a trace-event timeline of the run.
+    """
+    print(f"Running single simulation with {binary_file}")
+    
+    # Initialize components
+    init_memory()
+    init_registers()
+    
+    if not init_memory_hierarchy(timing=timing, levels=levels, branch_predictor=branch_predictor,
+                                 pipeline=pipeline, mmu=mmu, energy=energy, dram=dram):  # Default configuration unless a topology is given
+        print("Failed to initialize memory hierarchy")
+        return 1
+
+    if load_binary(binary_file) != 0:
+        print("Failed to load binary file.")
+        return 1
+
+    file_length = get_bin_file_length(binary_file)
+    print(f"File length: {file_length} bytes")
+    
+    from memory_hierarchy import memory_hierarchy
+    debugger = None
+    if debug_commands is not None:
+        debugger = Debugger(memory_hierarchy, debug_commands)
+    recorder = None
+    if interval:
+        try:
+            recorder = IntervalRecorder(memory_hierarchy, interval, output=interval_output)
+        except (OSError, ValueError) as e:
+            print(f"Error setting up interval statistics: {str(e)}")
+            return 1
+    tracer = None
+    if timeline:
+        try:
+            tracer = TimelineExporter(memory_hierarchy, **timeline)
+        except (OSError, ValueError) as e:
+            print(f"Error setting up timeline export: {str(e)}")
+            return 1
+    instruction_count, halt_reason = run_program(file_length, max_instructions, verbose=debugger is None,
+                                                 timeout=timeout, debugger=debugger, warmup=warmup,
+                                                 recorder=recorder, tracer=tracer)
+    if debugger is not None:
+        debugger.detach()
+    if recorder is not None:
+        recorder.finish(instruction_count)
+        print(f"\nInterval statistics ({recorder.count} intervals of {interval} instructions):")
+        for snapshot in recorder.snapshots()[-20:]:
+            misses = ", ".join(f"{name} {snapshot[f'{name}_misses']}" for name in recorder.names)
+            print(f"  [{snapshot['start']:>6}, {snapshot['end']:>6}){' warm-up' if snapshot['warmup'] else ''}: "
+                  f"{snapshot['cycles']} cycles, misses {misses}, cost {snapshot['cost']:.2f}")
+        if interval_output:
+            print(f"Interval statistics saved to {interval_output}")
+    if tracer is not None:
+        tracer.finish(instruction_count, halt_reason)
+        print(f"\nTimeline saved to {timeline['output']} ({tracer.written} events, {tracer.dropped} dropped by the rate limit)")
+    if warmup and instruction_count >= warmup:
+        print(f"Statistics exclude the first {warmup} instructions (warm-up)")
+
+    print(f"\nSimulation completed after {instruction_count} instructions ({halt_reason.replace('_', ' ')})")
     print("\nFinal Register States:")
     print_registers()
     
     # Print cache statistics
-    from memory_hierarchy import memory_hierarchy
     if memory_hierarchy:
         memory_hierarchy.print_stats()
     
     return 0
 
 
-def run_cache_experiments(binary_file):
-    """Run experiments with different cache configurations"""
+def run_multicore_simulation(binary_files, num_cores, quantum=100, max_instructions=1000, timing=None,
+                             timeout=None):
+    """Run several cores round-robin, quantum instructions at a time, over a shared L2
+
+    With one binary every core runs the same code from address 0; otherwise binary i is
+    loaded into slot i of memory and core i starts there.
+    """
+    if len(binary_files) not in (1, num_cores):
+        print(f"Error: give one binary or one per core ({num_cores}), got {len(binary_files)}")
+        return 1
+    print(f"Running {num_cores}-core simulation with {', '.join(binary_files)}")
+
+    init_memory()
+    init_registers()
+    try:
+        system = MultiCoreSystem(num_cores, timing)
+    except ValueError as e:
+        print(f"Failed to initialize multi-core system: {str(e)}")
+        return 1
+
+    slot = (MEMORY_SIZE // num_cores) & ~3 if len(binary_files) > 1 else 0
+    for core_id in range(num_cores):
+        binary_file = binary_files[core_id] if len(binary_files) > 1 else binary_files[0]
+        base = core_id * slot
+        length = get_bin_file_length(binary_file)
+        if len(binary_files) > 1 and length > slot:
+            print(f"Error: {binary_file} ({length} bytes) does not fit in its {slot}-byte memory slot")
+            return 1
+        if (core_id == 0 or len(binary_files) > 1) and load_binary(binary_file, base) != 0:
+            print("Failed to load binary file.")
+            return 1
+        system.add_core(base, base + length)
+
+    system.run(quantum, max_instructions, timeout)
+
+    print(f"\nSimulation completed after {sum(core.instruction_count for core in system.cores)} instructions")
+    for core in system.cores:
+        print(f"\nCore {core.core_id} Register States:")
+        for i in range(NUM_REGISTERS):
+            print(f"R{i:<2}: 0x{core.registers[i] & 0xFFFFFFFF:08X}, {core.registers[i]}")
+    system.print_stats()
+    return 0
+
+
+# Metrics that can be used to pick the best configuration (lower is better)
+RANK_METRICS = {
+    'cost': lambda result: result['cost'],
+    'cycles': lambda result: result['total_cycles'],
+    'energy': lambda result: result['energy']['total'],
+    'edp': lambda result: result['energy']['edp']
+}
+
+
+def run_configuration(binary_file, config, timing=None, max_instructions=1000, bound=None, check_interval=64,
+                      timeout=None, warmup=0, energy=None):
+    """Simulate the binary under one cache configuration, returns the result dict or None on failure"""
+    # Reset everything for each configuration
+    init_memory()
+    init_registers()
     
-    # Configuration parameters
-    l1_block_sizes = [4, 8, 16, 32]
-    l2_block_sizes = [16, 32, 64]
+    # Initialize memory hierarchy with specific configuration
+    # FIXED: Don't set memory_hierarchy to None before initializing
+    if not init_memory_hierarchy(timing=timing, energy=energy, **hierarchy_arguments(config)):
+        print(f"! Failed to initialize memory hierarchy for this configuration !")
+        return None
+        
+    # Load binary
+    if load_binary(binary_file) != 0:
+        print("Failed to load binary file")
+        return None
+
+    # Get the memory hierarchy instance for stats collection
+    from memory_hierarchy import memory_hierarchy
+    if memory_hierarchy is None:
+        print("Error: Memory hierarchy is None after initialization")
+        return None
+
+    # Run simulation
+    file_length = get_bin_file_length(binary_file)
+    instruction_count, halt_reason = run_program(file_length, max_instructions, verbose=False, bound=bound,
+                                                 check_interval=check_interval, timeout=timeout, warmup=warmup)
     
-    configurations = []
+    # FIXED: Collect statistics properly - verify memory_hierarchy is still valid
+    if memory_hierarchy is None or not hasattr(memory_hierarchy, 'get_total_stats'):
+        print("Error: Memory hierarchy lost during simulation")
+        return None
+        
+    try:
+        stats = memory_hierarchy.get_total_stats()
+    except Exception as e:
+        print(f"Error collecting stats: {str(e)}")
+        return None
     
-    # Generate all valid combinations
-    for l1_block in l1_block_sizes:
-        for l2_block in l2_block_sizes:
-            # Direct mapped L1 (associativity = 1)
-            configurations.append((l1_block, l2_block, 1, "Direct-mapped"))
-            
-            # Fully associative L1 (maximum associativity)
-            l1_cache_size = 1024  # 1KB
-            max_associativity = l1_cache_size // l1_block
-            configurations.append((l1_block, l2_block, max_associativity, f"Fully-associative({max_associativity})"))
+    result = dict(config)
+    result.update({
+        'config': config_name(config),
+        'associativity_desc': describe_associativity(config['l1_associativity'], config['l1_size'], config['l1_block_size'])
+                              if config['levels'] is None else None,
+        'cache_stats': {name: {key: cache[key] for key in ('hits', 'misses', 'writebacks', 'hit_rate', 'compulsory_misses',
+                                                           'capacity_misses', 'conflict_misses')}
+                        for name, cache in stats['caches'].items()},
+        'miss_classes': {level['level']: {key: level[key] for key in ('compulsory_misses', 'capacity_misses', 'conflict_misses')}
+                         for level in stats['levels']},
+        'total_l1_misses': stats['total_l1_misses'],
+        'total_l2_misses': stats['total_l2_misses'],
+        'writebacks': stats['total_writebacks'],
+        'write_traffic': stats['total_write_traffic'],
+        'buffer_stalls': stats['buffer_stalls'],
+        'prefetches_issued': stats['prefetches_issued'],
+        'prefetches_useful': stats['prefetches_useful'],
+        'prefetch_stats': {name: cache['prefetch'] for name, cache in stats['caches'].items() if 'prefetch' in cache},
+        'inclusion_stats': {name: {key: cache[key] for key in ('inclusion', 'back_invalidations', 'victim_fills',
+                                                               'occupancy', 'effective_capacity')}
+                            for name, cache in stats['caches'].items() if 'effective_capacity' in cache},
+        'cost': stats['cost'],
+        'instruction_count': instruction_count,
+        'halt_reason': halt_reason,
+        'warmup_instructions': min(warmup, instruction_count),
+        'total_cycles': stats['total_cycles'],
+        'stall_cycles': stats['stall_cycles'],
+        'cpi': stats['cpi'],
+        'amat': stats['amat'],
+        'branch_stats': stats['branch'],
+        'pipeline_stats': stats['pipeline'],
+        'mmu_stats': stats['mmu'],
+        'dram_stats': stats['dram'],
+        'energy': stats['energy']
+    })
+    return result
+
+
+def run_or_reuse(binary_file, config, options, timing=None, bound=None, store=None, binary_hash=None, energy=None):
+    """run_configuration through the result store: serve a stored result, or simulate and keep a complete one"""
+    key = None
+    if store is not None:
+        key_config = hierarchy_arguments(config)
+        if options['warmup']:
+            key_config['warmup'] = options['warmup']
+        if energy is not None:
+            key_config['energy'] = energy.to_dict()
+        timing_params = (timing if timing is not None else TimingModel()).to_dict()
+        key = result_key(binary_hash, key_config, timing_params, options['max_instructions'])
+        result = store.get(key)
+        if result is not None:
+            print("↺ Served from result store")
+            return result
+    result = run_configuration(binary_file, config, timing, options['max_instructions'], bound,
+                               options['check_interval'], options['timeout'], options['warmup'], energy)
+    # Only complete runs are reusable; pruned or timed-out runs depend on circumstances
+    if result is not None and store is not None and result['halt_reason'] not in ('pruned', 'timeout'):
+        store.put(key, result)
+    return result
+
+
+def run_cache_experiments(binary_file, timing=None, rank_by='cost', sweep_file=None, prune=None, store=None,
+                          max_instructions=None, timeout=None, warmup=None, energy=None):
+    """Run experiments with different cache configurations
+
+    Completed runs are saved to the result store (if given) as soon as they finish, so an
+    unchanged point is never simulated twice and an interrupted sweep resumes where it stopped.
+    """
+    if rank_by not in RANK_METRICS:
+        raise ValueError(f"Unknown ranking metric: {rank_by}. Must be one of {sorted(RANK_METRICS)}")
+    
+    # Configuration parameters come from the sweep spec (or the built-in grid)
+    if sweep_file:
+        axes, options = load_sweep_spec(sweep_file)
+    else:
+        axes, options = dict(DEFAULT_SWEEP), dict(DEFAULT_OPTIONS)
+    if prune is not None:
+        options['prune'] = prune
+    if max_instructions is not None:
+        options['max_instructions'] = max_instructions
+    if timeout is not None:
+        options['timeout'] = timeout
+    if warmup is not None:
+        options['warmup'] = warmup
+    configurations, skipped = expand_sweep(axes)
     
     results = []
+    pruned = []
     best_config = None
-    best_cost = float('inf')
+    best_by_metric = {name: None for name in RANK_METRICS}
     successful_configs = 0
+    bound = BranchAndBound(RANK_METRICS[rank_by]) if options['prune'] else None
+    full_run_length = None
+    binary_hash = hash_file(binary_file) if store is not None else None
     
     print(f"\n{'='*80}")
     print(f"CACHE CONFIGURATION EXPERIMENTS FOR {binary_file}")
-    print(f"Testing {len(configurations)} different configurations")
+    print(f"Testing {len(configurations)} different configurations ({skipped} invalid points skipped)")
     print(f"{'='*80}")
     
-    for i, (l1_block, l2_block, l1_assoc, assoc_desc) in enumerate(configurations):
-        print(f"\nConfiguration {i+1}/{len(configurations)}:")
-        print(f"L1: {l1_block}B blocks, {assoc_desc}")
-        print(f"L2: {l2_block}B blocks, Direct-mapped")
+    for i, config in enumerate(configurations):
+        print(f"\nConfiguration {i+1}/{len(configurations)}: {config_name(config)}")
 
         try:
-            # Reset everything for each configuration
-            init_memory()
-            init_registers()
-            
-            # Initialize memory hierarchy with specific configuration
-            # FIXED: Don't set memory_hierarchy to None before initializing
-            if not init_memory_hierarchy(l1_block, l2_block, l1_assoc):
-                print(f"! Failed to initialize memory hierarchy for this configuration !")
-                continue
-                
-            # Load binary
-            if load_binary(binary_file) != 0:
-                print("Failed to load binary file")
+            if bound is not None:
+                bound.start_run()
+            result = run_or_reuse(binary_file, config, options, timing, bound, store, binary_hash, energy)
+            if result is None:
                 continue
+            result['config_id'] = i+1
 
-            # Get the memory hierarchy instance for stats collection
-            from memory_hierarchy import memory_hierarchy
-            if memory_hierarchy is None:
-                print("Error: Memory hierarchy is None after initialization")
+            # Pruned runs are already worse than the incumbent, so they cannot be the best
+            if bound is not None and bound.triggered:
+                pruned.append({'config_id': i+1, 'config': result['config'],
+                               'instructions_simulated': result['instruction_count']})
+                print(f"✂ Pruned after {result['instruction_count']} instructions ({rank_by} already exceeds best)")
                 continue
 
-            # Run simulation
-            file_length = get_bin_file_length(binary_file)
-            instruction_count = 0
-            max_instructions = 1000  # Safety limit
-            
-            while get_register(15) < file_length and instruction_count < max_instructions:
-                pc = get_register(15)
-                
-                try:
-                    # Fetch instruction through cache
-                    instruction = read_instruction_with_cache(pc)
-                    
-                    # Decode instruction
-                    decoded = decode_instruction(instruction)
-                    if not decoded.is_valid:
-                        break
-
-                    # Check condition and execute
-                    if check(instruction, decoded):
-                        execute_instruction(decoded, 1 if flag['c'] else 0)
-                    
-                    # Update PC if not modified by instruction
-                    if get_register(15) == pc:
-                        set_register(15, pc + 4)
-                    
-                    instruction_count += 1
-                        
-                except Exception as e:
-                    print(f"Error at PC=0x{pc:08X}: {str(e)}")
-                    break
-            
-            # FIXED: Collect statistics properly - verify memory_hierarchy is still valid
-            if memory_hierarchy is None or not hasattr(memory_hierarchy, 'get_total_stats'):
-                print("Error: Memory hierarchy lost during simulation")
-                continue
-                
-            try:
-                stats = memory_hierarchy.get_total_stats()
-            except Exception as e:
-                print(f"Error collecting stats: {str(e)}")
-                continue
-                
-            config_name = f"L1:{l1_block}B-{assoc_desc}_L2:{l2_block}B-DM"
-            
-            # Calculate cost using the specified formula
-            total_l1_misses = stats['l1_instruction_cache']['misses'] + stats['l1_data_cache']['misses']
-            total_l2_misses = stats['l2_cache']['misses']
-            total_writebacks = stats['l1_instruction_cache']['writebacks'] + \
-                            stats['l1_data_cache']['writebacks'] + \
-                            stats['l2_cache']['writebacks']
-            cost = 0.5 * total_l1_misses + total_l2_misses + total_writebacks
-            
-            result = {
-                'config_id': i+1,
-                'config': config_name,
-                'l1_block_size': l1_block,
-                'l2_block_size': l2_block,
-                'l1_associativity': l1_assoc,
-                'associativity_desc': assoc_desc,
-                'l1_instruction_hits': stats['l1_instruction_cache']['hits'],
-                'l1_instruction_misses': stats['l1_instruction_cache']['misses'],
-                'l1_data_hits': stats['l1_data_cache']['hits'],
-                'l1_data_misses': stats['l1_data_cache']['misses'],
-                'l2_hits': stats['l2_cache']['hits'],
-                'l2_misses': stats['l2_cache']['misses'],
-                'total_l1_misses': total_l1_misses,
-                'total_l2_misses': total_l2_misses,
-                'writebacks': total_writebacks,
-                'cost': cost,
-                'instruction_count': instruction_count
-            }
             results.append(result)
             successful_configs += 1
+            if full_run_length is None:
+                full_run_length = result['instruction_count']
+            if bound is not None:
+                bound.complete_run(RANK_METRICS[rank_by](result))
             
-            # Update best configuration if this one is better
-            if cost < best_cost:
-                best_cost = cost
-                best_config = result
+            # Update best configuration under every metric
+            for name, key in RANK_METRICS.items():
+                if best_by_metric[name] is None or key(result) < key(best_by_metric[name]):
+                    best_by_metric[name] = result
+            best_config = best_by_metric[rank_by]
             
             # Print stats for this configuration
-            print(f"Instructions executed: {instruction_count}")
-            print(f"Cost: {cost:.2f}")
-            print(f"L1 I-Cache: {stats['l1_instruction_cache']['hits']} hits, {stats['l1_instruction_cache']['misses']} misses")
-            print(f"L1 D-Cache: {stats['l1_data_cache']['hits']} hits, {stats['l1_data_cache']['misses']} misses")
-            print(f"L2 Cache: {stats['l2_cache']['hits']} hits, {stats['l2_cache']['misses']} misses")
-            print(f"Writebacks: {total_writebacks}")
+            print(f"Instructions executed: {result['instruction_count']} ({result['halt_reason'].replace('_', ' ')})")
+            print(f"Cost: {result['cost']:.2f}")
+            print(f"Cycles: {result['total_cycles']} (CPI: {result['cpi']:.3f}, AMAT: {result['amat']:.3f})")
+            print(f"Energy: {result['energy']['total']:.1f} pJ (EDP: {result['energy']['edp']:.4g})")
+            for name, cache in result['cache_stats'].items():
+                print(f"{name} Cache: {cache['hits']} hits, {cache['misses']} misses "
+                      f"({cache['compulsory_misses']} compulsory, {cache['capacity_misses']} capacity, "
+                      f"{cache['conflict_misses']} conflict)")
+            print(f"Writebacks: {result['writebacks']}")
             print("✓ Configuration completed successfully")
             
         except Exception as e:
             print(f"Error in configuration {i+1}: {str(e)}")
             print("✗ Configuration failed")
             continue
+
+    # Work saved by pruning, measured against the length of a full run
+    pruned_instructions = sum(p['instructions_simulated'] for p in pruned)
+    full_run_length = full_run_length or 0
+    instructions_saved = sum(max(0, full_run_length - p['instructions_simulated']) for p in pruned)
+    pruning_report = {
+        'enabled': bool(options['prune']),
+        'metric': rank_by,
+        'configurations_pruned': len(pruned),
+        'instructions_simulated_in_pruned_runs': pruned_instructions,
+        'instructions_saved': instructions_saved,
+        'work_saved_fraction': instructions_saved / (full_run_length * len(configurations)) if full_run_length and configurations else 0,
+        'pruned_configurations': pruned
+    }
     
+    # Configurations no other beats on cycles, energy and area at once
+    front = pareto_front(results)
+
+    # Pruning only compares runs on rank_by, so bests under the other metrics would come from a subset
+    best_fields = {f"best_by_{name}": best for name, best in best_by_metric.items() if not pruned or name == rank_by}
+
     # Save results to file
     output_file = f"cache_results_{os.path.basename(binary_file).replace('.bin', '')}.json"
     try:
@@ -245,9 +510,24 @@ def run_cache_experiments(binary_file):
             json.dump({
                 'binary_file': binary_file,
                 'total_configurations_tested': successful_configs,
+                'sweep': axes,
                 'configurations': results,
                 'best_configuration': best_config,
-                'cost_formula': 'Cost = 0.5 * L1_misses + L2_misses + writebacks'
+                'rank_by': rank_by,
+                **best_fields,
+                'pareto_front': {
+                    'objectives': list(PARETO_OBJECTIVES),
+                    'scope': "unpruned configurations" if pruned else "all configurations",
+                    'configurations': [{'config_id': r['config_id'], 'config': r['config'],
+                                        'total_cycles': r['total_cycles'], 'energy': r['energy']['total'],
+                                        'area': r['energy']['area']} for r in front]
+                },
+                'pruning': pruning_report,
+                'result_store': store.get_stats() if store is not None else None,
+                'cost_formula': COST_FORMULA,
+                'warmup_instructions': options['warmup'],
+                'timing_model': (timing if timing is not None else TimingModel()).to_dict(),
+                'energy_model': (energy if energy is not None else EnergyModel()).to_dict()
             }, f, indent=2)
         print(f"\nResults saved to: {output_file}")
     except Exception as e:
@@ -257,16 +537,23 @@ def run_cache_experiments(binary_file):
     print(f"\n{'='*80}")
     print("EXPERIMENT SUMMARY:")
     print(f"Tested {successful_configs} configurations successfully")
+    print(f"Pareto-optimal on {', '.join(PARETO_OBJECTIVES)}: {', '.join(str(r['config_id']) for r in front) or 'none'}")
+    if options['prune']:
+        print(f"Pruned {len(pruned)} configurations, saving ~{instructions_saved} simulated instructions "
+              f"({pruning_report['work_saved_fraction']:.1%} of the sweep)")
     
     if best_config:
-        print(f"\nBEST CONFIGURATION:")
+        print(f"\nBEST CONFIGURATION (by {rank_by}):")
         print(f"Config: {best_config['config']}")
-        print(f"L1 Block Size: {best_config['l1_block_size']}B")
-        print(f"L2 Block Size: {best_config['l2_block_size']}B")
-        print(f"L1 Associativity: {best_config['associativity_desc']}")
+        if best_config['levels'] is None:
+            print(f"L1 Block Size: {best_config['l1_block_size']}B")
+            print(f"L2 Block Size: {best_config['l2_block_size']}B")
+            print(f"L1 Associativity: {best_config['associativity_desc']}")
         print(f"Cost: {best_config['cost']:.2f}")
+        print(f"Cycles: {best_config['total_cycles']} (CPI: {best_config['cpi']:.3f}, AMAT: {best_config['amat']:.3f})")
+        print(f"Energy: {best_config['energy']['total']:.1f} pJ (EDP: {best_config['energy']['edp']:.4g})")
         print(f"L1 Misses: {best_config['total_l1_misses']}")
-        print(f"L2 Misses: {best_config['total_l2_misses']}")
+        print(f"Lower-Level Misses: {best_config['total_l2_misses']}")
         print(f"Writebacks: {best_config['writebacks']}")
         print(f"Instructions: {best_config['instruction_count']}")
     else:
@@ -276,24 +563,216 @@ def run_cache_experiments(binary_file):
     return 0
 
 
-def main():
-    if len(sys.argv) < 2:
-        print(f"Usage: {sys.argv[0]} <binary_file> [--experiments]")
-        print(f"  <binary_file>     : ARM binary file to simulate")
-        print(f"  --experiments     : Run cache configuration experiments")
-        return 1
+def parse_arguments(argv):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="ARM simulator with cache hierarchy")
+    parser.add_argument('binary_file', nargs='+', help="ARM binary file to simulate (one per core with --cores)")
+    parser.add_argument('--experiments', action='store_true', help="Run cache configuration experiments")
+    parser.add_argument('--timing', metavar='FILE', help="JSON file with timing model parameters")
+    parser.add_argument('--energy', metavar='FILE', help="JSON file with cache energy/area table and energy parameters")
+    parser.add_argument('--rank-by', choices=sorted(RANK_METRICS), default='cost',
+                        help="Metric used to pick the best experiment configuration")
+    parser.add_argument('--sweep', metavar='FILE', help="JSON/TOML file describing the experiment design space")
+    parser.add_argument('--hierarchy', metavar='FILE', help="JSON/TOML file describing the cache levels for a single run")
+    parser.add_argument('--max-instructions', type=int, metavar='N',
+                        help="Instruction budget per run (default 1000, or the sweep spec's option)")
+    parser.add_argument('--timeout', type=float, metavar='SECONDS', help="Wall-clock budget per run")
+    parser.add_argument('--branch-predictor', metavar='SPEC',
+                        help="Branch predictor for a single run: static, bimodal, gshare or a JSON object")
+    parser.add_argument('--pipeline', action='store_true', help="Estimate cycles with a five-stage pipeline model")
+    parser.add_argument('--no-forwarding', action='store_true', help="Disable operand forwarding in the pipeline model")
+    parser.add_argument('--mmu', nargs='?', const='default', metavar='SPEC',
+                        help="Translate addresses through TLBs and a page table (JSON spec or file; default identity map)")
+    parser.add_argument('--dram', nargs='?', const='default', metavar='SPEC',
+                        help="Time main memory with banks and row buffers (JSON spec or file; default 1 channel, 8 banks)")
+    parser.add_argument('--cores', type=int, default=1, help="Number of cores sharing the L2 (MESI-coherent L1Ds)")
+    parser.add_argument('--quantum', type=int, default=100, help="Instructions each core runs before the next one")
+    parser.add_argument('--debug', action='store_true', help="Start a single run stopped in the debugger")
+    parser.add_argument('--debug-script', metavar='FILE', help="Debugger commands to run before reading from stdin")
+    parser.add_argument('--no-cache', action='store_true', help="Do not reuse or save experiment results on disk")
+    parser.add_argument('--cache-dir', default=DEFAULT_STORE_DIR, help="Directory of the persistent result store")
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="Size limit of the result store before old entries are evicted")
+    parser.add_argument('--no-prune', action='store_true', help="Simulate every configuration to completion")
+    parser.add_argument('--consumers', type=int, metavar='N',
+                        help="Run the experiment caches in N consumer processes fed by one functional run")
+    parser.add_argument('--interval', type=int, metavar='K', help="Sample per-cache statistics every K instructions")
+    parser.add_argument('--interval-output', metavar='FILE', help="Stream interval statistics to a .csv or .jsonl file")
+    parser.add_argument('--warmup', type=int, metavar='N', help="Exclude the first N instructions from the statistics")
+    parser.add_argument('--timeline', metavar='FILE', help="Stream a Chrome/Perfetto trace-event JSON timeline of a single run")
+    parser.add_argument('--timeline-clock', choices=CLOCKS, default="instructions",
+                        help="Timeline timestamps: instruction count or modeled cycles")
+    parser.add_argument('--timeline-interval', type=int, default=DEFAULT_INTERVAL, metavar='K',
+                        help="Instructions per timeline interval span and hit-rate sample")
+    parser.add_argument('--timeline-rate', type=int, default=DEFAULT_EVENTS_PER_INTERVAL, metavar='N',
+                        help="Most basic-block spans and miss/writeback events kept per timeline interval")
+    parser.add_argument('--search', type=int, metavar='EVALUATIONS',
+                        help="Search the sweep's design space heuristically with this many simulations")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed of the heuristic search")
+    parser.add_argument('--time-budget', type=float, metavar='SECONDS', help="Stop the heuristic search after this long")
+    parser.add_argument('--ensemble', metavar='FILE',
+                        help="JSON list of initial register/memory states to run in lockstep (needs NumPy)")
+    return parser.parse_args(argv)
 
-    binary_file = sys.argv[1]
+
+def main():
+    args = parse_arguments(sys.argv[1:])
+    binary_file = args.binary_file[0]
     
     # Check if binary file exists
-    if not os.path.exists(binary_file):
-        print(f"Error: Binary file '{binary_file}' not found!")
+    for path in args.binary_file:
+        if not os.path.exists(path):
+            print(f"Error: Binary file '{path}' not found!")
+            return 1
+    if len(args.binary_file) > 1 and args.cores == 1:
+        print("Error: several binaries need --cores")
         return 1
+
+    timing = None
+    if args.timing:
+        try:
+            timing = TimingModel.from_file(args.timing)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Error loading timing model: {str(e)}")
+            return 1
+    energy = None
+    if args.energy:
+        try:
+            energy = EnergyModel.from_file(args.energy)
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            print(f"Error loading energy model: {str(e)}")
+            return 1
     
-    if len(sys.argv) > 2 and sys.argv[2] == "--experiments":
-        return run_cache_experiments(binary_file)
+    if args.warmup is not None and args.warmup < 0:
+        print("Error: --warmup must not be negative")
+        return 1
+    if args.interval is not None and args.interval <= 0:
+        print("Error: --interval must be positive")
+        return 1
+    if args.interval_output and not args.interval:
+        print("Error: --interval-output needs --interval")
+        return 1
+    if args.timeline_interval <= 0:
+        print("Error: --timeline-interval must be positive")
+        return 1
+    if args.timeline_rate < 0:
+        print("Error: --timeline-rate must not be negative")
+        return 1
+    if args.max_instructions is not None and args.max_instructions <= 0:
+        print("Error: --max-instructions must be positive")
+        return 1
+    if args.timeout is not None and args.timeout <= 0:
+        print("Error: --timeout must be positive")
+        return 1
+    max_instructions = args.max_instructions if args.max_instructions is not None else DEFAULT_OPTIONS['max_instructions']
+
+    if args.ensemble:
+        try:
+            from ensemble import load_instances, run_ensemble
+            return run_ensemble(binary_file, load_instances(args.ensemble), max_instructions)
+        except (ImportError, OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"Error running ensemble: {str(e)}")
+            return 1
+
+    if args.cores > 1:
+        if args.quantum <= 0:
+            print("Error: --quantum must be positive")
+            return 1
+        return run_multicore_simulation(args.binary_file, args.cores, args.quantum, max_instructions,
+                                        timing, args.timeout)
+
+    if args.search is not None:
+        if args.search <= 0:
+            print("Error: --search needs a positive number of evaluations")
+            return 1
+        try:
+            from search import run_search
+            store = None
+            if not args.no_cache:
+                store = ResultStore(args.cache_dir, int(args.cache_max_mb * 1024 * 1024))
+            return run_search(binary_file, args.search, args.seed, timing, args.rank_by, args.sweep, store,
+                              args.max_instructions, args.timeout, args.warmup, energy, args.time_budget)
+        except (OSError, ValueError) as e:
+            print(f"Error running search: {str(e)}")
+            return 1
+
+    if args.experiments and args.consumers:
+        try:
+            from offload import run_offloaded_experiments
+            return run_offloaded_experiments(binary_file, timing, args.sweep, args.consumers,
+                                             args.max_instructions, args.timeout, args.rank_by, args.warmup, energy)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"Error running offloaded experiments: {str(e)}")
+            return 1
+
+    if args.experiments:
+        try:
+            store = None
+            if not args.no_cache:
+                store = ResultStore(args.cache_dir, int(args.cache_max_mb * 1024 * 1024))
+            return run_cache_experiments(binary_file, timing, args.rank_by, args.sweep,
+                                         False if args.no_prune else None, store,
+                                         args.max_instructions, args.timeout, args.warmup, energy)
+        except (OSError, ValueError) as e:
+            print(f"Error loading sweep spec: {str(e)}")
+            return 1
     else:
-        return run_single_simulation(binary_file)
+        levels = None
+        if args.hierarchy:
+            try:
+                levels = load_topology(args.hierarchy)
+            except (OSError, ValueError) as e:
+                print(f"Error loading hierarchy: {str(e)}")
+                return 1
+        debug_commands = None
+        if args.debug or args.debug_script:
+            debug_commands = []
+            if args.debug_script:
+                try:
+                    with open(args.debug_script, 'r') as f:
+                        debug_commands = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+                except OSError as e:
+                    print(f"Error reading debugger script: {str(e)}")
+                    return 1
+        branch_predictor = args.branch_predictor
+        if branch_predictor and branch_predictor.lstrip().startswith('{'):
+            try:
+                branch_predictor = json.loads(branch_predictor)
+            except ValueError as e:
+                print(f"Error parsing branch predictor: {str(e)}")
+                return 1
+        mmu = args.mmu
+        if mmu and mmu != 'default':
+            try:
+                if mmu.lstrip().startswith('{'):
+                    mmu = json.loads(mmu)
+                else:
+                    with open(mmu, 'r') as f:
+                        mmu = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error loading MMU spec: {str(e)}")
+                return 1
+        timeline = None
+        if args.timeline:
+            timeline = {'output': args.timeline, 'clock': args.timeline_clock, 'interval': args.timeline_interval,
+                        'events_per_interval': args.timeline_rate}
+        dram = args.dram
+        if dram and dram != 'default':
+            try:
+                if dram.lstrip().startswith('{'):
+                    dram = json.loads(dram)
+                else:
+                    with open(dram, 'r') as f:
+                        dram = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error loading DRAM spec: {str(e)}")
+                return 1
+        return run_single_simulation(binary_file, timing, levels,
+                                     max_instructions, args.timeout,
+                                     branch_predictor,
+                                     {'forwarding': not args.no_forwarding} if args.pipeline else None,
+                                     debug_commands, args.interval, args.interval_output, args.warmup or 0, mmu,
+                                     energy, dram, timeline)
 
 
 if __name__ == "__main__":
@@ -1,35 +1,148 @@
 # memory_hierarchy.py - Fixed version with better error handling and no circular imports
 
-from cache import Cache
+import json
+from cache import Cache, INCLUSION_POLICIES
+from write_buffer import WriteBuffer
+from prefetch import make_prefetcher
+from branch_predictor import make_branch_unit
+from pipeline import make_pipeline
+from mmu import make_mmu
+from dram import make_dram
+from energy import EnergyModel
 from memory import read_word, write_word
+from timing import TimingModel
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+# Cost computed by MemoryHierarchy.get_total_stats, as reported in result files
+COST_FORMULA = "Cost = 0.5 * L1_misses + lower_level_misses + writebacks + branch_penalty_cycles / memory_latency"
+
+# Keys accepted in each level of a topology description
+LEVEL_KEYS = {
+    'name', 'split', 'size', 'block_size', 'associativity', 'replacement', 'write_policy',
+    'write_allocate', 'write_buffer_depth', 'write_buffer_drain_interval', 'prefetcher',
+    'i_prefetcher', 'd_prefetcher', 'seed', 'inclusion',
+}
+
+
+def two_level_topology(l1_block_size=16, l2_block_size=32, l1_associativity=1, l1_size=1024,
+                       l2_size=16384, l2_associativity=1, write_policy="write_back",
+                       l1_replacement="lru", l2_replacement="lru", replacement_seed=0,
+                       l2_write_policy="write_back", write_allocate=True, write_buffer_depth=0,
+                       write_buffer_drain_interval=4, l1i_prefetcher=None, l1d_prefetcher=None,
+                       l2_prefetcher=None, l2_inclusion="non_inclusive"):
+    """Describe the classic split L1 over a unified L2 as a list of levels"""
+    return [
+        {'name': 'L1', 'split': True, 'size': l1_size, 'block_size': l1_block_size,
+         'associativity': l1_associativity, 'replacement': l1_replacement, 'write_policy': write_policy,
+         'write_allocate': write_allocate, 'write_buffer_depth': write_buffer_depth,
+         'write_buffer_drain_interval': write_buffer_drain_interval,
+         'i_prefetcher': l1i_prefetcher, 'd_prefetcher': l1d_prefetcher, 'seed': replacement_seed},
+        {'name': 'L2', 'split': False, 'size': l2_size, 'block_size': l2_block_size,
+         'associativity': l2_associativity, 'replacement': l2_replacement, 'write_policy': l2_write_policy,
+         'write_allocate': write_allocate, 'prefetcher': l2_prefetcher, 'seed': replacement_seed,
+         'inclusion': l2_inclusion},
+    ]
+
+
+def load_topology(filepath):
+    """Load a list of cache levels from a JSON or TOML file with a top-level "levels" list"""
+    if filepath.endswith('.toml'):
+        if tomllib is None:
+            raise ValueError("TOML topology files require Python 3.11 or newer")
+        with open(filepath, 'rb') as f:
+            spec = tomllib.load(f)
+    else:
+        with open(filepath, 'r') as f:
+            spec = json.load(f)
+    levels = spec.get('levels')
+    if not isinstance(levels, list) or not levels:
+        raise ValueError("Topology must contain a non-empty 'levels' list")
+    return levels
+
+
+def validate_topology(levels):
+    """Check a list of level descriptions, raising ValueError on the first problem"""
+    if not levels:
+        raise ValueError("Hierarchy needs at least one cache level")
+    seen_unified = False
+    for number, level in enumerate(levels, start=1):
+        unknown = set(level) - LEVEL_KEYS
+        if unknown:
+            raise ValueError(f"Unknown keys in level {number}: {sorted(unknown)}")
+        for key in ('size', 'block_size'):
+            value = level.get(key)
+            if not isinstance(value, int) or value <= 0 or value & (value - 1):
+                raise ValueError(f"Invalid {key} for level {number}: {value}. Must be a power of two")
+        if level['block_size'] > level['size']:
+            raise ValueError(f"Block size cannot exceed cache size at level {number}")
+        inclusion = level.get('inclusion', "non_inclusive")
+        if inclusion not in INCLUSION_POLICIES:
+            raise ValueError(f"Invalid inclusion policy for level {number}: {inclusion}. Must be one of {INCLUSION_POLICIES}")
+        if inclusion != "non_inclusive":
+            if number == 1:
+                raise ValueError(f"Level 1 has no level above it to be {inclusion} of")
+            # Back-invalidation drops whole blocks above, exclusion moves blocks up and down unchanged
+            if inclusion == "inclusive" and any(above['block_size'] > level['block_size'] for above in levels[:number - 1]):
+                raise ValueError(f"Inclusive level {number} needs blocks at least as large as every level above it")
+            if inclusion == "exclusive" and levels[number - 2]['block_size'] != level['block_size']:
+                raise ValueError(f"Exclusive level {number} needs the same block size as level {number - 1}")
+        if level.get('split', False):
+            if seen_unified:
+                raise ValueError(f"Level {number} cannot be split below a unified level")
+        else:
+            seen_unified = True
+
 
 class MemoryHierarchy:
-    def __init__(self, l1_block_size=16, l2_block_size=32, l1_associativity=1):
-        # Validate parameters
-        if l1_block_size not in [4, 8, 16, 32]:
-            raise ValueError(f"Invalid L1 block size: {l1_block_size}. Must be 4, 8, 16, or 32")
-        if l2_block_size not in [16, 32, 64]:
-            raise ValueError(f"Invalid L2 block size: {l2_block_size}. Must be 16, 32, or 64")
-            
-        # Calculate L1 associativity for "fully associative" case
-        l1_cache_size = 1024  # 1KB
-        if l1_associativity > 1:
-            # For fully associative, use maximum possible associativity
-            max_associativity = l1_cache_size // l1_block_size
-            l1_associativity = min(l1_associativity, max_associativity)
+    def __init__(self, l1_block_size=16, l2_block_size=32, l1_associativity=1, timing=None, levels=None,
+                 branch_predictor=None, pipeline=None, mmu=None, energy=None, dram=None,
+                 **config):
+        # Without an explicit topology, build the classic split L1 + unified L2 from the keyword arguments
+        if levels is None:
+            levels = two_level_topology(l1_block_size, l2_block_size, l1_associativity, **config)
+        elif config:
+            raise ValueError(f"Two-level parameters {sorted(config)} cannot be combined with an explicit topology")
+        validate_topology(levels)
             
         print(f"Initializing Memory Hierarchy:")
-        print(f"  L1 I-Cache: {l1_cache_size}B, {l1_block_size}B blocks, {l1_associativity}-way")
-        print(f"  L1 D-Cache: {l1_cache_size}B, {l1_block_size}B blocks, {l1_associativity}-way")
-        print(f"  L2 Cache: 16KB, {l2_block_size}B blocks, Direct-mapped")
             
         try:
-            # Create L2 cache first (no next level - goes to main memory)
-            self.l2_cache = Cache(16384, l2_block_size, 1, "write_back")  # Direct mapped, 16KB
-            
-            # Create L1 caches with L2 as next level
-            self.l1_instruction_cache = Cache(1024, l1_block_size, l1_associativity, "write_back", self.l2_cache)
-            self.l1_data_cache = Cache(1024, l1_block_size, l1_associativity, "write_back", self.l2_cache)
+            self.timing = timing if timing is not None else TimingModel()
+            self.energy_model = energy if energy is not None else EnergyModel()
+            self.caches = {}  # name -> Cache, ordered from the core outwards
+            self.levels = []  # per level: list of cache names
+            self.watcher = None  # Debugger notified of every data access, if attached
+            self.build(levels)
+            self.fetch_line = None  # Line buffer: line_of() tuple of the last line fetched
+            self.fetch_address = None
+            self.fetch_defer = False  # Whether buffered fetches leave their bookkeeping to settle_fetches
+            # Branch prediction is optional; without it branches cost no extra cycles
+            self.branch_unit = make_branch_unit(branch_predictor)
+            if self.branch_unit is not None:
+                self.branch_unit.set_timing(self.timing)
+                print(f"  Branch predictor: {self.branch_unit.describe()}")
+            # Optional five-stage pipeline timing replaces the sequential cycle estimate
+            self.pipeline = make_pipeline(pipeline)
+            if self.pipeline is not None:
+                print(f"  Pipeline: {self.pipeline.describe()}")
+            # Optional MMU: without it the core issues physical addresses
+            self.mmu = make_mmu(mmu)
+            if self.mmu is not None:
+                self.mmu.attach(self)
+                print(f"  MMU: {self.mmu.describe()}")
+            # Optional DRAM timing behind the last level; without it every memory access costs the same
+            self.dram = make_dram(dram)
+            if self.dram is not None:
+                for cache in self.caches.values():
+                    if cache.next_level is None:
+                        if cache.block_size > self.dram.row_size:
+                            raise ValueError(f"Block size {cache.block_size}B exceeds the DRAM row size {self.dram.row_size}B")
+                        cache.dram = self.dram
+                print(f"  DRAM: {self.dram.describe()}")
 
             # Initialize stats
             self.reset_stats()
@@ -41,60 +154,351 @@ class MemoryHierarchy:
             self.initialized = False
             raise
 
+    @classmethod
+    def from_caches(cls, caches, levels, timing=None):
+        """Wrap caches that were built elsewhere, e.g. one core's view of a shared hierarchy.
+
+        caches maps names to Cache objects ordered from the core outwards and levels lists
+        the names at each level; the first and last first-level caches serve fetches and data.
+        """
+        hierarchy = cls.__new__(cls)
+        hierarchy.timing = timing if timing is not None else TimingModel()
+        hierarchy.energy_model = EnergyModel()
+        hierarchy.caches = caches
+        hierarchy.levels = levels
+        hierarchy.instruction_cache = caches[levels[0][0]]
+        hierarchy.data_cache = caches[levels[0][-1]]
+        hierarchy.watcher = None
+        hierarchy.fetch_line = None
+        hierarchy.fetch_address = None
+        hierarchy.fetch_defer = False
+        hierarchy.branch_unit = None
+        hierarchy.pipeline = None
+        hierarchy.mmu = None
+        hierarchy.dram = None
+        hierarchy.reset_stats()
+        hierarchy.initialized = True
+        return hierarchy
+
+    def build(self, levels):
+        """Create the caches bottom-up so each one can be linked to its next level"""
+        instruction_below = None  # Cache the instruction path continues into
+        data_below = None         # Cache the data path continues into
+        built = []
+        for number in range(len(levels), 0, -1):
+            level = levels[number - 1]
+            name = level.get('name', f"L{number}")
+            if level.get('split', False):
+                i_cache = self.make_cache(level, number, instruction_below, level.get('i_prefetcher', level.get('prefetcher')), 0, False)
+                d_cache = self.make_cache(level, number, data_below, level.get('d_prefetcher', level.get('prefetcher')), 1, True)
+                built.append((number, [(f"{name}I", i_cache, "I-Cache"), (f"{name}D", d_cache, "D-Cache")]))
+                instruction_below, data_below = i_cache, d_cache
+            else:
+                cache = self.make_cache(level, number, data_below, level.get('prefetcher'), 0, True)
+                built.append((number, [(name, cache, "Unified")]))
+                instruction_below = data_below = cache
+
+        for number, caches in reversed(built):
+            names = []
+            for name, cache, kind in caches:
+                if name in self.caches:
+                    raise ValueError(f"Duplicate cache name: {name}")
+                self.caches[name] = cache
+                names.append(name)
+                print(f"  {name} {kind}: {cache.cache_size}B, {cache.block_size}B blocks, {cache.associativity}-way, "
+                      f"{cache.replacement.name.upper()}, {cache.write_policy}, {cache.inclusion}")
+            self.levels.append(names)
+
+        # Let each cache find the caches it serves, for back-invalidation and capacity stats
+        for cache in self.caches.values():
+            if cache.next_level is not None:
+                cache.next_level.upper.append(cache)
+
+        # Entry points for the core
+        self.instruction_cache = instruction_below
+        self.data_cache = data_below
+
+    def make_cache(self, level, number, next_level, prefetcher, seed_offset, allow_buffer):
+        """Create one cache from a level description"""
+        size = level['size']
+        block_size = level['block_size']
+        associativity = level.get('associativity', 1)
+        if associativity == "full":
+            associativity = size // block_size
+        # Clamp associativity to the "fully associative" case
+        associativity = max(1, min(associativity, size // block_size))
+
+        write_buffer = None
+        depth = level.get('write_buffer_depth', 0)
+        if allow_buffer and depth > 0 and next_level is not None:
+            write_buffer = WriteBuffer(depth, level.get('write_buffer_drain_interval', 4))
+
+        cache = Cache(size, block_size, associativity, level.get('write_policy', "write_back"), next_level,
+                      replacement=level.get('replacement', "lru"), seed=level.get('seed', 0) + seed_offset,
+                      write_allocate=level.get('write_allocate', True), write_buffer=write_buffer,
+                      inclusion=level.get('inclusion', "non_inclusive"))
+        # Prefetchers are given as a name or a dict of parameters (None disables)
+        cache.attach_prefetcher(make_prefetcher(prefetcher))
+        cache.set_timing(self.timing, number)
+        return cache
+
     def reset_stats(self):
         """Reset all cache statistics"""
-        if hasattr(self, 'l1_instruction_cache') and self.l1_instruction_cache:
-            self.l1_instruction_cache.reset_stats()
-        if hasattr(self, 'l1_data_cache') and self.l1_data_cache:
-            self.l1_data_cache.reset_stats()
-        if hasattr(self, 'l2_cache') and self.l2_cache:
-            self.l2_cache.reset_stats()
+        for cache in self.caches.values():
+            cache.reset_stats()
+        if getattr(self, 'branch_unit', None) is not None:
+            self.branch_unit.reset_stats()
+        if getattr(self, 'pipeline', None) is not None:
+            self.pipeline.reset_stats()
+        if getattr(self, 'mmu', None) is not None:
+            self.mmu.reset_stats()
+        if getattr(self, 'dram', None) is not None:
+            self.dram.reset_stats()
+        self.instruction_count = 0
+        self.core_cycles = 0
+        self.fetch_buffer_hits = 0  # Fetches served by the line buffer (also counted as first-level hits)
+        self.fetch_pending = 0  # Buffered fetches whose hit is not yet counted in the cache
+        # Extra IF/MEM cycles and branch flush of the instruction in flight (pipeline only)
+        self.fetch_stall = 0
+        self.data_stall = 0
+        self.branch_flush = 0
+
+    def begin_measurement(self):
+        """Reset all statistics at the end of a warm-up period, keeping cache contents and 3C history"""
+        history = [(cache.seen_blocks, cache.shadow) for cache in self.caches.values()]
+        self.reset_stats()
+        for cache, (seen_blocks, shadow) in zip(self.caches.values(), history):
+            cache.seen_blocks, cache.shadow = seen_blocks, shadow
+
+    def charge_instruction(self, raw=None, decoded=None, executed=True):
+        """Charge the base execution cost of one instruction (called from the fetch loop)"""
+        self.instruction_count += 1
+        self.core_cycles += self.timing.execute_cycles
+        if self.pipeline is not None and decoded is not None:
+            self.pipeline.issue(raw, decoded, executed, self.fetch_stall, self.data_stall, self.branch_flush)
+        self.fetch_stall = self.data_stall = self.branch_flush = 0
+
+    def drain_write_buffers(self):
+        """Flush every write buffer at the end of a run, so write traffic includes the writes still pending"""
+        for cache in self.caches.values():
+            if cache.write_buffer is not None:
+                cache.write_buffer.flush()
+
+    def foreground_cycles(self):
+        """Cycles charged by every cache that were on the core's critical path"""
+        self.settle_fetches()
+        return sum(cache.cycles - cache.background_cycles for cache in self.caches.values())
+
+    def record_branch(self, pc, conditional, taken, target):
+        """Let the branch unit predict and learn from a resolved branch"""
+        if self.branch_unit is not None:
+            self.branch_flush = self.branch_unit.observe_branch(pc, conditional, taken, target)
+        elif taken:
+            # Without a predictor the pipeline keeps fetching sequentially and flushes on taken branches
+            self.branch_flush = self.timing.branch_penalty
+
+    def record_predicated(self, executed):
+        """Count a conditional non-branch instruction"""
+        if self.branch_unit is not None:
+            self.branch_unit.observe_predicated(executed)
+
+    def fetch(self, address):
+        """Fetch through the line buffer, which holds the first-level line of the previous fetch.
+
+        A sequential fetch within that line is a hit served without the tag lookup;
+        a line crossing, a taken branch or a line evicted meanwhile looks the line up
+        again (going through the full cache read on a miss) and refills the buffer.
+
+        On a split instruction cache without a prefetcher or write buffer nothing else
+        touches the cache between buffered fetches, so a buffered fetch only counts
+        itself and reads the word; settle_fetches books the hits when the buffer is
+        refilled or statistics are read. Otherwise each one goes through read_line.
+        """
+        cache = self.instruction_cache
+        line = self.fetch_line
+        previous = self.fetch_address
+        self.fetch_address = address
+        if line is not None and address == previous + 4 and address & (cache.block_size - 1):
+            # The block may have been replaced or invalidated since it was buffered
+            block = line[3]
+            if block.valid and block.tag == line[2]:
+                if self.fetch_defer:
+                    self.fetch_pending += 1
+                    return block.data[(address & (cache.block_size - 1)) >> 2]
+                self.fetch_buffer_hits += 1
+                return cache.read_line(line, address, address)
+        self.settle_fetches()
+        self.fetch_defer = cache is not self.data_cache and cache.prefetcher is None and cache.write_buffer is None
+        line = cache.line_of(address)
+        if line is not None:
+            self.fetch_line = line
+            return cache.read_line(line, address, address)
+        data = cache.read(address, address)
+        self.fetch_line = cache.line_of(address)
+        return data
+
+    def settle_fetches(self):
+        """Count the buffered fetches since the last refill as hits in the instruction cache"""
+        if self.fetch_pending:
+            self.instruction_cache.note_line_hits(self.fetch_pending)
+            self.fetch_buffer_hits += self.fetch_pending
+            self.fetch_pending = 0
 
     def read_instruction(self, address):
-        """Read instruction from L1 instruction cache"""
-        if not hasattr(self, 'l1_instruction_cache') or not self.l1_instruction_cache:
+        """Read instruction from the first-level instruction (or unified) cache"""
+        if not getattr(self, 'instruction_cache', None):
             raise RuntimeError("Instruction cache not initialized")
-        return self.l1_instruction_cache.read(address)
+        if self.pipeline is None:
+            if self.mmu is not None:
+                address = self.mmu.translate(address, 'i')
+            return self.fetch(address)
+        before = self.foreground_cycles()
+        if self.mmu is not None:
+            address = self.mmu.translate(address, 'i')
+        data = self.fetch(address)
+        self.fetch_stall = self.foreground_cycles() - before - self.timing.hit_latency(1)
+        return data
 
-    def read_data(self, address):
-        """Read data from L1 data cache"""
-        if not hasattr(self, 'l1_data_cache') or not self.l1_data_cache:
+    def read_data(self, address, pc=None):
+        """Read data from the first-level data cache (pc of the load is used to train prefetchers)"""
+        if not getattr(self, 'data_cache', None):
             raise RuntimeError("Data cache not initialized")
-        return self.l1_data_cache.read(address)
+        virtual = address
+        if self.pipeline is None:
+            if self.mmu is not None:
+                address = self.mmu.translate(address, 'd')
+            data = self.data_cache.read(address, pc)
+        else:
+            before = self.foreground_cycles()
+            if self.mmu is not None:
+                address = self.mmu.translate(address, 'd')
+            data = self.data_cache.read(address, pc)
+            self.data_stall += self.foreground_cycles() - before - self.timing.hit_latency(1)
+        if self.watcher is not None:
+            self.watcher.on_access('r', virtual, data, pc)
+        return data
 
-    def write_data(self, address, data):
-        """Write data to L1 data cache"""
-        if not hasattr(self, 'l1_data_cache') or not self.l1_data_cache:
+    def write_data(self, address, data, pc=None):
+        """Write data to the first-level data cache (pc of the store is used to train prefetchers)"""
+        if not getattr(self, 'data_cache', None):
             raise RuntimeError("Data cache not initialized")
-        self.l1_data_cache.write(address, data)
+        if self.watcher is not None:
+            self.watcher.on_access('w', address, data, pc)
+        if self.pipeline is None:
+            if self.mmu is not None:
+                address = self.mmu.translate(address, 'd')
+            self.data_cache.write(address, data, pc)
+            return
+        before = self.foreground_cycles()
+        if self.mmu is not None:
+            address = self.mmu.translate(address, 'd')
+        self.data_cache.write(address, data, pc)
+        self.data_stall += self.foreground_cycles() - before - self.timing.hit_latency(1)
+
+    def peek(self, address):
+        """Current value of the word at address as the core would see it, without side effects"""
+        if self.mmu is not None:
+            address = self.mmu.page_table.resolve(address & 0xFFFFFFFF)
+            if address is None:
+                return 0
+        cache = self.data_cache
+        while cache is not None:
+            value = cache.peek(address)
+            if value is not None:
+                return value
+            cache = cache.next_level
+        return read_word(address)
 
     def get_total_stats(self):
         """Get combined statistics from all cache levels"""
-        if not all(hasattr(self, attr) and getattr(self, attr) is not None 
-                  for attr in ['l1_instruction_cache', 'l1_data_cache', 'l2_cache']):
+        if not getattr(self, 'caches', None):
             raise RuntimeError("Cache hierarchy not properly initialized")
-            
+        self.settle_fetches()
+
         try:
-            l1_i_stats = self.l1_instruction_cache.get_stats()
-            l1_d_stats = self.l1_data_cache.get_stats()
-            l2_stats = self.l2_cache.get_stats()
+            cache_stats = {name: cache.get_stats() for name, cache in self.caches.items()}
         except Exception as e:
             raise RuntimeError(f"Error getting cache stats: {str(e)}")
+
+        level_stats = []
+        for number, names in enumerate(self.levels, start=1):
+            level_stats.append({
+                'level': number,
+                'caches': names,
+                'hits': sum(cache_stats[name]['hits'] for name in names),
+                'misses': sum(cache_stats[name]['misses'] for name in names),
+                'writebacks': sum(cache_stats[name]['writebacks'] for name in names),
+                'access_count': sum(cache_stats[name]['access_count'] for name in names),
+                'compulsory_misses': sum(cache_stats[name]['compulsory_misses'] for name in names),
+                'capacity_misses': sum(cache_stats[name]['capacity_misses'] for name in names),
+                'conflict_misses': sum(cache_stats[name]['conflict_misses'] for name in names)
+            })
+
+        all_stats = cache_stats.values()
+        total_l1_misses = level_stats[0]['misses']
+        total_lower_misses = sum(level['misses'] for level in level_stats[1:])
+        total_writebacks = sum(s['writebacks'] for s in all_stats)
+        total_write_traffic = sum(s['write_traffic'] for s in all_stats)
         
-        total_l1_misses = l1_i_stats['misses'] + l1_d_stats['misses']
-        total_l2_misses = l2_stats['misses']
-        total_writebacks = l1_i_stats['writebacks'] + l1_d_stats['writebacks'] + l2_stats['writebacks']
-        
-        cost = 0.5 * total_l1_misses + total_l2_misses + total_writebacks
-        
+        branch_stats = None
+        branch_cycles = 0
+        if self.branch_unit is not None:
+            branch_stats = self.branch_unit.get_stats(self.instruction_count)
+            branch_cycles = branch_stats['penalty_cycles']
+        mmu_stats = self.mmu.get_stats() if self.mmu is not None else None
+        dram_stats = self.dram.get_stats() if self.dram is not None else None
+        pipeline_stats = None
+        if self.pipeline is not None:
+            pipeline_stats = self.pipeline.get_stats()
+            branch_cycles = pipeline_stats['stalls']['branch']
+
+        # First-level misses are half price, misses further out and writebacks cost one each;
+        # branch penalties are priced in units of a main memory access
+        cost = 0.5 * total_l1_misses + total_lower_misses + total_writebacks
+        if self.timing.memory_latency > 0:
+            cost += branch_cycles / self.timing.memory_latency
+
+        # Cycle accounting: L1 hit time overlaps with execution, everything beyond it stalls the core
+        l1_accesses = level_stats[0]['access_count']
+        memory_cycles = sum(s['cycles'] for s in all_stats)
+        # Prefetch fills and write buffer drains overlap with execution
+        memory_cycles -= sum(s['background_cycles'] for s in all_stats)
+        stall_cycles = memory_cycles - l1_accesses * self.timing.hit_latency(1) + branch_cycles
+        if mmu_stats is not None:
+            # Page-table reads are not overlapped with execution, not even when they hit in the L1
+            stall_cycles += mmu_stats['walk_reads'] * self.timing.hit_latency(1)
+        total_cycles = self.core_cycles + stall_cycles
+        if pipeline_stats is not None:
+            # Stage overlap replaces the sequential estimate
+            stall_cycles = pipeline_stats['stall_cycles']
+            total_cycles = pipeline_stats['total_cycles']
+        cpi = total_cycles / self.instruction_count if self.instruction_count > 0 else 0
+        energy = self.energy_model.evaluate(self.caches, set(self.levels[-1]), total_cycles, self.instruction_count)
+        amat = memory_cycles / l1_accesses if l1_accesses > 0 else 0
+
         return {
-            'l1_instruction_cache': l1_i_stats,
-            'l1_data_cache': l1_d_stats,
-            'l2_cache': l2_stats,
+            'caches': cache_stats,
+            'levels': level_stats,
             'total_l1_misses': total_l1_misses,
-            'total_l2_misses': total_l2_misses,
+            'total_l2_misses': total_lower_misses,
             'total_writebacks': total_writebacks,
-            'cost': cost
+            'total_write_traffic': total_write_traffic,
+            'buffer_stalls': sum(s['buffer_stalls'] for s in all_stats),
+            'prefetches_issued': sum(s.get('prefetch', {}).get('issued', 0) for s in all_stats),
+            'prefetches_useful': sum(s.get('prefetch', {}).get('useful', 0) for s in all_stats),
+            'branch': branch_stats,
+            'pipeline': pipeline_stats,
+            'mmu': mmu_stats,
+            'dram': dram_stats,
+            'energy': energy,
+            'fetch_buffer_hits': self.fetch_buffer_hits,
+            'cost': cost,
+            'instruction_count': self.instruction_count,
+            'memory_cycles': memory_cycles,
+            'stall_cycles': stall_cycles,
+            'total_cycles': total_cycles,
+            'cpi': cpi,
+            'amat': amat
         }
 
     def print_stats(self):
@@ -102,13 +506,56 @@ class MemoryHierarchy:
         try:
             stats = self.get_total_stats()
             print(f"\n=== Cache Statistics ===")
-            print(f"L1 Instruction Cache: {stats['l1_instruction_cache']['hits']} hits, {stats['l1_instruction_cache']['misses']} misses (Hit Rate: {stats['l1_instruction_cache']['hit_rate']:.3f})")
-            print(f"L1 Data Cache: {stats['l1_data_cache']['hits']} hits, {stats['l1_data_cache']['misses']} misses (Hit Rate: {stats['l1_data_cache']['hit_rate']:.3f})")
-            print(f"L2 Cache: {stats['l2_cache']['hits']} hits, {stats['l2_cache']['misses']} misses (Hit Rate: {stats['l2_cache']['hit_rate']:.3f})")
+            for name, cache_stats in stats['caches'].items():
+                print(f"{name} Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses (Hit Rate: {cache_stats['hit_rate']:.3f})")
+                print(f"  {cache_stats['compulsory_misses']} compulsory, {cache_stats['capacity_misses']} capacity, "
+                      f"{cache_stats['conflict_misses']} conflict")
+                if 'effective_capacity' in cache_stats:
+                    print(f"  {cache_stats['inclusion']}: {cache_stats['back_invalidations']} back-invalidations, "
+                          f"{cache_stats['victim_fills']} victim fills, effective capacity "
+                          f"{cache_stats['effective_capacity']}B of {cache_stats['occupancy']}B occupied "
+                          f"({self.caches[name].cache_size}B total)")
+            if stats['instruction_count'] > 0:
+                print(f"Fetch line buffer: {stats['fetch_buffer_hits']} of {stats['instruction_count']} fetches "
+                      f"({stats['fetch_buffer_hits'] / stats['instruction_count']:.3f}) served without a tag lookup")
             print(f"Total L1 Misses: {stats['total_l1_misses']}")
-            print(f"Total L2 Misses: {stats['total_l2_misses']}")
+            print(f"Total Lower-Level Misses: {stats['total_l2_misses']}")
             print(f"Total Writebacks: {stats['total_writebacks']}")
+            print(f"Write Traffic: {stats['total_write_traffic']} words")
+            for name, cache_stats in stats['caches'].items():
+                if 'write_buffer' in cache_stats:
+                    wb = cache_stats['write_buffer']
+                    print(f"{name} Write Buffer: {wb['writes']} writes, {wb['coalesced']} coalesced, {wb['stalls']} stalls ({wb['stall_cycles']} cycles)")
+                if 'prefetch' in cache_stats:
+                    pf = cache_stats['prefetch']
+                    print(f"{name} prefetcher {pf['prefetcher']}: {pf['issued']} issued, {pf['useful']} useful, "
+                          f"{pf['late']} late, {pf['polluting']} polluting")
+            if stats['branch'] is not None:
+                bp = stats['branch']
+                print(f"Branch predictor {bp['predictor']}: {bp['branches']} branches, {bp['mispredictions']} mispredicted "
+                      f"(accuracy {bp['accuracy']:.3f}, MPKI {bp['mpki']:.2f}), {bp['penalty_cycles']} penalty cycles")
+            if stats['pipeline'] is not None:
+                stalls = stats['pipeline']['stalls']
+                print(f"Pipeline {stats['pipeline']['model']} stalls: " +
+                      ", ".join(f"{kind} {cycles}" for kind, cycles in stalls.items()))
+            if stats['mmu'] is not None:
+                mmu = stats['mmu']
+                for name in ('itlb', 'dtlb'):
+                    tlb = mmu[name]
+                    print(f"{name.upper()}: {tlb['hits']} hits, {tlb['misses']} misses (Hit Rate: {tlb['hit_rate']:.3f})")
+                print(f"Page-table walks: {mmu['walks']} ({mmu['walk_reads']} descriptor reads, "
+                      f"{mmu['walk_cycles']} cycles, {mmu['faults']} faults)")
+            if stats['dram'] is not None:
+                dram = stats['dram']
+                print(f"DRAM {dram['model']}: {dram['reads']} reads, {dram['writes']} writes, "
+                      f"{dram['row_hits']} row hits, {dram['row_empty']} row empty, {dram['row_conflicts']} row conflicts "
+                      f"(row-buffer hit rate {dram['row_hit_rate']:.3f}), {dram['cycles']} cycles")
             print(f"Cost: {stats['cost']:.2f}")
+            print(f"Total Cycles: {stats['total_cycles']} (CPI: {stats['cpi']:.3f}, AMAT: {stats['amat']:.3f} cycles)")
+            energy = stats['energy']
+            print(f"Energy: {energy['total']:.1f} pJ (dynamic {energy['dynamic']:.1f}, leakage {energy['leakage']:.1f}, "
+                  f"memory {energy['memory']:.1f}, core {energy['core']:.1f}), EDP: {energy['edp']:.4g}, "
+                  f"area: {energy['area']:.4f} mm2")
             print("========================\n")
         except Exception as e:
             print(f"Error printing stats: {str(e)}")
@@ -116,12 +563,12 @@ class MemoryHierarchy:
 # Global memory hierarchy instance
 memory_hierarchy = None
 
-def init_memory_hierarchy(l1_block_size=16, l2_block_size=32, l1_associativity=1):
-    """Initialize the memory hierarchy with given parameters"""
+def init_memory_hierarchy(l1_block_size=16, l2_block_size=32, l1_associativity=1, timing=None, **config):
+    """Initialize the memory hierarchy with given parameters (extra keywords go to MemoryHierarchy)"""
     global memory_hierarchy
     try:
         # Create new instance (don't set to None first - this was the main bug!)
-        new_hierarchy = MemoryHierarchy(l1_block_size, l2_block_size, l1_associativity)
+        new_hierarchy = MemoryHierarchy(l1_block_size, l2_block_size, l1_associativity, timing, **config)
         
         # Only assign to global variable after successful creation
         memory_hierarchy = new_hierarchy
@@ -144,12 +591,12 @@ def read_instruction_with_cache(address):
     check_initialized()
     return memory_hierarchy.read_instruction(address)
 
-def read_data_with_cache(address):
+def read_data_with_cache(address, pc=None):
     """Read data through cache hierarchy"""
     check_initialized()
-    return memory_hierarchy.read_data(address)
+    return memory_hierarchy.read_data(address, pc)
 
-def write_data_with_cache(address, data):
+def write_data_with_cache(address, data, pc=None):
     """Write data through cache hierarchy"""
     check_initialized()
-    memory_hierarchy.write_data(address, data)
\ No newline at end of file
+    memory_hierarchy.write_data(address, data, pc)
\ No newline at end of file
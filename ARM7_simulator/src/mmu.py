@@ -0,0 +1,266 @@
+# mmu.py - Virtual memory: I-TLB/D-TLB and an ARMv7 short-descriptor page-table walker
+
+from collections import OrderedDict
+
+# Page sizes of the short-descriptor format, as address shifts
+PAGE_SHIFTS = {'small': 12, 'large': 16, 'section': 20}
+SHIFT_NAMES = {shift: name for name, shift in PAGE_SHIFTS.items()}
+
+DEFAULT_TTBR = 0x4000  # First-level table (16KB, 16KB-aligned); second-level tables follow it
+
+
+class TranslationFault(Exception):
+    """Raised when a virtual address has no valid descriptor"""
+
+    def __init__(self, address, kind, level):
+        self.address = address
+        self.kind = kind
+        self.level = level
+        access = "instruction fetch" if kind == 'i' else "data access"
+        super().__init__(f"Translation fault (level {level}) on {access} at 0x{address:08X}")
+
+
+class TLB:
+    """Set-associative TLB with LRU replacement.
+
+    Entries of every page size share the sets: a lookup probes the set selected by
+    the virtual page number at each page size, smallest first.
+    """
+
+    def __init__(self, entries=32, associativity="full"):
+        if not isinstance(entries, int) or entries <= 0 or entries & (entries - 1):
+            raise ValueError(f"TLB entries must be a positive power of two: {entries}")
+        if associativity == "full":
+            associativity = entries
+        if not isinstance(associativity, int) or associativity <= 0 or associativity & (associativity - 1) \
+                or associativity > entries:
+            raise ValueError(f"TLB associativity {associativity} is invalid for {entries} entries")
+        self.entries = entries
+        self.associativity = associativity
+        self.set_mask = entries // associativity - 1
+        self.sets = [OrderedDict() for _ in range(entries // associativity)]  # (shift, vpn) -> physical base
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, address):
+        """Return (physical page base, page shift) for address, or None on a miss"""
+        for shift in (12, 16, 20):
+            vpn = address >> shift
+            entries = self.sets[vpn & self.set_mask]
+            base = entries.get((shift, vpn))
+            if base is not None:
+                entries.move_to_end((shift, vpn))
+                self.hits += 1
+                return base, shift
+        self.misses += 1
+        return None
+
+    def insert(self, address, base, shift):
+        vpn = address >> shift
+        entries = self.sets[vpn & self.set_mask]
+        entries[(shift, vpn)] = base
+        if len(entries) > self.associativity:
+            entries.popitem(last=False)
+
+    def describe(self):
+        if self.associativity == self.entries:
+            return f"{self.entries}-full"
+        return f"{self.entries}-{self.associativity}way"
+
+    def get_stats(self):
+        accesses = self.hits + self.misses
+        return {
+            'entries': self.entries,
+            'associativity': self.associativity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / accesses if accesses > 0 else 0
+        }
+
+
+class PageTable:
+    """Two-level ARMv7 short-descriptor translation table.
+
+    The first-level table has 4096 entries (1MB each) holding a fault, a section
+    or a pointer to a 256-entry second-level table of large (64KB) and small (4KB)
+    pages. Descriptor words live here rather than in simulated RAM, which is only
+    MEMORY_SIZE bytes; walks still read them through the data caches at their
+    physical addresses, so they take time and compete for cache space.
+    """
+
+    def __init__(self, ttbr=DEFAULT_TTBR):
+        self.ttbr = ttbr & 0xFFFFC000
+        self.next_table = self.ttbr + 0x4000  # Where the next second-level table goes
+        self.descriptors = {}  # physical address -> descriptor word (missing means fault)
+
+    def l1_address(self, address):
+        return self.ttbr | ((address >> 20) << 2)
+
+    def map(self, virtual, physical, size='small'):
+        """Map one page or section of the given size"""
+        if size not in PAGE_SHIFTS:
+            raise ValueError(f"Unknown page size: {size}. Must be one of {sorted(PAGE_SHIFTS)}")
+        shift = PAGE_SHIFTS[size]
+        if (virtual | physical) & ((1 << shift) - 1):
+            raise ValueError(f"Addresses 0x{virtual:08X} -> 0x{physical:08X} are not {size}-aligned")
+        l1_address = self.l1_address(virtual)
+        if size == 'section':
+            self.descriptors[l1_address] = physical | 0b10
+            return
+        descriptor = self.descriptors.get(l1_address, 0)
+        if descriptor & 0b11 == 0b10:
+            raise ValueError(f"0x{virtual:08X} is already mapped by a section")
+        if descriptor & 0b11 != 0b01:
+            descriptor = self.next_table | 0b01
+            self.next_table += 0x400
+            self.descriptors[l1_address] = descriptor
+        table = descriptor & 0xFFFFFC00
+        index = (virtual >> 12) & 0xFF
+        if size == 'small':
+            self.descriptors[table | (index << 2)] = physical | 0b10
+        else:
+            # A large page descriptor is repeated in 16 consecutive entries
+            for i in range(16):
+                self.descriptors[table | ((index + i) << 2)] = physical | 0b01
+
+    def walk(self, address):
+        """Descriptor addresses a walk reads and its outcome: (addresses, (base, shift) or fault level)"""
+        l1_address = self.l1_address(address)
+        descriptor = self.descriptors.get(l1_address, 0)
+        if descriptor & 0b11 == 0b10:
+            return [l1_address], (descriptor & 0xFFF00000, 20)
+        if descriptor & 0b11 != 0b01:
+            return [l1_address], 1
+        l2_address = (descriptor & 0xFFFFFC00) | (((address >> 12) & 0xFF) << 2)
+        descriptor = self.descriptors.get(l2_address, 0)
+        if descriptor & 0b10:
+            return [l1_address, l2_address], (descriptor & 0xFFFFF000, 12)
+        if descriptor & 0b11 == 0b01:
+            return [l1_address, l2_address], (descriptor & 0xFFFF0000, 16)
+        return [l1_address, l2_address], 2
+
+    def resolve(self, address):
+        """Physical address for address without touching any TLB or cache, or None on a fault"""
+        _, outcome = self.walk(address)
+        if isinstance(outcome, int):
+            return None
+        base, shift = outcome
+        return base | (address & ((1 << shift) - 1))
+
+    @classmethod
+    def identity(cls, ttbr=DEFAULT_TTBR):
+        """Flat mapping of the whole address space: small pages for the first 1MB, sections above"""
+        table = cls(ttbr)
+        for page in range(256):
+            table.map(page << 12, page << 12, 'small')
+        for section in range(1, 4096):
+            table.map(section << 20, section << 20, 'section')
+        return table
+
+    @classmethod
+    def from_mappings(cls, mappings, ttbr=DEFAULT_TTBR):
+        """Build a table from [{"va": ..., "pa": ..., "size": "small", "count": 1}, ...]"""
+        table = cls(ttbr)
+        for mapping in mappings:
+            size = mapping.get('size', 'small')
+            if size not in PAGE_SHIFTS:
+                raise ValueError(f"Unknown page size: {size}. Must be one of {sorted(PAGE_SHIFTS)}")
+            step = 1 << PAGE_SHIFTS[size]
+            virtual, physical = parse_address(mapping['va']), parse_address(mapping['pa'])
+            for i in range(mapping.get('count', 1)):
+                table.map(virtual + i * step, physical + i * step, size)
+        return table
+
+
+def parse_address(value):
+    return int(value, 0) if isinstance(value, str) else int(value)
+
+
+class MMU:
+    """Translates every fetch and data address before it reaches the physically indexed caches.
+
+    TLB hits are free (the lookup overlaps the L1 access); a miss walks the page
+    table through the first-level data cache, and the cycles those reads charge
+    are counted as walk cycles.
+    """
+
+    def __init__(self, page_table, itlb, dtlb):
+        self.page_table = page_table
+        self.itlb = itlb
+        self.dtlb = dtlb
+        self.hierarchy = None
+        self.reset_stats()
+
+    def attach(self, hierarchy):
+        self.hierarchy = hierarchy
+
+    def reset_stats(self):
+        self.itlb.reset_stats()
+        self.dtlb.reset_stats()
+        self.walks = 0
+        self.walk_reads = 0
+        self.walk_cycles = 0
+        self.faults = 0
+
+    def translate(self, address, kind):
+        """Physical address for a fetch ('i') or data ('d') access, raises TranslationFault"""
+        address &= 0xFFFFFFFF
+        tlb = self.itlb if kind == 'i' else self.dtlb
+        entry = tlb.lookup(address)
+        if entry is None:
+            entry = self.walk(address, kind)
+            tlb.insert(address, *entry)
+        base, shift = entry
+        return base | (address & ((1 << shift) - 1))
+
+    def walk(self, address, kind):
+        hierarchy = self.hierarchy
+        descriptor_addresses, outcome = self.page_table.walk(address)
+        before = hierarchy.foreground_cycles()
+        for descriptor_address in descriptor_addresses:
+            hierarchy.data_cache.read(descriptor_address)
+        self.walk_cycles += hierarchy.foreground_cycles() - before
+        self.walks += 1
+        self.walk_reads += len(descriptor_addresses)
+        if isinstance(outcome, int):
+            self.faults += 1
+            raise TranslationFault(address, kind, outcome)
+        return outcome
+
+    def describe(self):
+        return f"ITLB {self.itlb.describe()}, DTLB {self.dtlb.describe()}"
+
+    def get_stats(self):
+        return {
+            'itlb': self.itlb.get_stats(),
+            'dtlb': self.dtlb.get_stats(),
+            'walks': self.walks,
+            'walk_reads': self.walk_reads,
+            'walk_cycles': self.walk_cycles,
+            'faults': self.faults
+        }
+
+
+def make_mmu(spec):
+    """Create an MMU from True/"default" or a dict like
+    {"itlb_entries": 32, "itlb_associativity": "full", "dtlb_entries": 64, "dtlb_associativity": 4,
+     "ttbr": 16384, "mappings": [{"va": "0x0", "pa": "0x0", "size": "small", "count": 1}]}
+
+    Without mappings the whole address space is identity-mapped. Returns None when spec is None/False.
+    """
+    if spec is None or spec is False:
+        return None
+    if spec is True or spec == "default":
+        spec = {}
+    params = dict(spec)
+    itlb = TLB(params.pop('itlb_entries', 32), params.pop('itlb_associativity', "full"))
+    dtlb = TLB(params.pop('dtlb_entries', 32), params.pop('dtlb_associativity', "full"))
+    ttbr = parse_address(params.pop('ttbr', DEFAULT_TTBR))
+    mappings = params.pop('mappings', None)
+    if params:
+        raise ValueError(f"Unknown MMU parameters: {sorted(params)}")
+    page_table = PageTable.identity(ttbr) if mappings is None else PageTable.from_mappings(mappings, ttbr)
+    return MMU(page_table, itlb, dtlb)
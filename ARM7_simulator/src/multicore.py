@@ -0,0 +1,170 @@
+# multicore.py - Several cores with private L1s sharing an L2 through MESI snooping
+
+import time
+
+import memory_hierarchy as hierarchy_module
+import registers
+from cache import Cache
+from coherence import CoherentCache, SnoopBus
+from flags import flag
+from memory_hierarchy import MemoryHierarchy
+from registers import NUM_REGISTERS, PC
+from timing import TimingModel
+
+
+class Core:
+    """Architectural state of one core, swapped into the global register file and flags while it runs"""
+
+    def __init__(self, core_id, base, end, view):
+        self.core_id = core_id
+        self.registers = [0] * NUM_REGISTERS
+        self.registers[PC] = base
+        self.flags = {'z': False, 'n': False, 'c': False, 'v': False}
+        self.end = end    # Address just past this core's program
+        self.view = view  # MemoryHierarchy over this core's L1s and the shared levels
+        self.instruction_count = 0
+        self.quanta = 0
+        self.halt_reason = None
+
+    def switch_in(self):
+        registers.registers[:] = self.registers
+        flag.update(self.flags)
+        hierarchy_module.memory_hierarchy = self.view
+
+    def switch_out(self):
+        self.registers = list(registers.registers)
+        self.flags = dict(flag)
+
+
+class MultiCoreSystem:
+    """N cores, each with a private L1I and a MESI-coherent L1D, sharing one L2.
+
+    Instruction caches are not kept coherent: the simulated programs never write code.
+    """
+
+    def __init__(self, num_cores, timing=None, l1_size=1024, l1_block_size=16, l1_associativity=1,
+                 l2_size=16384, l2_block_size=32, l2_associativity=1, l1_replacement="lru", l2_replacement="lru"):
+        if num_cores <= 0:
+            raise ValueError(f"Number of cores must be positive: {num_cores}")
+        print(f"Initializing {num_cores}-core system with a shared L2:")
+        self.timing = timing if timing is not None else TimingModel()
+        self.l2 = Cache(l2_size, l2_block_size, min(l2_associativity, l2_size // l2_block_size),
+                        next_level=None, replacement=l2_replacement)
+        self.l2.set_timing(self.timing, 2)
+        self.bus = SnoopBus()
+        self.cores = []
+        self.num_cores = num_cores
+        self.l1_args = (l1_size, l1_block_size, min(l1_associativity, l1_size // l1_block_size))
+        self.l1_replacement = l1_replacement
+
+    def make_view(self, core_id):
+        """Build one core's private caches and its view of the hierarchy"""
+        l1i = Cache(*self.l1_args, next_level=self.l2, replacement=self.l1_replacement, seed=2 * core_id)
+        l1d = CoherentCache(*self.l1_args, next_level=self.l2, replacement=self.l1_replacement,
+                            seed=2 * core_id + 1, core_id=core_id)
+        for cache in (l1i, l1d):
+            cache.set_timing(self.timing, 1)
+        self.bus.attach(l1d)
+        caches = {f"C{core_id}.L1I": l1i, f"C{core_id}.L1D": l1d, 'L2': self.l2}
+        return MemoryHierarchy.from_caches(caches, [[f"C{core_id}.L1I", f"C{core_id}.L1D"], ['L2']], self.timing)
+
+    def add_core(self, base, end):
+        core = Core(len(self.cores), base, end, self.make_view(len(self.cores)))
+        self.cores.append(core)
+        return core
+
+    def run(self, quantum=100, max_instructions=1000, timeout=None):
+        """Run the cores round-robin, quantum instructions at a time, until every core halts
+
+        An idle loop only ends a core's quantum, since another core may still write what it
+        is spinning on; the cores halt as idle once every running core spins in the same
+        state for two rounds in a row.
+        """
+        from main import run_program
+
+        deadline = time.monotonic() + timeout if timeout else None
+        running = list(self.cores)
+        spinning = {}  # core id -> (registers, flags) of the cores that ended the last round in an idle loop
+        while running:
+            idle = {}
+            for core in list(running):
+                core.switch_in()
+                budget = min(quantum, max_instructions - core.instruction_count)
+                count, halt_reason = run_program(core.end, budget, verbose=False)
+                core.switch_out()
+                core.instruction_count += count
+                core.quanta += 1
+                if halt_reason not in ("max_instructions", "idle_loop"):
+                    core.halt_reason = halt_reason
+                elif core.instruction_count >= max_instructions:
+                    core.halt_reason = "max_instructions"
+                if core.halt_reason is not None:
+                    running.remove(core)
+                elif halt_reason == "idle_loop":
+                    idle[core.core_id] = (tuple(core.registers), tuple(core.flags.values()))
+            # Every core still running spins exactly as it did a round ago: none of them can make progress
+            if running and len(idle) == len(running) and idle == spinning:
+                for core in running:
+                    core.halt_reason = "idle_loop"
+                break
+            spinning = idle
+            if deadline is not None and running and time.monotonic() > deadline:
+                for core in running:
+                    core.halt_reason = "timeout"
+                break
+
+    def reset_stats(self):
+        self.l2.reset_stats()
+        self.bus.reset_stats()
+        for core in self.cores:
+            core.view.reset_stats()
+
+    def get_stats(self):
+        """Per-core L1 statistics, shared L2 statistics and coherence traffic"""
+        cores = []
+        l1_misses = 0
+        writebacks = self.l2.writebacks
+        for core in self.cores:
+            core.view.settle_fetches()
+            l1i = core.view.instruction_cache.get_stats()
+            l1d = core.view.data_cache.get_stats()
+            l1_misses += l1i['misses'] + l1d['misses']
+            writebacks += l1i['writebacks'] + l1d['writebacks']
+            cores.append({
+                'core': core.core_id,
+                'instructions': core.instruction_count,
+                'quanta': core.quanta,
+                'halt_reason': core.halt_reason,
+                'l1i': {key: l1i[key] for key in ('hits', 'misses', 'hit_rate')},
+                'l1d': {key: l1d[key] for key in ('hits', 'misses', 'writebacks', 'hit_rate')},
+                'coherence': l1d['coherence']
+            })
+        l2 = self.l2.get_stats()
+        return {
+            'cores': cores,
+            'l2': {key: l2[key] for key in ('hits', 'misses', 'writebacks', 'hit_rate', 'compulsory_misses',
+                                            'capacity_misses', 'conflict_misses')},
+            'bus': self.bus.get_stats(),
+            'sharing_misses': sum(core['coherence']['coherence_misses'] for core in cores),
+            'instructions': sum(core.instruction_count for core in self.cores),
+            # Same weights as the single-core cost
+            'cost': 0.5 * l1_misses + l2['misses'] + writebacks
+        }
+
+    def print_stats(self):
+        stats = self.get_stats()
+        print(f"\n=== Multi-core Statistics ({self.num_cores} cores) ===")
+        for core in stats['cores']:
+            print(f"Core {core['core']}: {core['instructions']} instructions in {core['quanta']} quanta "
+                  f"({(core['halt_reason'] or 'running').replace('_', ' ')})")
+            print(f"  L1I: {core['l1i']['hits']} hits, {core['l1i']['misses']} misses; "
+                  f"L1D: {core['l1d']['hits']} hits, {core['l1d']['misses']} misses "
+                  f"({core['coherence']['coherence_misses']} sharing misses, "
+                  f"{core['coherence']['invalidations_received']} invalidations received)")
+        l2 = stats['l2']
+        print(f"Shared L2: {l2['hits']} hits, {l2['misses']} misses (Hit Rate: {l2['hit_rate']:.3f})")
+        bus = stats['bus']
+        print(f"Bus: {bus['bus_reads']} BusRd, {bus['bus_read_exclusive']} BusRdX, {bus['upgrades']} BusUpgr, "
+              f"{bus['invalidations']} invalidations, {bus['interventions']} modified-block flushes")
+        print(f"Cost: {stats['cost']:.2f}")
+        print("========================\n")
@@ -0,0 +1,341 @@
+# offload.py - Functional core as producer, cache hierarchies in consumer processes over a shared-memory ring
+
+import json
+import multiprocessing
+import os
+import queue
+import struct
+import time
+from contextlib import redirect_stdout
+from multiprocessing import shared_memory
+
+import memory_hierarchy as hierarchy_module
+from memory import init_memory, read_word
+from registers import init_registers
+from file_reader import load_binary
+from memory_hierarchy import MemoryHierarchy, COST_FORMULA
+from timing import TimingModel
+from energy import EnergyModel
+from trace import READ, WRITE, IFETCH, BINARY_RECORD, replay
+from sweep import DEFAULT_SWEEP, DEFAULT_OPTIONS, load_sweep_spec, expand_sweep, config_name, hierarchy_arguments
+
+BATCH_RECORDS = 4096  # Access records per ring slot
+RING_SLOTS = 8        # Slots in the ring; the producer blocks when every consumer is this many batches behind
+SLOT_HEADER = struct.Struct("<I")  # Number of records in the slot
+END_OF_STREAM = 0xFFFFFFFF
+MEASURE = 3  # Record kind marking the end of the warm-up, not an access
+SLOT_BYTES = SLOT_HEADER.size + BATCH_RECORDS * BINARY_RECORD.size
+
+
+class AccessRing:
+    """Producer side of a bounded broadcast ring in shared memory.
+
+    Every consumer reads every batch. Each consumer has a `filled` semaphore
+    (batches ready for it) and a `freed` semaphore (slots it has finished with,
+    starting at the ring size); the producer takes one `freed` credit from every
+    consumer before reusing a slot, which is the back-pressure that bounds memory.
+    """
+
+    def __init__(self, consumers, slots=RING_SLOTS):
+        self.slots = slots
+        self.shm = shared_memory.SharedMemory(create=True, size=SLOT_BYTES * slots)
+        self.filled = [multiprocessing.Semaphore(0) for _ in range(consumers)]
+        self.freed = [multiprocessing.Semaphore(slots) for _ in range(consumers)]
+        self.batches = 0   # Batches published so far
+        self.count = 0     # Records in the slot being filled
+        self.offset = None
+        self.stalls = 0    # Times the producer had to wait for a consumer
+        self.processes = []
+
+    def check_consumers(self):
+        for process in self.processes:
+            if not process.is_alive() and process.exitcode:
+                raise RuntimeError(f"Consumer process exited with code {process.exitcode}")
+
+    def claim_slot(self):
+        for freed in self.freed:
+            if not freed.acquire(block=False):
+                self.stalls += 1
+                while not freed.acquire(timeout=1):
+                    self.check_consumers()
+        self.offset = (self.batches % self.slots) * SLOT_BYTES
+        self.count = 0
+
+    def push(self, kind, address):
+        if self.offset is None:
+            self.claim_slot()
+        BINARY_RECORD.pack_into(self.shm.buf, self.offset + SLOT_HEADER.size + self.count * BINARY_RECORD.size,
+                                kind, address & 0xFFFFFFFF)
+        self.count += 1
+        if self.count == BATCH_RECORDS:
+            self.publish(self.count)
+
+    def publish(self, count):
+        SLOT_HEADER.pack_into(self.shm.buf, self.offset, count)
+        self.batches += 1
+        self.offset = None
+        for filled in self.filled:
+            filled.release()
+
+    def close(self):
+        """Publish the last partial batch and the end-of-stream marker"""
+        if self.offset is not None and self.count:
+            self.publish(self.count)
+        self.claim_slot()
+        self.publish(END_OF_STREAM)
+
+    def release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class RecordingHierarchy:
+    """Stands in for the memory hierarchy in the functional core: pushes every access to the ring.
+
+    Data lives in a word dict over the loaded memory image, which behaves like caches
+    that never evict; fetches read the image itself, as the split L1I never sees stores.
+    """
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.values = {}  # word address -> last value stored there
+        self.watcher = None
+        self.instruction_count = 0
+        self.initialized = True
+
+    def read_instruction(self, address):
+        self.ring.push(IFETCH, address)
+        return read_word(address & 0xFFFFFFFF & ~3)
+
+    def read_data(self, address, pc=None):
+        self.ring.push(READ, address)
+        word = address & 0xFFFFFFFF & ~3
+        return self.values[word] if word in self.values else read_word(word)
+
+    def write_data(self, address, data, pc=None):
+        self.ring.push(WRITE, address)
+        self.values[address & 0xFFFFFFFF & ~3] = data
+
+    def record_branch(self, pc, conditional, taken, target):
+        pass
+
+    def record_predicated(self, executed):
+        pass
+
+    def charge_instruction(self, raw=None, decoded=None, executed=True):
+        self.instruction_count += 1
+
+    def begin_measurement(self):
+        self.ring.push(MEASURE, 0)
+
+    def drain_write_buffers(self):
+        pass
+
+
+def split_at_measure(accesses):
+    """Split a batch into the runs of accesses between warm-up markers"""
+    segments = [[]]
+    for record in accesses:
+        if record[0] == MEASURE:
+            segments.append([])
+        else:
+            segments[-1].append(record)
+    return segments
+
+
+def consume(shm_name, slots, filled, freed, configs, timing_params, energy_params, results):
+    """Consumer process: replay every batch into the hierarchies of its configurations"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            timing = TimingModel.from_dict(timing_params)
+            energy = EnergyModel.from_dict(energy_params) if energy_params is not None else None
+            hierarchies = {}
+            errors = {}
+            for index, config in configs:
+                try:
+                    hierarchies[index] = MemoryHierarchy(timing=timing, energy=energy, **hierarchy_arguments(config))
+                except Exception as e:
+                    errors[index] = f"{type(e).__name__}: {str(e)}"
+            records = 0
+            batch = 0
+            while True:
+                filled.acquire()
+                offset = (batch % slots) * SLOT_BYTES
+                count = SLOT_HEADER.unpack_from(shm.buf, offset)[0]
+                if count == END_OF_STREAM:
+                    freed.release()
+                    break
+                start = offset + SLOT_HEADER.size
+                data = bytes(shm.buf[start:start + count * BINARY_RECORD.size])
+                # Copy out and hand the slot back before simulating, so the producer keeps going
+                freed.release()
+                batch += 1
+                records += count
+                segments = split_at_measure(BINARY_RECORD.iter_unpack(data))
+                records -= len(segments) - 1
+                for index, hierarchy in list(hierarchies.items()):
+                    try:
+                        for n, accesses in enumerate(segments):
+                            if n:
+                                hierarchy.begin_measurement()
+                            replay(accesses, hierarchy)
+                    except Exception as e:
+                        errors[index] = f"{type(e).__name__}: {str(e)}"
+                        del hierarchies[index]
+        for hierarchy in hierarchies.values():
+            hierarchy.drain_write_buffers()
+        outcome = [(index, records, hierarchy.get_total_stats(), None) for index, hierarchy in hierarchies.items()]
+        outcome += [(index, records, None, error) for index, error in errors.items()]
+        results.put(outcome)
+    finally:
+        shm.close()
+
+
+def run_offloaded_experiments(binary_file, timing=None, sweep_file=None, consumers=2, max_instructions=None,
+                              timeout=None, rank_by='cost', warmup=None, energy=None):
+    """Run the binary once on the functional core and simulate every sweep configuration in consumers
+
+    Configurations are dealt round-robin to the consumer processes; each consumer replays
+    the whole access stream into all of its hierarchies. Branch predictors and pipeline
+    models need more than the access stream, so configurations using them are skipped.
+    The producer marks the end of the warm-up in the stream, where every consumer resets
+    its statistics.
+    """
+    from main import run_program, get_bin_file_length
+
+    if consumers <= 0:
+        raise ValueError(f"Number of consumers must be positive: {consumers}")
+    axes, options = load_sweep_spec(sweep_file) if sweep_file else (dict(DEFAULT_SWEEP), dict(DEFAULT_OPTIONS))
+    if max_instructions is not None:
+        options['max_instructions'] = max_instructions
+    if timeout is not None:
+        options['timeout'] = timeout
+    if warmup is not None:
+        options['warmup'] = warmup
+    configurations, skipped = expand_sweep(axes)
+    usable = [(i, config) for i, config in enumerate(configurations)
+              if config['branch_predictor'] is None and config['pipeline'] is None]
+    unsupported = len(configurations) - len(usable)
+    consumers = max(1, min(consumers, len(usable)))
+    timing = timing if timing is not None else TimingModel()
+    from main import RANK_METRICS
+    metric = RANK_METRICS[rank_by]
+
+    print(f"\n{'='*80}")
+    print(f"OFFLOADED CACHE EXPERIMENTS FOR {binary_file}")
+    print(f"Simulating {len(usable)} configurations in {consumers} consumer processes "
+          f"({skipped} invalid points skipped, {unsupported} need branch or pipeline models)")
+    print(f"{'='*80}")
+
+    ring = AccessRing(consumers)
+    results_queue = multiprocessing.Queue()
+    processes = []
+    try:
+        for n in range(consumers):
+            share = usable[n::consumers]
+            process = multiprocessing.Process(target=consume, args=(ring.shm.name, ring.slots, ring.filled[n],
+                                                                    ring.freed[n], share, timing.to_dict(),
+                                                                    energy.to_dict() if energy is not None else None,
+                                                                    results_queue))
+            process.start()
+            processes.append(process)
+        ring.processes = processes
+
+        init_memory()
+        init_registers()
+        if load_binary(binary_file) != 0:
+            raise OSError(f"Failed to load binary file {binary_file}")
+        hierarchy_module.memory_hierarchy = RecordingHierarchy(ring)
+        start = time.perf_counter()
+        instruction_count, halt_reason = run_program(get_bin_file_length(binary_file), options['max_instructions'],
+                                                     verbose=False, timeout=options['timeout'],
+                                                     warmup=options['warmup'])
+        ring.close()
+        produced = time.perf_counter() - start
+
+        outcomes = []
+        received = 0
+        while received < len(processes):
+            try:
+                outcomes += results_queue.get(timeout=1)
+                received += 1
+            except queue.Empty:
+                ring.check_consumers()
+        elapsed = time.perf_counter() - start
+        for process in processes:
+            process.join()
+    finally:
+        hierarchy_module.memory_hierarchy = None
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        ring.release()
+
+    print(f"Functional run: {instruction_count} instructions ({halt_reason.replace('_', ' ')}), "
+          f"{ring.batches - 1} batches in {produced:.3f}s, producer waited {ring.stalls} times")
+    print(f"All configurations simulated after {elapsed:.3f}s")
+
+    results = []
+    for index, records, stats, error in sorted(outcomes, key=lambda outcome: outcome[0]):
+        config = configurations[index]
+        print(f"\nConfiguration {index+1}/{len(configurations)}: {config_name(config)}")
+        if error is not None:
+            print(f"✗ Configuration failed: {error}")
+            continue
+        result = dict(config)
+        result.update({
+            'config_id': index+1,
+            'config': config_name(config),
+            'records': records,
+            'cache_stats': {name: {key: cache[key] for key in ('hits', 'misses', 'writebacks', 'hit_rate', 'compulsory_misses',
+                                                               'capacity_misses', 'conflict_misses')}
+                            for name, cache in stats['caches'].items()},
+            'total_l1_misses': stats['total_l1_misses'],
+            'total_l2_misses': stats['total_l2_misses'],
+            'writebacks': stats['total_writebacks'],
+            'cost': stats['cost'],
+            'instruction_count': instruction_count,
+            'halt_reason': halt_reason,
+            'warmup_instructions': min(options['warmup'], instruction_count),
+            'total_cycles': stats['total_cycles'],
+            'cpi': stats['cpi'],
+            'amat': stats['amat'],
+            'mmu_stats': stats['mmu'],
+            'dram_stats': stats['dram'],
+            'energy': stats['energy']
+        })
+        results.append(result)
+        print(f"Cost: {stats['cost']:.2f}")
+        print(f"Cycles: {stats['total_cycles']} (CPI: {stats['cpi']:.3f}, AMAT: {stats['amat']:.3f})")
+
+    best = min(results, key=metric) if results else None
+    output_file = f"cache_results_{os.path.basename(binary_file).replace('.bin', '')}.json"
+    try:
+        with open(output_file, 'w') as f:
+            json.dump({
+                'binary_file': binary_file,
+                'mode': 'offloaded',
+                'consumers': consumers,
+                'total_configurations_tested': len(results),
+                'sweep': axes,
+                'configurations': results,
+                'rank_by': rank_by,
+                'best_configuration': best,
+                'producer': {'instructions': instruction_count, 'halt_reason': halt_reason,
+                             'batches': ring.batches - 1, 'stalls': ring.stalls, 'seconds': produced},
+                'cost_formula': COST_FORMULA,
+                'warmup_instructions': options['warmup'],
+                'timing_model': timing.to_dict(),
+                'energy_model': (energy if energy is not None else EnergyModel()).to_dict()
+            }, f, indent=2)
+        print(f"\nResults saved to {output_file}")
+    except Exception as e:
+        print(f"Error saving results: {str(e)}")
+
+    if best is not None:
+        print(f"\nBEST CONFIGURATION (by {rank_by}): {best['config']}")
+        print(f"Cost: {best['cost']:.2f}, Cycles: {best['total_cycles']}")
+    else:
+        print("No valid configurations found!")
+    return 0
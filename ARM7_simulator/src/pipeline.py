@@ -0,0 +1,105 @@
+# pipeline.py - Five-stage (IF/ID/EX/MEM/WB) in-order pipeline timing model
+
+# Instructions that set flags only, without writing rd
+COMPARE_OPS = ("CMP", "CMN", "TST", "TEQ")
+# Data-processing instructions that ignore rn
+MOVE_OPS = ("MOV", "MVN")
+
+STALL_KINDS = ("fetch", "raw", "load_use", "memory", "branch")
+
+
+def register_usage(raw, decoded):
+    """Return (source registers, destination register or None) of an instruction"""
+    if decoded.mnemonic in ("B", "SWI", "BKPT") or not decoded.is_valid:
+        return (), None
+    if decoded.mnemonic == "LDR":
+        return (decoded.rn,), decoded.rd
+    if decoded.mnemonic == "STR":
+        return (decoded.rn, decoded.rd), None
+    sources = []
+    if decoded.mnemonic not in MOVE_OPS:
+        sources.append(decoded.rn)
+    if not (raw >> 25) & 0x1:  # Register operand
+        sources.append(decoded.rm)
+    return tuple(sources), None if decoded.mnemonic in COMPARE_OPS else decoded.rd
+
+
+class Pipeline:
+    """Timing layer that follows the functional simulation one instruction at a time.
+
+    Each instruction is placed in the cycle it reaches ID. It is held there by
+    instruction cache misses (IF), by operands that are not ready yet (RAW and
+    load-use hazards) and by the memory stall or branch flush of the instruction
+    ahead of it. With forwarding, ALU results are usable by the next instruction
+    and loads one cycle later (the load-use stall). Without forwarding a consumer
+    reads its operands in ID during the producer's WB cycle (the register file is
+    written in the first half of the cycle and read in the second).
+    """
+
+    def __init__(self, forwarding=True):
+        self.forwarding = forwarding
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.instructions = 0
+        self.next_id = 1   # Earliest ID cycle for the next instruction (IF of the first is cycle 0)
+        self.finish = 0    # Cycle after the last WB
+        self.ready = {}    # register -> first cycle a consumer may be in ID
+        self.producer_is_load = {}
+        self.stalls = {kind: 0 for kind in STALL_KINDS}
+
+    def issue(self, raw, decoded, executed, fetch_stall=0, memory_stall=0, flush=0):
+        """Account for one instruction, given the extra cycles its IF and MEM stages took"""
+        self.instructions += 1
+        cycle = self.next_id + fetch_stall
+        self.stalls['fetch'] += fetch_stall
+
+        sources, dest = register_usage(raw, decoded)
+        for reg in sources:
+            ready = self.ready.get(reg, 0)
+            if ready > cycle:
+                self.stalls['load_use' if self.producer_is_load.get(reg) else 'raw'] += ready - cycle
+                cycle = ready
+
+        # Annulled instructions still flow down the pipeline but produce nothing
+        if dest is not None and executed:
+            is_load = decoded.mnemonic == "LDR"
+            if not self.forwarding:
+                self.ready[dest] = cycle + 3 + memory_stall
+            elif is_load:
+                self.ready[dest] = cycle + 2 + memory_stall
+            else:
+                self.ready[dest] = cycle + 1
+            self.producer_is_load[dest] = is_load
+
+        self.stalls['memory'] += memory_stall
+        self.stalls['branch'] += flush
+        self.next_id = cycle + 1 + memory_stall + flush
+        self.finish = max(self.finish, cycle + 4 + memory_stall)
+
+    @property
+    def total_cycles(self):
+        return self.finish
+
+    def describe(self):
+        return "5-stage" if self.forwarding else "5-stage-nofwd"
+
+    def get_stats(self):
+        return {
+            'model': self.describe(),
+            'forwarding': self.forwarding,
+            'instructions': self.instructions,
+            'total_cycles': self.total_cycles,
+            'stalls': dict(self.stalls),
+            'stall_cycles': sum(self.stalls.values()),
+            'cpi': self.total_cycles / self.instructions if self.instructions > 0 else 0
+        }
+
+
+def make_pipeline(spec):
+    """Create a pipeline from True, a dict like {"forwarding": false}, or None/False for none"""
+    if spec is None or spec is False:
+        return None
+    if spec is True:
+        return Pipeline()
+    return Pipeline(**dict(spec))
@@ -0,0 +1,126 @@
+# prefetch.py - Hardware prefetcher models that can be attached to any cache
+
+
+class Prefetcher:
+    """Base class: watches demand accesses and proposes block addresses to prefetch.
+
+    degree   - number of blocks requested per trigger
+    distance - how many blocks ahead of the current access the first request is
+    """
+    name = "base"
+
+    def __init__(self, degree=1, distance=1, late_window=4):
+        if degree <= 0 or distance <= 0:
+            raise ValueError(f"Prefetch degree and distance must be positive: degree={degree}, distance={distance}")
+        self.degree = degree
+        self.distance = distance
+        self.late_window = late_window  # Demand within this many accesses of issue counts as late
+        self.block_size = 4
+
+    def attach(self, cache):
+        self.block_size = cache.block_size
+
+    def block_address(self, address):
+        return address & ~(self.block_size - 1)
+
+    def observe(self, address, pc, hit):
+        """Called on each demand access, returns a list of addresses to prefetch"""
+        return []
+
+    def describe(self):
+        return f"{self.name}(d{self.degree},x{self.distance})"
+
+
+class NextLinePrefetcher(Prefetcher):
+    """Fetches the following block(s) whenever a demand access misses"""
+    name = "next_line"
+
+    def observe(self, address, pc, hit):
+        if hit:
+            return []
+        base = self.block_address(address)
+        return [base + (self.distance + i) * self.block_size for i in range(self.degree)]
+
+
+class StridePrefetcher(Prefetcher):
+    """Reference prediction table indexed by the PC of the load/store that issued the access"""
+    name = "stride"
+
+    def __init__(self, degree=1, distance=1, late_window=4, table_size=64):
+        super().__init__(degree, distance, late_window)
+        self.table_size = table_size
+        # Each entry: [tag pc, last address, stride, confidence]
+        self.table = [None] * table_size
+
+    def observe(self, address, pc, hit):
+        pc = pc if pc is not None else 0
+        slot = (pc >> 2) % self.table_size
+        entry = self.table[slot]
+        if entry is None or entry[0] != pc:
+            self.table[slot] = [pc, address, 0, 0]
+            return []
+
+        stride = address - entry[1]
+        if stride != 0 and stride == entry[2]:
+            entry[3] = min(entry[3] + 1, 3)
+        else:
+            entry[3] = max(entry[3] - 1, 0)
+            entry[2] = stride
+        entry[1] = address
+
+        if entry[3] < 2 or entry[2] == 0:
+            return []
+        return [address + entry[2] * (self.distance + i) for i in range(self.degree)]
+
+
+class StreamPrefetcher(Prefetcher):
+    """Detects ascending or descending block streams from misses and runs ahead of them"""
+    name = "stream"
+
+    def __init__(self, degree=1, distance=2, late_window=4, streams=4, window=2):
+        super().__init__(degree, distance, late_window)
+        self.max_streams = streams
+        self.window = window  # Blocks either side of a stream head that count as continuing it
+        self.streams = []  # Each: [last block number, direction, confirmed], most recent last
+
+    def observe(self, address, pc, hit):
+        if hit:
+            return []
+        block = address // self.block_size
+        for i, stream in enumerate(self.streams):
+            delta = block - stream[0]
+            if delta != 0 and abs(delta) <= self.window:
+                direction = 1 if delta > 0 else -1
+                stream[2] = stream[2] + 1 if direction == stream[1] else 0
+                stream[0], stream[1] = block, direction
+                self.streams.append(self.streams.pop(i))
+                if stream[2] == 0:
+                    return []
+                return [(block + direction * (self.distance + j)) * self.block_size
+                        for j in range(self.degree) if block + direction * (self.distance + j) >= 0]
+
+        # Start tracking a new stream, replacing the least recently used one
+        if len(self.streams) >= self.max_streams:
+            self.streams.pop(0)
+        self.streams.append([block, 1, 0])
+        return []
+
+
+PREFETCHERS = {
+    'next_line': NextLinePrefetcher,
+    'stride': StridePrefetcher,
+    'stream': StreamPrefetcher,
+}
+
+
+def make_prefetcher(spec):
+    """Create a prefetcher from a name or a dict like {"type": "stride", "degree": 2, "distance": 1}"""
+    if spec is None:
+        return None
+    if isinstance(spec, str):
+        spec = {'type': spec}
+    params = dict(spec)
+    kind = params.pop('type', None)
+    if kind not in PREFETCHERS:
+        raise ValueError(f"Unknown prefetcher: {kind}. Must be one of {sorted(PREFETCHERS)}")
+    return PREFETCHERS[kind](**params)
@@ -0,0 +1,155 @@
+# replacement.py - Pluggable cache replacement policies
+
+import random
+
+
+class ReplacementPolicy:
+    """Base class: tracks per-set state and chooses a victim way on a miss"""
+    name = "base"
+
+    def __init__(self, num_sets, associativity):
+        self.num_sets = num_sets
+        self.associativity = associativity
+
+    def touch(self, index, way):
+        """Called on every hit to a way"""
+
+    def fill(self, index, way):
+        """Called when a new block is placed into a way"""
+        self.touch(index, way)
+
+    def victim(self, index):
+        """Return the way to evict from a full set"""
+        raise NotImplementedError
+
+
+class LRUPolicy(ReplacementPolicy):
+    """True LRU using a global access counter per block"""
+    name = "lru"
+
+    def __init__(self, num_sets, associativity):
+        super().__init__(num_sets, associativity)
+        self.counter = 0
+        self.stamps = [[0] * associativity for _ in range(num_sets)]
+
+    def touch(self, index, way):
+        self.counter += 1
+        self.stamps[index][way] = self.counter
+
+    def victim(self, index):
+        stamps = self.stamps[index]
+        return stamps.index(min(stamps))
+
+
+class TreePLRUPolicy(ReplacementPolicy):
+    """Tree pseudo-LRU with the tree for each set packed into one integer.
+
+    Node n (1-based heap order) is bit n of the set's integer; a 0 bit means the
+    pseudo-LRU side is the left subtree, a 1 bit means the right subtree.
+    """
+    name = "plru"
+
+    def __init__(self, num_sets, associativity):
+        if associativity & (associativity - 1):
+            raise ValueError(f"Tree PLRU requires a power-of-two associativity, got {associativity}")
+        super().__init__(num_sets, associativity)
+        self.levels = associativity.bit_length() - 1
+        self.bits = [0] * num_sets
+
+    def touch(self, index, way):
+        bits = self.bits[index]
+        node = 1
+        for level in range(self.levels - 1, -1, -1):
+            direction = (way >> level) & 1
+            # Point this node away from the way just used
+            if direction:
+                bits &= ~(1 << node)
+            else:
+                bits |= (1 << node)
+            node = (node << 1) | direction
+        self.bits[index] = bits
+
+    def victim(self, index):
+        bits = self.bits[index]
+        node = 1
+        for _ in range(self.levels):
+            node = (node << 1) | ((bits >> node) & 1)
+        return node - self.associativity
+
+
+class FIFOPolicy(ReplacementPolicy):
+    """First-in first-out using an insertion stamp per block.
+
+    Only a fill moves a way to the back of the queue, so refilling a way that was
+    invalidated leaves the order of the other ways alone.
+    """
+    name = "fifo"
+
+    def __init__(self, num_sets, associativity):
+        super().__init__(num_sets, associativity)
+        self.counter = 0
+        self.stamps = [[0] * associativity for _ in range(num_sets)]
+
+    def fill(self, index, way):
+        self.counter += 1
+        self.stamps[index][way] = self.counter
+
+    def victim(self, index):
+        stamps = self.stamps[index]
+        return stamps.index(min(stamps))
+
+
+class RandomPolicy(ReplacementPolicy):
+    """Uniform random victim selection with a fixed seed for reproducible runs"""
+    name = "random"
+
+    def __init__(self, num_sets, associativity, seed=0):
+        super().__init__(num_sets, associativity)
+        self.rng = random.Random(seed)
+
+    def victim(self, index):
+        return self.rng.randrange(self.associativity)
+
+
+class SRRIPPolicy(ReplacementPolicy):
+    """Static re-reference interval prediction with 2-bit RRPVs (hit-priority variant)"""
+    name = "srrip"
+
+    def __init__(self, num_sets, associativity, rrpv_bits=2):
+        super().__init__(num_sets, associativity)
+        self.max_rrpv = (1 << rrpv_bits) - 1
+        self.rrpv = [bytearray([self.max_rrpv] * associativity) for _ in range(num_sets)]
+
+    def touch(self, index, way):
+        self.rrpv[index][way] = 0
+
+    def fill(self, index, way):
+        # New blocks are predicted to be re-referenced in the distant future
+        self.rrpv[index][way] = self.max_rrpv - 1
+
+    def victim(self, index):
+        rrpv = self.rrpv[index]
+        while True:
+            way = rrpv.find(self.max_rrpv)
+            if way != -1:
+                return way
+            for i in range(self.associativity):
+                rrpv[i] += 1
+
+
+REPLACEMENT_POLICIES = {
+    'lru': LRUPolicy,
+    'plru': TreePLRUPolicy,
+    'fifo': FIFOPolicy,
+    'random': RandomPolicy,
+    'srrip': SRRIPPolicy,
+}
+
+
+def make_replacement_policy(name, num_sets, associativity, seed=0):
+    """Create a replacement policy by name"""
+    if name not in REPLACEMENT_POLICIES:
+        raise ValueError(f"Unknown replacement policy: {name}. Must be one of {sorted(REPLACEMENT_POLICIES)}")
+    if name == 'random':
+        return RandomPolicy(num_sets, associativity, seed)
+    return REPLACEMENT_POLICIES[name](num_sets, associativity)
@@ -0,0 +1,138 @@
+# result_store.py - Persistent content-addressed store for experiment results
+
+import hashlib
+import json
+import os
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_DIR = ".sim_results"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+EVICT_TO = 0.9  # Eviction frees space down to this share of the limit, so a full store is not rescanned on every put
+
+
+def hash_file(filepath):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_version(directory=SOURCE_DIR):
+    """SHA-256 over the simulator's Python sources (tests excluded)
+
+    Any change to the code gives new keys, so a stored result never outlives the
+    simulator that produced it.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.py') and not name.startswith('test_'):
+            digest.update(f"{name}:{hash_file(os.path.join(directory, name))}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+SIMULATOR_VERSION = source_version()
+
+
+def result_key(binary_hash, config, timing, max_instructions):
+    """Key for one simulation: binary contents, full configuration, limits and simulator version"""
+    material = json.dumps({
+        'binary': binary_hash,
+        'config': config,
+        'timing': timing,
+        'max_instructions': max_instructions,
+        'version': SIMULATOR_VERSION
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ResultStore:
+    """Directory of JSON result files named by their key, evicting least recently used files past max_bytes"""
+
+    def __init__(self, directory=DEFAULT_STORE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        if max_bytes <= 0:
+            raise ValueError(f"Result store size limit must be positive: {max_bytes}")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(size for _, size, _ in self.entries())
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Return the stored result for key, or None"""
+        path = self.path_for(key)
+        try:
+            with open(path, 'r') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # Mark as recently used for eviction
+        except OSError:
+            pass
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """Store a result atomically, then evict old entries if the store grew past the size limit"""
+        path = self.path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(result, f)
+        size = os.path.getsize(tmp_path)
+        try:
+            self.total_bytes -= os.path.getsize(path)
+        except OSError:
+            pass
+        os.replace(tmp_path, path)
+        self.total_bytes += size
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        """(last use, size, path) of every stored result"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            entries.append((info.st_mtime, info.st_size, path))
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the store is back under EVICT_TO of max_bytes
+
+        The directory is only scanned here, once the running size count crosses the
+        limit, which also picks up entries written by other processes.
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.evictions += 1
+            except OSError:
+                pass
+        self.total_bytes = total
+
+    def get_stats(self):
+        return {
+            'directory': self.directory,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,340 @@
+# search.py - Heuristic search of the cache design space: successive halving, then hill climbing
+
+import json
+import math
+import os
+import random
+import time
+
+from sweep import (SWEEP_AXES, DEFAULT_SWEEP, DEFAULT_OPTIONS, BranchAndBound, load_sweep_spec, normalize_config,
+                   config_key, config_name)
+from timing import TimingModel
+from memory_hierarchy import COST_FORMULA
+from energy import EnergyModel, pareto_front, PARETO_OBJECTIVES
+from result_store import hash_file
+
+DEFAULT_ETA = 3     # Each halving rung keeps 1/eta of the candidates and gives them eta times the instructions
+DEFAULT_RUNGS = 3   # Instruction budgets in the halving phase, the last one being the full budget
+MAX_STALLS = 50     # Restarts in a row that evaluate nothing new before the space counts as exhausted
+
+
+class DesignSpace:
+    """The sweep axes as a space of value indices, searched point by point instead of expanded into a grid"""
+
+    def __init__(self, axes):
+        self.axes = axes
+        self.sizes = [len(axes[name]) for name in SWEEP_AXES]
+        # Numeric axes are ordered, so a neighbour is one step along them; other axes may jump to any value
+        self.ordered = [all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in axes[name])
+                        for name in SWEEP_AXES]
+
+    def points(self):
+        """Number of points in the space, valid or not"""
+        return math.prod(self.sizes)
+
+    def config(self, point):
+        """Normalized configuration of a point, or None if it cannot be built"""
+        return normalize_config({name: self.axes[name][i] for name, i in zip(SWEEP_AXES, point)})
+
+    def random_point(self, rng):
+        return tuple(rng.randrange(size) for size in self.sizes)
+
+    def neighbours(self, point):
+        """Points that differ from point in one axis"""
+        neighbours = []
+        for axis, (i, size) in enumerate(zip(point, self.sizes)):
+            if self.ordered[axis]:
+                choices = [j for j in (i - 1, i + 1) if 0 <= j < size]
+            else:
+                choices = [j for j in range(size) if j != i]
+            neighbours += [point[:axis] + (j,) + point[axis + 1:] for j in choices]
+        return neighbours
+
+    def mutate(self, point, rng, changes=2):
+        """Point with up to `changes` axes set to random values"""
+        point = list(point)
+        axes = [axis for axis, size in enumerate(self.sizes) if size > 1]
+        for axis in rng.sample(axes, min(changes, len(axes))):
+            point[axis] = rng.randrange(self.sizes[axis])
+        return tuple(point)
+
+
+class HeuristicSearch:
+    """Searches a design space within a fixed number of simulations.
+
+    Successive halving first samples random configurations, runs them on a short
+    instruction budget and keeps the best 1/eta for a run eta times longer, until
+    the survivors run the full budget. Hill climbing then starts from the best
+    survivor: it moves to the first neighbour (one axis changed) that improves the
+    ranking metric, and at a local optimum restarts from a random perturbation of
+    the best point found. Full-budget runs are pruned against the current point
+    with branch and bound. Every simulation counts against the budget; points
+    already simulated are looked up instead. The seed makes the search repeatable.
+    """
+
+    def __init__(self, binary_file, axes, options, budget, seed=0, rank_by='cost', timing=None, energy=None,
+                 store=None, eta=DEFAULT_ETA, rungs=DEFAULT_RUNGS, time_budget=None):
+        from main import RANK_METRICS
+
+        if budget <= 0:
+            raise ValueError(f"Evaluation budget must be positive: {budget}")
+        if eta < 2 or rungs < 1:
+            raise ValueError(f"Successive halving needs eta >= 2 and at least one rung: eta={eta}, rungs={rungs}")
+        if rank_by not in RANK_METRICS:
+            raise ValueError(f"Unknown ranking metric: {rank_by}. Must be one of {sorted(RANK_METRICS)}")
+        self.binary_file = binary_file
+        self.space = DesignSpace(axes)
+        self.options = options
+        self.budget = budget
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.rank_by = rank_by
+        self.metric = RANK_METRICS[rank_by]
+        self.timing = timing
+        self.energy = energy
+        self.store = store
+        self.binary_hash = hash_file(binary_file) if store is not None else None
+        self.eta = eta
+        self.rungs = rungs
+        self.time_budget = time_budget
+        self.start = time.perf_counter()
+
+        self.evaluations = 0
+        self.simulated = {}  # (config key, instructions) -> (value or None, incumbent it was pruned against or None)
+        self.results = []    # Complete full-budget results
+        self.best = None
+        self.best_point = None
+        self.history = []
+        self.convergence = []
+
+    def has_budget(self):
+        if self.evaluations >= self.budget:
+            return False
+        return self.time_budget is None or time.perf_counter() - self.start < self.time_budget
+
+    def halving_overdue(self):
+        """Whether successive halving has used up its half of the time budget"""
+        return self.time_budget is not None and time.perf_counter() - self.start >= self.time_budget / 2
+
+    def rung_instructions(self, rung):
+        """Instruction budget of a halving rung (warm-up instructions are always run in full)"""
+        full = self.options['max_instructions']
+        warmup = min(self.options['warmup'], full)
+        return warmup + max(1, (full - warmup) // self.eta ** (self.rungs - 1 - rung))
+
+    def evaluate(self, point, instructions, phase, incumbent=None):
+        """Ranking value of a point run for `instructions`, or None if it cannot be built or fails
+
+        With an incumbent, the run is pruned once it is worse, and the value is infinite.
+        """
+        from main import run_or_reuse
+
+        config = self.space.config(point)
+        if config is None:
+            return None
+        key = (config_key(config), instructions)
+        if key in self.simulated:
+            value, pruned_against = self.simulated[key]
+            # A run pruned against a better incumbent says nothing about a worse one
+            if pruned_against is None or (incumbent is not None and incumbent <= pruned_against):
+                return value
+        if not self.has_budget():
+            return None
+
+        self.evaluations += 1
+        name = config_name(config)
+        print(f"\nEvaluation {self.evaluations}/{self.budget} ({phase}, {instructions} instructions): {name}")
+        bound = None
+        if incumbent is not None and math.isfinite(incumbent):
+            bound = BranchAndBound(self.metric)
+            bound.best = incumbent
+            bound.start_run()
+        try:
+            result = run_or_reuse(self.binary_file, config, dict(self.options, max_instructions=instructions),
+                                  self.timing, bound, self.store, self.binary_hash, self.energy)
+        except Exception as e:
+            print(f"Error in evaluation {self.evaluations}: {str(e)}")
+            result = None
+
+        pruned = bound is not None and bound.triggered
+        value = None
+        if result is not None:
+            value = math.inf if pruned else self.metric(result)
+        self.simulated[key] = (value, incumbent if pruned else None)
+
+        full = instructions == self.options['max_instructions']
+        if result is not None and not pruned:
+            print(f"{self.rank_by}: {value:.2f} after {result['instruction_count']} instructions "
+                  f"({result['halt_reason'].replace('_', ' ')})")
+            if full:
+                result['config_id'] = self.evaluations
+                self.results.append(result)
+                if self.best is None or value < self.metric(self.best):
+                    self.best = result
+                    self.best_point = point
+                    self.convergence.append({'evaluation': self.evaluations, 'value': value, 'config': name})
+                    print(f"★ New best {self.rank_by}: {value:.2f}")
+        elif pruned:
+            print(f"✂ Pruned after {result['instruction_count']} instructions ({self.rank_by} already exceeds {incumbent:.2f})")
+        self.history.append({
+            'evaluation': self.evaluations,
+            'phase': phase,
+            'instructions': instructions,
+            'config': name,
+            'value': value if value is not None and math.isfinite(value) else None,
+            'pruned': pruned,
+            'best': self.metric(self.best) if self.best is not None else None
+        })
+        return value
+
+    def sample(self, count):
+        """Up to count random points that build distinct configurations"""
+        points = []
+        seen = set()
+        attempts = 0
+        while len(points) < count and attempts < count * 100:
+            attempts += 1
+            point = self.space.random_point(self.rng)
+            config = self.space.config(point)
+            if config is None:
+                continue
+            key = config_key(config)
+            if key not in seen:
+                seen.add(key)
+                points.append(point)
+        return points
+
+    def successive_halving(self):
+        """Phase one, on half the budget: returns the surviving points, best first
+
+        Once half the time budget is gone, each remaining short rung stops after its
+        first result, so the survivors still reach a full-budget run.
+        """
+        weights = sum(self.eta ** -rung for rung in range(self.rungs))
+        candidates = self.sample(max(1, int(max(1, self.budget // 2) / weights)))
+        print(f"Successive halving: {len(candidates)} candidates, eta {self.eta}, "
+              f"budgets {[self.rung_instructions(rung) for rung in range(self.rungs)]} instructions")
+        survivors = candidates
+        for rung in range(self.rungs):
+            scored = []
+            for order, point in enumerate(candidates):
+                if scored and rung < self.rungs - 1 and self.halving_overdue():
+                    break
+                value = self.evaluate(point, self.rung_instructions(rung), f"halving rung {rung + 1}")
+                if value is not None:
+                    scored.append((value, order, point))
+            if not scored:
+                break
+            scored.sort()
+            survivors = [point for _, _, point in scored]
+            if rung < self.rungs - 1:
+                candidates = survivors[:max(1, len(scored) // self.eta)]
+        return survivors
+
+    def hill_climb(self, start):
+        """Phase two, on the rest of the budget: first-improvement hill climbing with random restarts"""
+        full = self.options['max_instructions']
+        current = start
+        current_value = self.evaluate(current, full, "hill climbing")
+        stalls = 0
+        while self.has_budget() and stalls < MAX_STALLS:
+            before = self.evaluations
+            current_value = math.inf if current_value is None else current_value
+            neighbours = self.space.neighbours(current)
+            self.rng.shuffle(neighbours)
+            moved = False
+            for point in neighbours:
+                value = self.evaluate(point, full, "hill climbing", current_value)
+                if value is not None and value < current_value:
+                    current, current_value = point, value
+                    moved = True
+                    break
+                if not self.has_budget():
+                    break
+            if not moved and self.best_point is not None:
+                # Local optimum: restart from a perturbation of the best point so far
+                current = self.space.mutate(self.best_point, self.rng)
+                current_value = self.evaluate(current, full, "restart")
+            stalls = stalls + 1 if self.evaluations == before else 0
+
+    def run(self):
+        survivors = self.successive_halving()
+        if survivors:
+            self.hill_climb(survivors[0])
+        return self.best
+
+
+def run_search(binary_file, budget, seed=0, timing=None, rank_by='cost', sweep_file=None, store=None,
+               max_instructions=None, timeout=None, warmup=None, energy=None, time_budget=None):
+    """Search the sweep's design space with a fixed evaluation budget and save the results"""
+    axes, options = load_sweep_spec(sweep_file) if sweep_file else (dict(DEFAULT_SWEEP), dict(DEFAULT_OPTIONS))
+    if max_instructions is not None:
+        options['max_instructions'] = max_instructions
+    if timeout is not None:
+        options['timeout'] = timeout
+    if warmup is not None:
+        options['warmup'] = warmup
+    search = HeuristicSearch(binary_file, axes, options, budget, seed, rank_by, timing, energy, store,
+                             time_budget=time_budget)
+
+    print(f"\n{'='*80}")
+    print(f"HEURISTIC CACHE SEARCH FOR {binary_file}")
+    print(f"{search.space.points()} points in the space, budget {budget} evaluations, seed {seed}")
+    print(f"{'='*80}")
+    best = search.run()
+    elapsed = time.perf_counter() - search.start
+
+    front = pareto_front(search.results)
+    output_file = f"cache_results_{os.path.basename(binary_file).replace('.bin', '')}.json"
+    try:
+        with open(output_file, 'w') as f:
+            json.dump({
+                'binary_file': binary_file,
+                'mode': 'search',
+                'search': {
+                    'strategy': 'successive halving, then hill climbing with restarts',
+                    'budget': budget,
+                    'seed': seed,
+                    'eta': search.eta,
+                    'rungs': search.rungs,
+                    'rung_instructions': [search.rung_instructions(rung) for rung in range(search.rungs)],
+                    'time_budget': time_budget,
+                    'evaluations': search.evaluations,
+                    'space_points': search.space.points(),
+                    'seconds': elapsed
+                },
+                'sweep': axes,
+                'rank_by': rank_by,
+                'best_configuration': best,
+                'convergence': search.convergence,
+                'history': search.history,
+                'configurations': search.results,
+                'pareto_front': {
+                    'objectives': list(PARETO_OBJECTIVES),
+                    'configurations': [{'config_id': r['config_id'], 'config': r['config'],
+                                        'total_cycles': r['total_cycles'], 'energy': r['energy']['total'],
+                                        'area': r['energy']['area']} for r in front]
+                },
+                'result_store': store.get_stats() if store is not None else None,
+                'cost_formula': COST_FORMULA,
+                'warmup_instructions': options['warmup'],
+                'timing_model': (timing if timing is not None else TimingModel()).to_dict(),
+                'energy_model': (energy if energy is not None else EnergyModel()).to_dict()
+            }, f, indent=2)
+        print(f"\nResults saved to: {output_file}")
+    except Exception as e:
+        print(f"Error saving results: {str(e)}")
+
+    print(f"\n{'='*80}")
+    print("SEARCH SUMMARY:")
+    print(f"{search.evaluations} evaluations in {elapsed:.1f}s, {len(search.results)} complete full-budget runs")
+    if best is not None:
+        print(f"\nBEST CONFIGURATION (by {rank_by}): {best['config']}")
+        print(f"Cost: {best['cost']:.2f}")
+        print(f"Cycles: {best['total_cycles']} (CPI: {best['cpi']:.3f}, AMAT: {best['amat']:.3f})")
+        print(f"Energy: {best['energy']['total']:.1f} pJ (EDP: {best['energy']['edp']:.4g})")
+        print("Convergence: " + ", ".join(f"{step['value']:.2f}@{step['evaluation']}" for step in search.convergence))
+    else:
+        print("No valid configurations found!")
+    print(f"{'='*80}")
+    return 0
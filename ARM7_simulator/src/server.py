@@ -0,0 +1,260 @@
+# server.py - Local simulation job server backed by a pool of warm worker processes
+
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sweep import DEFAULT_SWEEP, DEFAULT_OPTIONS, SWEEP_AXES, resolve_associativity, validate_config, hierarchy_arguments
+from timing import TimingModel
+from result_store import ResultStore, hash_file, result_key
+
+DEFAULT_PORT = 8765
+MAX_FINISHED_JOBS = 10000  # Finished jobs kept for GET /jobs/<id> before the oldest are forgotten
+THROUGHPUT_WINDOW = 60     # Seconds over which the recent job rate is measured
+
+
+def build_config(overrides):
+    """Full configuration dict from the first value of every default sweep axis plus overrides"""
+    config = {name: DEFAULT_SWEEP[name][0] for name in SWEEP_AXES}
+    for name, value in (overrides or {}).items():
+        if name not in SWEEP_AXES:
+            raise ValueError(f"Unknown configuration parameter: {name}. Must be one of {SWEEP_AXES}")
+        config[name] = value
+    if config['levels'] is None:
+        for level in ('l1', 'l2'):
+            config[f'{level}_associativity'] = resolve_associativity(
+                config[f'{level}_associativity'], config[f'{level}_size'], config[f'{level}_block_size'])
+    error = validate_config(config)
+    if error is not None:
+        raise ValueError(error)
+    return config
+
+
+# Worker side: each process imports the simulator once and then serves many jobs
+worker_store = None
+worker_devnull = None
+
+
+def init_worker(store_dir):
+    global worker_store, worker_devnull
+    import main  # Warm the simulator modules before the first job arrives
+    worker_devnull = open(os.devnull, 'w')
+    worker_store = ResultStore(store_dir) if store_dir else None
+
+
+def run_job(job):
+    """Simulate one job in a worker process, returns (result, error message)"""
+    from main import run_configuration
+    path = job.get('binary_path')
+    temp_path = None
+    try:
+        if path is None:
+            with tempfile.NamedTemporaryFile(suffix='.bin', delete=False) as f:
+                f.write(base64.b64decode(job['binary_base64']))
+                temp_path = path = f.name
+        timing = TimingModel.from_dict(job['timing']) if job.get('timing') else None
+        timing_params = (timing if timing is not None else TimingModel()).to_dict()
+        key = None
+        if worker_store is not None:
+            key = result_key(hash_file(path), hierarchy_arguments(job['config']), timing_params, job['max_instructions'])
+            result = worker_store.get(key)
+            if result is not None:
+                return result, None
+        with redirect_stdout(worker_devnull):
+            result = run_configuration(path, job['config'], timing, job['max_instructions'], timeout=job.get('timeout'))
+        if result is None:
+            return None, "simulation failed"
+        if worker_store is not None and result['halt_reason'] != 'timeout':
+            worker_store.put(key, result)
+        return result, None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {str(e)}"
+    finally:
+        if temp_path is not None:
+            os.unlink(temp_path)
+
+
+class JobServer:
+    """Queue of simulation jobs dispatched to a persistent multiprocessing pool"""
+
+    def __init__(self, workers=None, store_dir=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = multiprocessing.Pool(self.workers, initializer=init_worker, initargs=(store_dir,))
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()  # job id -> job record
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.started = time.time()
+        self.finish_times = deque()
+
+    def submit(self, request):
+        """Validate a job request and queue it, returns the job record"""
+        if ('binary_path' in request) == ('binary_base64' in request):
+            raise ValueError("Give exactly one of binary_path or binary_base64")
+        if 'binary_path' in request and not os.path.exists(request['binary_path']):
+            raise ValueError(f"Binary file '{request['binary_path']}' not found")
+        job = {
+            'binary_path': request.get('binary_path'),
+            'binary_base64': request.get('binary_base64'),
+            'config': build_config(request.get('config')),
+            'timing': request.get('timing'),
+            'max_instructions': int(request.get('max_instructions', DEFAULT_OPTIONS['max_instructions'])),
+            'timeout': request.get('timeout'),
+        }
+        if job['timing']:
+            TimingModel.from_dict(job['timing'])  # Reject bad timing parameters before queueing
+        record = {'id': uuid.uuid4().hex, 'status': 'queued', 'submitted': time.time(),
+                  'finished': None, 'result': None, 'error': None, 'done': threading.Event()}
+        with self.lock:
+            self.jobs[record['id']] = record
+            self.pending += 1
+        self.pool.apply_async(run_job, (job,), callback=lambda outcome: self.finish(record, *outcome),
+                              error_callback=lambda e: self.finish(record, None, str(e)))
+        return record
+
+    def finish(self, record, result, error):
+        now = time.time()
+        with self.lock:
+            record.update(status='failed' if error else 'done', result=result, error=error, finished=now)
+            self.pending -= 1
+            if error:
+                self.failed += 1
+            else:
+                self.completed += 1
+            self.finish_times.append(now)
+            # Forget the oldest finished jobs once too many are kept
+            while len(self.jobs) > MAX_FINISHED_JOBS:
+                oldest = next(iter(self.jobs.values()))
+                if oldest['finished'] is None:
+                    break
+                self.jobs.popitem(last=False)
+        record['done'].set()
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def get_stats(self):
+        now = time.time()
+        with self.lock:
+            while self.finish_times and now - self.finish_times[0] > THROUGHPUT_WINDOW:
+                self.finish_times.popleft()
+            uptime = now - self.started
+            return {
+                'workers': self.workers,
+                'queue_depth': max(0, self.pending - self.workers),
+                'pending': self.pending,
+                'completed': self.completed,
+                'failed': self.failed,
+                'uptime': uptime,
+                'throughput': (self.completed + self.failed) / uptime if uptime > 0 else 0,
+                'recent_throughput': len(self.finish_times) / min(uptime, THROUGHPUT_WINDOW) if uptime > 0 else 0
+            }
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+
+def job_view(record):
+    """JSON-serializable view of a job record"""
+    return {key: record[key] for key in ('id', 'status', 'submitted', 'finished', 'result', 'error')}
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """POST /jobs (add ?wait=1 to block until done), GET /jobs/<id>, GET /stats"""
+    job_server = None
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        path, _, query = self.path.partition('?')
+        if path != '/jobs':
+            return self.send_json(404, {'error': 'not found'})
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            record = self.job_server.submit(request)
+        except (ValueError, TypeError, KeyError) as e:
+            return self.send_json(400, {'error': str(e)})
+        if 'wait=1' in query.split('&'):
+            record['done'].wait()
+        self.send_json(202 if record['finished'] is None else 200, job_view(record))
+
+    def do_GET(self):
+        if self.path == '/stats':
+            return self.send_json(200, self.job_server.get_stats())
+        if self.path.startswith('/jobs/'):
+            record = self.job_server.get(self.path[len('/jobs/'):])
+            if record is None:
+                return self.send_json(404, {'error': 'unknown job'})
+            return self.send_json(200, job_view(record))
+        self.send_json(404, {'error': 'not found'})
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def parse_arguments(argv):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Local simulation job server")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port to listen on at 127.0.0.1")
+    parser.add_argument('--socket', metavar='PATH', help="Listen on a Unix socket instead of TCP")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--cache-dir', metavar='DIR', help="Share a persistent result store between workers")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_arguments(sys.argv[1:])
+    # Workers are forked before any server thread exists
+    job_server = JobServer(args.workers, args.cache_dir)
+    JobRequestHandler.job_server = job_server
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        httpd = ThreadingUnixHTTPServer(args.socket, JobRequestHandler)
+        print(f"Serving simulation jobs on unix:{args.socket} with {job_server.workers} workers")
+    else:
+        httpd = ThreadingHTTPServer(('127.0.0.1', args.port), JobRequestHandler)
+        print(f"Serving simulation jobs on http://127.0.0.1:{args.port} with {job_server.workers} workers")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        job_server.close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
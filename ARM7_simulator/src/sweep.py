@@ -0,0 +1,338 @@
+# sweep.py - Design-space sweep specification and branch-and-bound pruning
+
+import itertools
+import json
+from replacement import REPLACEMENT_POLICIES
+from cache import WRITE_POLICIES, INCLUSION_POLICIES
+from prefetch import make_prefetcher
+from memory_hierarchy import validate_topology
+from branch_predictor import make_branch_unit
+from pipeline import make_pipeline
+from mmu import make_mmu
+from dram import make_dram
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+# Order of the axes when expanding the sweep (first axis varies slowest)
+SWEEP_AXES = [
+    'l1_size',
+    'l1_block_size',
+    'l2_size',
+    'l2_block_size',
+    'l2_associativity',
+    'l1_associativity',
+    'write_policy',
+    'l1_replacement',
+    'l2_replacement',
+    'l2_write_policy',
+    'write_allocate',
+    'write_buffer_depth',
+    'l1i_prefetcher',
+    'l1d_prefetcher',
+    'l2_prefetcher',
+    'l2_inclusion',
+    'levels',
+    'branch_predictor',
+    'pipeline',
+    'mmu',
+    'dram',
+]
+
+# Axes that describe the classic split L1 + unified L2 (ignored when 'levels' is given)
+TWO_LEVEL_AXES = SWEEP_AXES[:SWEEP_AXES.index('levels')]
+
+# Reproduces the original 24-point experiment grid
+DEFAULT_SWEEP = {
+    'l1_size': [1024],
+    'l1_block_size': [4, 8, 16, 32],
+    'l2_size': [16384],
+    'l2_block_size': [16, 32, 64],
+    'l2_associativity': [1],
+    'l1_associativity': [1, "full"],
+    'write_policy': ["write_back"],
+    'l1_replacement': ["lru"],
+    'l2_replacement': ["lru"],
+    'l2_write_policy': ["write_back"],
+    'write_allocate': [True],
+    'write_buffer_depth': [0],
+    'l1i_prefetcher': [None],
+    'l1d_prefetcher': [None],
+    'l2_prefetcher': [None],
+    'l2_inclusion': ["non_inclusive"],
+    'levels': [None],
+    'branch_predictor': [None],
+    'pipeline': [None],
+    'mmu': [None],
+    'dram': [None],
+}
+
+DEFAULT_OPTIONS = {
+    'prune': True,
+    'check_interval': 64,
+    'max_instructions': 1000,
+    'timeout': None,  # Wall-clock seconds per run
+    'warmup': 0,      # Instructions excluded from the statistics
+}
+
+
+def load_sweep_spec(filepath):
+    """Load a sweep spec from a JSON or TOML file, returns (axes, options)"""
+    if filepath.endswith('.toml'):
+        if tomllib is None:
+            raise ValueError("TOML sweep specs require Python 3.11 or newer")
+        with open(filepath, 'rb') as f:
+            spec = tomllib.load(f)
+    else:
+        with open(filepath, 'r') as f:
+            spec = json.load(f)
+
+    axes = dict(DEFAULT_SWEEP)
+    options = dict(DEFAULT_OPTIONS)
+    sweep = spec.get('sweep', {})
+    for name, values in sweep.items():
+        if name not in SWEEP_AXES:
+            raise ValueError(f"Unknown sweep parameter: {name}. Must be one of {SWEEP_AXES}")
+        if not isinstance(values, list):
+            values = [values]
+        if not values:
+            raise ValueError(f"Sweep parameter {name} has no values")
+        axes[name] = values
+    for name, value in spec.get('options', {}).items():
+        if name not in DEFAULT_OPTIONS:
+            raise ValueError(f"Unknown sweep option: {name}. Must be one of {sorted(DEFAULT_OPTIONS)}")
+        options[name] = value
+    limit = options['max_instructions']
+    if type(limit) is not int or limit <= 0:
+        raise ValueError(f"Sweep option max_instructions must be a positive integer, got {limit!r}")
+    timeout = options['timeout']
+    if timeout is not None and (type(timeout) not in (int, float) or timeout <= 0):
+        raise ValueError(f"Sweep option timeout must be positive, got {timeout!r}")
+    return axes, options
+
+
+def is_power_of_two(value):
+    return isinstance(value, int) and value > 0 and (value & (value - 1)) == 0
+
+
+def resolve_associativity(value, cache_size, block_size):
+    """Turn an associativity spec ("full" or an int) into a way count"""
+    if value == "full":
+        return cache_size // block_size
+    return value
+
+
+def describe_associativity(ways, cache_size, block_size):
+    if ways == 1:
+        return "Direct-mapped"
+    if ways == cache_size // block_size:
+        return f"Fully-associative({ways})"
+    return f"{ways}-way"
+
+
+def validate_config(config):
+    """Return an error message if the configuration cannot be built, otherwise None"""
+    try:
+        make_branch_unit(config['branch_predictor'])
+    except (ValueError, TypeError) as e:
+        return f"Invalid branch predictor: {str(e)}"
+    try:
+        make_pipeline(config['pipeline'])
+    except TypeError as e:
+        return f"Invalid pipeline: {str(e)}"
+    try:
+        make_mmu(config['mmu'])
+    except (ValueError, TypeError, KeyError) as e:
+        return f"Invalid MMU: {str(e)}"
+    try:
+        dram = make_dram(config['dram'])
+    except (ValueError, TypeError) as e:
+        return f"Invalid DRAM: {str(e)}"
+    if config['levels'] is not None:
+        try:
+            validate_topology(config['levels'])
+        except (ValueError, TypeError, KeyError) as e:
+            return f"Invalid topology: {str(e)}"
+        if dram is not None and config['levels'][-1]['block_size'] > dram.row_size:
+            return f"Last-level block size exceeds the DRAM row size {dram.row_size}B"
+        return None
+    for level in ('l1', 'l2'):
+        size = config[f'{level}_size']
+        block = config[f'{level}_block_size']
+        ways = config[f'{level}_associativity']
+        if not is_power_of_two(size) or not is_power_of_two(block) or block < 4:
+            return f"{level.upper()} size and block size must be powers of two (block >= 4B)"
+        if block > size:
+            return f"{level.upper()} block size {block}B exceeds cache size {size}B"
+        if not is_power_of_two(ways) or ways > size // block:
+            return f"{level.upper()} associativity {ways} is invalid for {size // block} blocks"
+        if config[f'{level}_replacement'] not in REPLACEMENT_POLICIES:
+            return f"Unknown {level.upper()} replacement policy: {config[f'{level}_replacement']}"
+    for key in ('write_policy', 'l2_write_policy'):
+        if config[key] not in WRITE_POLICIES:
+            return f"Unknown write policy: {config[key]}"
+    if config['l2_inclusion'] not in INCLUSION_POLICIES:
+        return f"Unknown L2 inclusion policy: {config['l2_inclusion']}"
+    if config['l2_inclusion'] == "inclusive" and config['l1_block_size'] > config['l2_block_size']:
+        return "An inclusive L2 needs blocks at least as large as the L1's"
+    if config['l2_inclusion'] == "exclusive" and config['l1_block_size'] != config['l2_block_size']:
+        return "An exclusive L2 needs the same block size as the L1"
+    if dram is not None and config['l2_block_size'] > dram.row_size:
+        return f"L2 block size {config['l2_block_size']}B exceeds the DRAM row size {dram.row_size}B"
+    if not isinstance(config['write_buffer_depth'], int) or config['write_buffer_depth'] < 0:
+        return f"Write buffer depth must be a non-negative integer: {config['write_buffer_depth']}"
+    for key in ('l1i_prefetcher', 'l1d_prefetcher', 'l2_prefetcher'):
+        try:
+            make_prefetcher(config[key])
+        except (ValueError, TypeError) as e:
+            return f"Invalid {key}: {str(e)}"
+    return None
+
+
+def normalize_config(config):
+    """Resolve one point of the sweep in place, returns it or None if it cannot be built"""
+    if config['levels'] is not None:
+        # An explicit topology replaces every two-level parameter
+        config.update({name: None for name in TWO_LEVEL_AXES})
+        return config if validate_config(config) is None else None
+    config['l1_associativity'] = resolve_associativity(config['l1_associativity'], config['l1_size'], config['l1_block_size'])
+    config['l2_associativity'] = resolve_associativity(config['l2_associativity'], config['l2_size'], config['l2_block_size'])
+    if validate_config(config) is not None:
+        return None
+    # Replacement policy is irrelevant with a single way, collapse those points
+    for level in ('l1', 'l2'):
+        if config[f'{level}_associativity'] == 1:
+            config[f'{level}_replacement'] = 'lru'
+    return config
+
+
+def config_key(config):
+    """Identity of a normalized configuration, equal for points that simulate the same hierarchy"""
+    return json.dumps([config[name] for name in SWEEP_AXES], sort_keys=True)
+
+
+def expand_sweep(axes):
+    """Expand the sweep axes into a list of configuration dicts, returns (configs, skipped)"""
+    configs = []
+    skipped = 0
+    seen = set()
+    for values in itertools.product(*(axes[name] for name in SWEEP_AXES)):
+        config = normalize_config(dict(zip(SWEEP_AXES, values)))
+        if config is None:
+            skipped += 1
+            continue
+        key = config_key(config)
+        if key in seen:  # e.g. "full" and an explicit way count that coincide, or direct-mapped policies
+            continue
+        seen.add(key)
+        configs.append(config)
+    return configs, skipped
+
+
+def hierarchy_arguments(config):
+    """Keyword arguments for init_memory_hierarchy that build this configuration"""
+    args = {'branch_predictor': config['branch_predictor'], 'pipeline': config['pipeline'], 'mmu': config['mmu'],
+            'dram': config['dram']}
+    if config['levels'] is not None:
+        args['levels'] = config['levels']
+    else:
+        args.update({name: config[name] for name in TWO_LEVEL_AXES})
+    return args
+
+
+def topology_name(levels):
+    """Short name for an explicit N-level topology"""
+    parts = []
+    for number, level in enumerate(levels, start=1):
+        ways = level.get('associativity', 1)
+        if ways == "full":
+            ways = level['size'] // level['block_size']
+        desc = describe_associativity(ways, level['size'], level['block_size'])
+        if ways > 1 and level.get('replacement', 'lru') != 'lru':
+            desc += f"-{level['replacement'].upper()}"
+        kind = "split" if level.get('split', False) else "unified"
+        if level.get('inclusion', "non_inclusive") != "non_inclusive":
+            kind += f"-{level['inclusion']}"
+        parts.append(f"{level.get('name', f'L{number}')}:{level['size']}B/{level['block_size']}B-{desc}-{kind}")
+    return "_".join(parts)
+
+
+def config_name(config):
+    """Short human-readable name for a configuration (replacement shown only when not LRU)"""
+    name = cache_config_name(config)
+    if config['branch_predictor'] is not None:
+        name += f"_BP:{make_branch_unit(config['branch_predictor']).describe()}"
+    pipeline = make_pipeline(config['pipeline'])
+    if pipeline is not None:
+        name += f"_{pipeline.describe()}"
+    mmu = make_mmu(config['mmu'])
+    if mmu is not None:
+        name += f"_MMU:{mmu.describe()}"
+    dram = make_dram(config['dram'])
+    if dram is not None:
+        name += f"_DRAM:{dram.describe()}"
+    return name
+
+
+def cache_config_name(config):
+    """Name of the cache part of a configuration"""
+    if config['levels'] is not None:
+        return topology_name(config['levels'])
+    l1_desc = describe_associativity(config['l1_associativity'], config['l1_size'], config['l1_block_size'])
+    l2_desc = describe_associativity(config['l2_associativity'], config['l2_size'], config['l2_block_size'])
+    if config['l1_associativity'] > 1 and config['l1_replacement'] != 'lru':
+        l1_desc += f"-{config['l1_replacement'].upper()}"
+    if config['l2_associativity'] > 1 and config['l2_replacement'] != 'lru':
+        l2_desc += f"-{config['l2_replacement'].upper()}"
+    name = (f"L1:{config['l1_size']}B/{config['l1_block_size']}B-{l1_desc}"
+            f"_L2:{config['l2_size']}B/{config['l2_block_size']}B-{l2_desc}")
+    # Write handling is shown only when it differs from write-back/write-allocate
+    write_desc = []
+    if config['write_policy'] != 'write_back':
+        write_desc.append("L1WT")
+    if config['l2_write_policy'] != 'write_back':
+        write_desc.append("L2WT")
+    if not config['write_allocate']:
+        write_desc.append("NWA")
+    if config['write_buffer_depth'] > 0:
+        write_desc.append(f"WB{config['write_buffer_depth']}")
+    if write_desc:
+        name += "_" + "-".join(write_desc)
+    if config['l2_inclusion'] != "non_inclusive":
+        name += f"_L2{config['l2_inclusion'].upper()}"
+    prefetch_desc = []
+    for key, label in (('l1i_prefetcher', 'I'), ('l1d_prefetcher', 'D'), ('l2_prefetcher', 'L2')):
+        if config[key] is not None:
+            prefetch_desc.append(f"{label}={make_prefetcher(config[key]).describe()}")
+    if prefetch_desc:
+        name += "_PF:" + ",".join(prefetch_desc)
+    return name
+
+
+class BranchAndBound:
+    """Stops a run once its running metric is already worse than the best completed run.
+
+    Works because every supported metric only grows as the simulation proceeds.
+    """
+
+    def __init__(self, metric):
+        self.metric = metric
+        self.best = None
+        self.triggered = False
+
+    def start_run(self):
+        self.triggered = False
+
+    def exceeded(self, hierarchy):
+        """Check the running metric of the current hierarchy against the incumbent"""
+        if self.best is None:
+            return False
+        if self.metric(hierarchy.get_total_stats()) > self.best:
+            self.triggered = True
+        return self.triggered
+
+    def complete_run(self, value):
+        if self.best is None or value < self.best:
+            self.best = value
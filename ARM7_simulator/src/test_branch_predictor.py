@@ -0,0 +1,60 @@
+# test_branch_predictor.py - Direction predictor accuracy and BTB penalties on synthetic branch streams
+#
+# Feeds loop-shaped outcome sequences straight into a branch unit and checks how many each
+# predictor gets wrong, and which penalty a correctly predicted taken branch pays with and
+# without a BTB.
+# Run with pytest or directly: python test_branch_predictor.py
+
+from branch_predictor import make_branch_unit
+from timing import TimingModel
+
+LOOP_PC = 0x40
+LOOP_TARGET = 0x20
+
+
+def run_loop(spec, trips, iterations):
+    """A backward branch taken trips-1 times then falling through, repeated; returns the branch unit"""
+    unit = make_branch_unit(spec)
+    unit.set_timing(TimingModel(branch_penalty=3, btb_miss_penalty=1))
+    for _ in range(iterations):
+        for trip in range(trips):
+            unit.observe_branch(LOOP_PC, True, trip < trips - 1, LOOP_TARGET)
+    return unit
+
+
+def test_static_btfn_misses_only_loop_exits():
+    unit = run_loop({'type': "static", 'mode': "btfn"}, trips=8, iterations=10)
+    assert unit.branches == 80
+    assert unit.mispredictions == 10
+
+
+def test_bimodal_learns_loop_branch():
+    unit = run_loop("bimodal", trips=8, iterations=10)
+    # One miss warming the counter from weakly not-taken, then only the exits
+    assert unit.mispredictions == 11
+    assert unit.get_stats(1000)['accuracy'] == (80 - 11) / 80
+
+
+def test_gshare_learns_exit_from_history():
+    # Once the history covers a whole trip count, even the exit is predictable
+    unit = run_loop({'type': "gshare", 'history_bits': 8}, trips=4, iterations=50)
+    late = run_loop({'type': "gshare", 'history_bits': 8}, trips=4, iterations=100)
+    assert late.mispredictions == unit.mispredictions
+
+
+def test_btb_miss_charged_only_with_btb():
+    with_btb = run_loop({'type': "static", 'mode': "taken"}, trips=2, iterations=1)
+    assert with_btb.btb_misses == 1
+    assert with_btb.penalty_cycles == 1 + 3  # First taken misses the BTB, the exit is mispredicted
+
+    without_btb = run_loop({'type': "static", 'mode': "taken", 'btb_entries': 0}, trips=2, iterations=1)
+    assert without_btb.btb_misses == 0
+    assert without_btb.penalty_cycles == 3
+
+
+if __name__ == "__main__":
+    test_static_btfn_misses_only_loop_exits()
+    test_bimodal_learns_loop_branch()
+    test_gshare_learns_exit_from_history()
+    test_btb_miss_charged_only_with_btb()
+    print("ok")
@@ -0,0 +1,109 @@
+# test_cache_consistency.py - Randomized read-after-write check of the cache hierarchy
+#
+# Runs random load/store streams through small hierarchies under every combination of block
+# sizes, write policy, write allocation, write buffer, inclusion and prefetcher, and checks that
+# every load returns the last value stored and that no set ever holds a block twice.
+# Run with pytest or directly: python test_cache_consistency.py
+
+import contextlib
+import io
+import itertools
+import random
+
+from memory import init_memory
+from memory_hierarchy import MemoryHierarchy
+
+BASE = 0x400
+WORDS = 256  # Data region of 1KB, four times the L2 used below
+STORE_FRACTION = 0.4
+ACCESSES = 1000
+STREAMS = [(0x100, 4), (0x104, 8), (0x108, -4), (0x10C, 4)]  # Load/store sites (pc, stride in bytes)
+
+PREFETCHERS = [None, "next_line", "stride", "stream", {'type': "next_line", 'degree': 2, 'distance': 2}]
+COMBINATIONS = list(itertools.product(
+    ((16, 16), (32, 32), (16, 32)),    # L1 and L2 block sizes
+    ("write_back", "write_through"),  # L1 write policy
+    (True, False),                     # write allocate
+    (0, 2),                            # L1D write buffer depth
+    ("non_inclusive", "inclusive", "exclusive"),
+    PREFETCHERS,                       # L1D prefetcher
+    PREFETCHERS,                       # L2 prefetcher
+))
+
+
+def build(block_sizes, write_policy, write_allocate, depth, inclusion, l1_prefetcher, l2_prefetcher, seed):
+    init_memory()
+    with contextlib.redirect_stdout(io.StringIO()):
+        return MemoryHierarchy(l1_block_size=block_sizes[0], l2_block_size=block_sizes[1], l1_associativity=2, l1_size=128,
+                               l2_size=512, l2_associativity=2, write_policy=write_policy,
+                               write_allocate=write_allocate, write_buffer_depth=depth,
+                               write_buffer_drain_interval=3, l1d_prefetcher=l1_prefetcher,
+                               l2_prefetcher=l2_prefetcher, l2_inclusion=inclusion,
+                               l1_replacement="random", l2_replacement="random", replacement_seed=seed)
+
+
+def duplicated_blocks(hierarchy):
+    """Names of the caches with a set holding the same tag in two valid ways"""
+    duplicated = []
+    for name, cache in hierarchy.caches.items():
+        for set_blocks in cache.blocks:
+            tags = [block.tag for block in set_blocks if block.valid]
+            if len(tags) != len(set(tags)):
+                duplicated.append(name)
+                break
+    return duplicated
+
+
+def run_stream(combination, seed):
+    """Replay one random stream, returns a description of the first inconsistency or None"""
+    rng = random.Random(seed)
+    hierarchy = build(*combination, seed)
+    expected = {}
+    cursors = [rng.randrange(WORDS) for _ in STREAMS]
+    for step in range(ACCESSES):
+        # Strided streams that sometimes jump, so prefetchers train, run ahead and get blocks evicted
+        stream = rng.randrange(len(STREAMS))
+        pc, stride = STREAMS[stream]
+        if rng.random() < 0.05:
+            cursors[stream] = rng.randrange(WORDS)
+        word = cursors[stream]
+        cursors[stream] = (word + stride // 4) % WORDS
+        address = BASE + 4 * word
+        if rng.random() < STORE_FRACTION:
+            value = rng.getrandbits(32)
+            hierarchy.write_data(address, value, pc)
+            expected[address] = value
+        else:
+            value = hierarchy.read_data(address, pc)
+            if value != expected.get(address, 0):
+                return f"step {step}: read 0x{value:08X} from 0x{address:X}, expected 0x{expected.get(address, 0):08X}"
+        duplicated = duplicated_blocks(hierarchy)
+        if duplicated:
+            return f"step {step}: duplicate tags in {duplicated}"
+    return None
+
+
+def check_all(seeds=(0, 1)):
+    """Returns a list of (combination, seed, problem) for every failing stream"""
+    failures = []
+    for combination in COMBINATIONS:
+        block_sizes, write_policy, write_allocate, depth, inclusion, l1_prefetcher, l2_prefetcher = combination
+        if inclusion == "exclusive" and block_sizes[0] != block_sizes[1]:
+            continue  # Not a valid hierarchy
+        for seed in seeds:
+            problem = run_stream(combination, seed)
+            if problem is not None:
+                failures.append((combination, seed, problem))
+    return failures
+
+
+def test_read_after_write():
+    failures = check_all()
+    assert not failures, "\n".join(f"{combination} seed {seed}: {problem}" for combination, seed, problem in failures[:10])
+
+
+if __name__ == "__main__":
+    failures = check_all()
+    for combination, seed, problem in failures:
+        print(f"FAIL {combination} seed {seed}: {problem}")
+    print(f"{len(failures)} failing streams")
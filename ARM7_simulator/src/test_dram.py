@@ -0,0 +1,56 @@
+# test_dram.py - Row-buffer outcomes and latencies of the DRAM model
+#
+# Sends addresses chosen to hit, miss and conflict in the row buffers straight to the DRAM model,
+# then checks that last-level refills through a hierarchy pay the row-buffer latency.
+# Run with pytest or directly: python test_dram.py
+
+import contextlib
+import io
+
+from dram import DRAM
+from memory import init_memory
+from memory_hierarchy import MemoryHierarchy
+from timing import TimingModel
+
+TIMINGS = {'t_rcd': 2, 't_cas': 3, 't_rp': 5, 'clock_ratio': 2}
+
+
+def test_open_page_outcomes():
+    # 256B rows over 2 banks: bank = bit 8, row = bits 9 and up
+    dram = DRAM(banks=2, row_size=256, **TIMINGS)
+    assert dram.access(0x000) == (2 + 3) * 2       # Idle bank
+    assert dram.access(0x040) == 3 * 2             # Same row still open
+    assert dram.access(0x100) == (2 + 3) * 2       # Other bank, idle
+    assert dram.access(0x200) == (5 + 2 + 3) * 2   # Bank 0, another row
+    assert dram.access(0x104, write=True) == 3 * 2  # Bank 1 kept its row
+    stats = dram.get_stats()
+    assert (stats['row_hits'], stats['row_empty'], stats['row_conflicts']) == (2, 2, 1)
+    assert stats['bank_accesses'] == [3, 2]
+    assert stats['writes'] == 1
+
+
+def test_closed_page_never_hits():
+    dram = DRAM(banks=2, row_size=256, page_policy="closed", **TIMINGS)
+    latencies = [dram.access(address) for address in (0x000, 0x040, 0x200)]
+    assert latencies == [(2 + 3) * 2] * 3
+    assert dram.get_stats()['row_hits'] == 0
+
+
+def test_last_level_refills_pay_row_latency():
+    init_memory()
+    timing = TimingModel(hit_latencies=(1, 10), cycles_per_word=1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        hierarchy = MemoryHierarchy(l1_block_size=16, l2_block_size=32, timing=timing, dram=TIMINGS)
+    l2 = hierarchy.caches['L2']
+    hierarchy.read_data(0x400)
+    assert l2.cycles == 10 + (2 + 3) * 2 + 8
+    hierarchy.read_data(0x420)  # Next L2 block, same DRAM row
+    assert l2.cycles == 28 + 10 + 3 * 2 + 8
+    assert hierarchy.get_total_stats()['dram']['row_hits'] == 1
+
+
+if __name__ == "__main__":
+    test_open_page_outcomes()
+    test_closed_page_never_hits()
+    test_last_level_refills_pay_row_latency()
+    print("ok")
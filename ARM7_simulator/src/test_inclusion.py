@@ -0,0 +1,68 @@
+# test_inclusion.py - Back-invalidation and exclusion between the L1 and the L2
+#
+# Evicts an L2 block that a dirty L1 line still holds and checks what each inclusion policy does
+# with the L1 copy and its data, then checks that an exclusive L2 never duplicates the L1.
+# Run with pytest or directly: python test_inclusion.py
+
+import contextlib
+import io
+
+from memory import init_memory, read_word
+from memory_hierarchy import MemoryHierarchy
+
+BASE = 0x400
+L2_SIZE = 512  # Direct-mapped, so BASE + L2_SIZE evicts BASE from the L2 but not from the 1KB L1
+
+
+def build(inclusion, l2_block_size=32):
+    init_memory()
+    with contextlib.redirect_stdout(io.StringIO()):
+        return MemoryHierarchy(l1_block_size=16, l2_block_size=l2_block_size, l1_size=1024, l2_size=L2_SIZE,
+                               l2_inclusion=inclusion)
+
+
+def evict_from_l2(hierarchy):
+    hierarchy.write_data(BASE, 7)
+    hierarchy.read_data(BASE + L2_SIZE)
+    return hierarchy.data_cache, hierarchy.caches['L2']
+
+
+def test_inclusive_back_invalidates_dirty_line():
+    hierarchy = build("inclusive")
+    l1, l2 = evict_from_l2(hierarchy)
+    assert l2.back_invalidations == 1
+    assert not l1.holds(BASE)
+    # The dirty L1 word was folded into the evicted L2 block and written back with it
+    assert read_word(BASE) == 7
+    misses = l1.misses
+    assert hierarchy.read_data(BASE) == 7
+    assert l1.misses == misses + 1
+
+
+def test_non_inclusive_keeps_l1_copy():
+    hierarchy = build("non_inclusive")
+    l1, l2 = evict_from_l2(hierarchy)
+    assert l2.back_invalidations == 0
+    assert l1.holds(BASE)
+    hits = l1.hits
+    assert hierarchy.read_data(BASE) == 7
+    assert l1.hits == hits + 1
+
+
+def test_exclusive_never_duplicates():
+    hierarchy = build("exclusive", l2_block_size=16)
+    l1, l2 = hierarchy.data_cache, hierarchy.caches['L2']
+    for offset in range(0, 2048, 16):
+        hierarchy.read_data(BASE + offset)
+        hierarchy.write_data(BASE + offset + 4, offset)
+    assert l2.duplicated_bytes() == 0
+    assert l2.victim_fills > 0
+    for offset in range(0, 2048, 16):
+        assert hierarchy.read_data(BASE + offset + 4) == offset
+
+
+if __name__ == "__main__":
+    test_inclusive_back_invalidates_dirty_line()
+    test_non_inclusive_keeps_l1_copy()
+    test_exclusive_never_duplicates()
+    print("ok")
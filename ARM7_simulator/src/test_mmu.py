@@ -0,0 +1,71 @@
+# test_mmu.py - Address translation, TLB reuse and faults of the MMU
+#
+# Maps a small page, a large page and a section onto the same physical memory and checks that
+# data accesses through each alias meet, how many descriptor reads each walk makes, and that
+# unmapped addresses fault at the right level.
+# Run with pytest or directly: python test_mmu.py
+
+import contextlib
+import io
+
+import pytest
+
+from memory import init_memory
+from memory_hierarchy import MemoryHierarchy
+from mmu import TranslationFault
+
+SMALL = 0x10000
+LARGE = 0x20000
+SECTION = 0x100000
+MAPPINGS = [
+    {'va': SMALL, 'pa': 0, 'size': "small"},
+    {'va': LARGE, 'pa': 0, 'size': "large"},
+    {'va': SECTION, 'pa': 0, 'size': "section"},
+]
+
+
+def build():
+    init_memory()
+    with contextlib.redirect_stdout(io.StringIO()):
+        return MemoryHierarchy(mmu={'mappings': MAPPINGS, 'dtlb_entries': 4})
+
+
+def test_aliases_reach_same_physical_word():
+    hierarchy = build()
+    hierarchy.write_data(SMALL + 0x40, 9)
+    assert hierarchy.read_data(LARGE + 0x40) == 9
+    assert hierarchy.read_data(SECTION + 0x40) == 9
+    assert hierarchy.peek(SECTION + 0x40) == 9
+    mmu = hierarchy.mmu
+    # Pages take a first- and a second-level descriptor read, the section only one
+    assert mmu.walks == 3
+    assert mmu.walk_reads == 2 + 2 + 1
+    assert mmu.walk_cycles > 0
+
+
+def test_tlb_hit_skips_walk():
+    hierarchy = build()
+    hierarchy.read_data(SMALL)
+    hierarchy.read_data(SMALL + 0xFFC)  # Same 4KB page
+    assert hierarchy.mmu.walks == 1
+    assert hierarchy.mmu.dtlb.hits == 1
+
+
+def test_unmapped_addresses_fault():
+    hierarchy = build()
+    with pytest.raises(TranslationFault) as fault:
+        hierarchy.read_data(SMALL + 0x1000)  # Second-level table exists, entry does not
+    assert fault.value.level == 2
+    with pytest.raises(TranslationFault) as fault:
+        hierarchy.write_data(0x300000, 1)    # No first-level descriptor
+    assert fault.value.level == 1
+    assert fault.value.kind == 'd'
+    assert hierarchy.mmu.faults == 2
+    assert hierarchy.mmu.dtlb.get_stats()['hits'] == 0
+
+
+if __name__ == "__main__":
+    test_aliases_reach_same_physical_word()
+    test_tlb_hit_skips_walk()
+    test_unmapped_addresses_fault()
+    print("ok")
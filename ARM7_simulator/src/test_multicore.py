@@ -0,0 +1,99 @@
+# test_multicore.py - Two cores handing a value over through a flag in shared memory
+#
+# Core 0 spins on a flag until core 1 sets it, then both must have run to the end of their
+# programs, with the hand-off visible as coherence traffic on the bus. The MESI state of a
+# shared block is also followed through each transition with direct cache accesses.
+# Run with pytest or directly: python test_multicore.py
+
+import contextlib
+import io
+
+from coherence import EXCLUSIVE, INVALID, MODIFIED, SHARED
+from memory import init_memory, write_word
+from multicore import MultiCoreSystem
+from registers import init_registers
+
+FLAG = 0xF0
+CONSUMER = [
+    0xE3A000F0,  # MOV R0, #0xF0
+    0xE5901000,  # loop: LDR R1, [R0]
+    0xE1510003,  # CMP R1, R3 (R3 stays 0)
+    0x0AFFFFFC,  # BEQ loop
+    0xE3A0202A,  # MOV R2, #42
+]
+PRODUCER = [
+    0xE3A000F0,  # MOV R0, #0xF0
+    0xE3A01001,  # MOV R1, #1
+    0xE5801000,  # STR R1, [R0]
+]
+PRODUCER_BASE = 0x800
+
+
+def load(words, base):
+    for i, word in enumerate(words):
+        write_word(base + 4 * i, word)
+    return base, base + 4 * len(words)
+
+
+def run_system(consumer, producer, quantum=20, max_instructions=500):
+    init_memory()
+    init_registers()
+    with contextlib.redirect_stdout(io.StringIO()):
+        system = MultiCoreSystem(2)
+        system.add_core(*load(consumer, 0))
+        system.add_core(*load(producer, PRODUCER_BASE))
+        system.run(quantum, max_instructions)
+    return system
+
+
+def test_spin_wait_sees_flag_set_by_other_core():
+    system = run_system(CONSUMER, PRODUCER)
+    consumer, producer = system.cores
+    assert consumer.halt_reason == "end_of_program"
+    assert producer.halt_reason == "end_of_program"
+    assert consumer.registers[1] == 1
+    assert consumer.registers[2] == 42
+    stats = system.get_stats()
+    assert stats['bus']['interventions'] >= 1  # The consumer's read pulled the modified flag from core 1
+    assert stats['cores'][0]['coherence']['invalidations_received'] >= 1
+
+
+def test_mesi_transitions():
+    init_memory()
+    with contextlib.redirect_stdout(io.StringIO()):
+        system = MultiCoreSystem(2)
+        first = system.add_core(0, 0).view.data_cache
+        second = system.add_core(0, 0).view.data_cache
+
+    def states():
+        return [cache.lookup(FLAG).state if cache.lookup(FLAG) is not None else INVALID
+                for cache in (first, second)]
+
+    first.read(FLAG)
+    assert states() == [EXCLUSIVE, INVALID]
+    first.write(FLAG, 5)                       # Silent E -> M, no bus transaction
+    assert states() == [MODIFIED, INVALID]
+    assert system.bus.get_stats()['transactions'] == 1
+    assert second.read(FLAG) == 5              # Modified copy flushed by the snoop
+    assert states() == [SHARED, SHARED]
+    assert system.bus.interventions == 1
+    second.write(FLAG, 6)                      # Upgrade invalidates the other copy
+    assert states() == [INVALID, MODIFIED]
+    assert system.bus.upgrades == 1
+    assert first.read(FLAG) == 6
+    assert states() == [SHARED, SHARED]
+    assert first.coherence_misses == 1
+
+
+def test_cores_spinning_forever_halt_as_idle():
+    # Nobody sets the flag: both cores spin on it and the run stops long before the budget
+    system = run_system(CONSUMER, CONSUMER[:4], max_instructions=100000)
+    assert [core.halt_reason for core in system.cores] == ["idle_loop", "idle_loop"]
+    assert all(core.instruction_count < 1000 for core in system.cores)
+
+
+if __name__ == "__main__":
+    test_spin_wait_sees_flag_set_by_other_core()
+    test_mesi_transitions()
+    test_cores_spinning_forever_halt_as_idle()
+    print("ok")
@@ -0,0 +1,58 @@
+# test_pipeline.py - Hazard and stall accounting of the five-stage pipeline
+#
+# Issues short hand-encoded instruction sequences and checks the stall cycles of each kind and
+# the total cycle count, with and without forwarding.
+# Run with pytest or directly: python test_pipeline.py
+
+from decoder import decode_instruction
+from pipeline import Pipeline
+
+LDR_R1 = 0xE5901000   # LDR R1, [R0]
+MOV_R1 = 0xE3A01001   # MOV R1, #1
+MOV_R2 = 0xE3A02002   # MOV R2, #2
+ADD_R2 = 0xE0812001   # ADD R2, R1, R1
+
+
+def issue_all(pipeline, words, **stalls):
+    for word in words:
+        pipeline.issue(word, decode_instruction(word), True, **stalls)
+    return pipeline.get_stats()
+
+
+def test_independent_instructions_overlap():
+    stats = issue_all(Pipeline(), [MOV_R1, MOV_R2] * 3)
+    assert stats['stall_cycles'] == 0
+    assert stats['total_cycles'] == 6 + 4  # One ID per cycle, then the last drains EX/MEM/WB
+
+
+def test_load_use_stall():
+    stats = issue_all(Pipeline(), [LDR_R1, ADD_R2])
+    assert stats['stalls']['load_use'] == 1
+    assert stats['stalls']['raw'] == 0
+    assert stats['total_cycles'] == 2 + 1 + 4
+
+
+def test_forwarding_hides_alu_dependence():
+    assert issue_all(Pipeline(), [MOV_R1, ADD_R2])['stall_cycles'] == 0
+    stats = issue_all(Pipeline(forwarding=False), [MOV_R1, ADD_R2])
+    # The consumer waits in ID for the producer's WB
+    assert stats['stalls']['raw'] == 2
+    assert stats['total_cycles'] == 2 + 2 + 4
+
+
+def test_memory_stall_and_branch_flush_delay_next_instruction():
+    pipeline = Pipeline()
+    pipeline.issue(LDR_R1, decode_instruction(LDR_R1), True, memory_stall=3)
+    pipeline.issue(MOV_R2, decode_instruction(MOV_R2), True, flush=2)
+    stats = issue_all(pipeline, [MOV_R1])
+    assert stats['stalls']['memory'] == 3
+    assert stats['stalls']['branch'] == 2
+    assert stats['total_cycles'] == 3 + 3 + 2 + 4
+
+
+if __name__ == "__main__":
+    test_independent_instructions_overlap()
+    test_load_use_stall()
+    test_forwarding_hides_alu_dependence()
+    test_memory_stall_and_branch_flush_delay_next_instruction()
+    print("ok")
@@ -0,0 +1,64 @@
+# test_timing.py - Cycle accounting of the latency model on hand-counted access sequences
+#
+# Runs a few data accesses through the default split L1 + unified L2 and checks the cycles
+# charged at each level, and the CPI and AMAT derived from them, against the timing parameters.
+# Run with pytest or directly: python test_timing.py
+
+import contextlib
+import io
+
+from memory import init_memory
+from memory_hierarchy import MemoryHierarchy
+from timing import TimingModel
+
+BASE = 0x400
+
+
+def build(**config):
+    init_memory()
+    timing = TimingModel(hit_latencies=(1, 10), memory_latency=100, cycles_per_word=1, writeback_latency=2)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return MemoryHierarchy(l1_block_size=16, l2_block_size=32, timing=timing, **config)
+
+
+def test_cold_miss_then_hits():
+    hierarchy = build()
+    hierarchy.read_data(BASE)
+    l1, l2 = hierarchy.data_cache, hierarchy.caches['L2']
+    assert l1.cycles == 1 + 4          # Lookup, then 4 words over the bus from the L2
+    assert l2.cycles == 10 + 100 + 8   # Lookup, then a 32B block from memory
+
+    hierarchy.read_data(BASE + 4)      # Same L1 block
+    assert l1.cycles == 5 + 1
+    hierarchy.read_data(BASE + 16)     # Other half of the L2 block
+    assert l1.cycles == 6 + 1 + 4
+    assert l2.cycles == 118 + 10
+
+    for _ in range(3):
+        hierarchy.charge_instruction()
+    stats = hierarchy.get_total_stats()
+    memory_cycles = 11 + 128
+    assert stats['memory_cycles'] == memory_cycles
+    assert stats['amat'] == memory_cycles / 3
+    # L1 hit time overlaps with execution, the rest stalls the core
+    assert stats['stall_cycles'] == memory_cycles - 3
+    assert stats['total_cycles'] == 3 + memory_cycles - 3
+    assert stats['cpi'] == stats['total_cycles'] / 3
+
+
+def test_dirty_eviction_pays_writeback():
+    # Direct-mapped 1KB L1: BASE and BASE + 1KB share a set
+    hierarchy = build(l1_size=1024)
+    hierarchy.write_data(BASE, 7)
+    l1 = hierarchy.data_cache
+    before = l1.cycles
+    hierarchy.read_data(BASE + 1024)
+    # Lookup + refill + writing the dirty 16B block back to the L2
+    assert l1.cycles - before == 1 + 4 + (2 + 4)
+    assert hierarchy.get_total_stats()['total_writebacks'] == 1
+
+
+if __name__ == "__main__":
+    test_cold_miss_then_hits()
+    test_dirty_eviction_pays_writeback()
+    print("ok")
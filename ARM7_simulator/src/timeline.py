@@ -0,0 +1,191 @@
+# timeline.py - Chrome/Perfetto trace-event export of a simulation timeline
+
+import json
+
+CLOCKS = ("instructions", "cycles")
+DEFAULT_INTERVAL = 1000            # Instructions per interval span and counter sample
+DEFAULT_EVENTS_PER_INTERVAL = 256  # Basic-block spans and instant events allowed in one interval
+
+PID = 1
+CORE_TID = 1       # Basic-block spans
+INTERVAL_TID = 2   # Interval and warm-up spans
+CACHE_TID = 10     # Misses and writebacks of cache i go to CACHE_TID + i
+
+
+class TimelineExporter:
+    """Streams a run as Chrome trace-event JSON, readable by Perfetto and chrome://tracing.
+
+    The core thread shows one span per executed basic block, the interval thread
+    one span per `interval` instructions (and the warm-up period), each cache
+    thread instant events for its misses and writebacks, and every cache gets a
+    counter track with its hit rate over the last interval. Timestamps are
+    instruction counts or modeled cycles (the sequential estimate of the interval
+    statistics), shown as microseconds. Events are written as they happen; at most
+    `events_per_interval` block spans and instant events are kept per interval and
+    the rest are only counted, so long runs stay small enough to open.
+    """
+
+    def __init__(self, hierarchy, output, clock="instructions", interval=DEFAULT_INTERVAL,
+                 events_per_interval=DEFAULT_EVENTS_PER_INTERVAL):
+        if clock not in CLOCKS:
+            raise ValueError(f"Unknown timeline clock: {clock}. Must be one of {CLOCKS}")
+        if interval <= 0:
+            raise ValueError(f"Timeline interval must be positive: {interval}")
+        if events_per_interval < 0:
+            raise ValueError(f"Timeline event limit must not be negative: {events_per_interval}")
+        self.hierarchy = hierarchy
+        self.clock = clock
+        self.interval = interval
+        self.events_per_interval = events_per_interval
+        self.caches = list(hierarchy.caches.items())
+        self.l1_names = set(hierarchy.levels[0])
+
+        self.base = 0  # Added to the cycle estimate, which restarts from zero after the warm-up
+        self.block_pc = None
+        self.block_start = 0
+        self.last_pc = 0  # Last instruction stepped, where the open block ends
+        self.block_instructions = 0
+        self.interval_start = 0
+        self.interval_ts = 0
+        self.interval_number = 0
+        self.warmup_ts = None
+        self.budget = events_per_interval
+        self.dropped = 0
+        self.interval_dropped = 0
+        self.written = 0
+        self.previous = self.counters()
+        self.interval_counters = self.previous
+
+        self.file = open(output, 'w')
+        self.file.write('{"traceEvents": [\n')
+        self.first = True
+        self.metadata()
+
+    def now(self, instruction_count):
+        if self.clock == "instructions":
+            return instruction_count
+        hierarchy = self.hierarchy
+        hierarchy.settle_fetches()
+        l1_accesses = sum(cache.access_count for name, cache in self.caches if name in self.l1_names)
+        return self.base + hierarchy.core_cycles + hierarchy.foreground_cycles() - \
+            l1_accesses * hierarchy.timing.hit_latency(1)
+
+    def counters(self):
+        self.hierarchy.settle_fetches()
+        return [(cache.hits, cache.misses, cache.writebacks) for _, cache in self.caches]
+
+    def emit(self, event):
+        self.file.write(('' if self.first else ',\n') + json.dumps(event, separators=(',', ':')))
+        self.first = False
+        self.written += 1
+
+    def emit_limited(self, event):
+        """Emit a block span or instant event if this interval still has room for it"""
+        if self.budget > 0:
+            self.budget -= 1
+            self.emit(event)
+        else:
+            self.dropped += 1
+            self.interval_dropped += 1
+
+    def metadata(self):
+        self.emit({'ph': 'M', 'pid': PID, 'name': 'process_name', 'args': {'name': 'ARM7 simulator'}})
+        self.emit({'ph': 'M', 'pid': PID, 'tid': CORE_TID, 'name': 'thread_name', 'args': {'name': 'core'}})
+        self.emit({'ph': 'M', 'pid': PID, 'tid': INTERVAL_TID, 'name': 'thread_name', 'args': {'name': 'intervals'}})
+        for i, (name, _) in enumerate(self.caches):
+            self.emit({'ph': 'M', 'pid': PID, 'tid': CACHE_TID + i, 'name': 'thread_name', 'args': {'name': name}})
+
+    def step(self, pc, next_pc, instruction_count):
+        """Account for the instruction at pc, after which the core continues at next_pc"""
+        ts = self.now(instruction_count)
+        if self.block_pc is None:
+            self.block_pc = pc
+        self.block_instructions += 1
+        self.last_pc = pc
+        self.cache_events(ts, pc)
+        if next_pc != pc + 4:
+            self.end_block(pc, ts)
+        if instruction_count - self.interval_start >= self.interval:
+            self.end_interval(instruction_count, ts)
+
+    def cache_events(self, ts, pc):
+        """Instant events for the misses and writebacks since the previous instruction"""
+        counters = self.counters()
+        for i, ((name, _), now, before) in enumerate(zip(self.caches, counters, self.previous)):
+            misses = now[1] - before[1]
+            writebacks = now[2] - before[2]
+            if misses > 0:
+                self.emit_limited({'ph': 'i', 's': 't', 'pid': PID, 'tid': CACHE_TID + i, 'ts': ts,
+                                   'name': f"{name} miss", 'args': {'pc': f"0x{pc:08X}", 'count': misses}})
+            if writebacks > 0:
+                self.emit_limited({'ph': 'i', 's': 't', 'pid': PID, 'tid': CACHE_TID + i, 'ts': ts,
+                                   'name': f"{name} writeback", 'args': {'pc': f"0x{pc:08X}", 'count': writebacks}})
+        self.previous = counters
+
+    def end_block(self, pc, ts):
+        if self.block_pc is None:
+            return
+        self.emit_limited({'ph': 'X', 'pid': PID, 'tid': CORE_TID, 'ts': self.block_start,
+                           'dur': max(0, ts - self.block_start), 'name': f"BB 0x{self.block_pc:08X}",
+                           'args': {'start': f"0x{self.block_pc:08X}", 'end': f"0x{pc:08X}",
+                                    'instructions': self.block_instructions}})
+        self.block_pc = None
+        self.block_start = ts
+        self.block_instructions = 0
+
+    def end_interval(self, instruction_count, ts):
+        """Close the interval span and sample every cache's hit rate over it"""
+        if instruction_count <= self.interval_start:
+            return
+        counters = self.counters()
+        args = {'start': self.interval_start, 'end': instruction_count}
+        for (name, _), now, before in zip(self.caches, counters, self.interval_counters):
+            hits, misses = now[0] - before[0], now[1] - before[1]
+            args[f"{name}_misses"] = misses
+            self.emit({'ph': 'C', 'pid': PID, 'ts': ts, 'name': f"{name} hit rate",
+                       'args': {'hit_rate': hits / (hits + misses) if hits + misses > 0 else 0}})
+        if self.interval_dropped:
+            args['events_dropped'] = self.interval_dropped
+        self.emit({'ph': 'X', 'pid': PID, 'tid': INTERVAL_TID, 'ts': self.interval_ts,
+                   'dur': max(0, ts - self.interval_ts), 'name': f"interval {self.interval_number}",
+                   'args': args})
+        self.interval_number += 1
+        self.interval_start = instruction_count
+        self.interval_ts = ts
+        self.interval_counters = counters
+        self.budget = self.events_per_interval
+        self.interval_dropped = 0
+
+    def begin_warmup(self):
+        self.warmup_ts = self.now(0)
+
+    def end_warmup(self, instruction_count):
+        """Close the warm-up span before the hierarchy's counters are reset"""
+        ts = self.now(instruction_count)
+        self.cache_events(ts, self.block_pc or 0)
+        self.emit({'ph': 'X', 'pid': PID, 'tid': INTERVAL_TID, 'ts': self.warmup_ts or 0,
+                   'dur': max(0, ts - (self.warmup_ts or 0)), 'name': "warm-up",
+                   'args': {'instructions': instruction_count}})
+        self.base = ts
+
+    def counters_reset(self):
+        """The hierarchy's counters were reset: keep timestamps and deltas continuous"""
+        self.previous = self.counters()
+        self.interval_counters = self.previous
+
+    def finish(self, instruction_count, halt_reason):
+        """Close the open block and interval, mark the halt and complete the JSON"""
+        ts = self.now(instruction_count)
+        self.cache_events(ts, self.last_pc)
+        self.end_block(self.last_pc, ts)
+        self.end_interval(instruction_count, ts)
+        self.emit({'ph': 'i', 's': 'g', 'pid': PID, 'tid': CORE_TID, 'ts': ts, 'name': f"halt: {halt_reason}",
+                   'args': {'instructions': instruction_count}})
+        self.file.write('\n], "displayTimeUnit": "ms", "otherData": ' + json.dumps({
+            'clock': self.clock,
+            'interval': self.interval,
+            'events_per_interval': self.events_per_interval,
+            'events_written': self.written,
+            'events_dropped': self.dropped
+        }) + '}\n')
+        self.file.close()
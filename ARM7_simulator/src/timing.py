@@ -0,0 +1,70 @@
+# timing.py - Cycle-level latency model for the cache hierarchy
+
+import json
+
+
+class TimingModel:
+    """Latency parameters used to charge cycles for cache and memory accesses"""
+
+    def __init__(self, hit_latencies=(1, 10), memory_latency=100, cycles_per_word=1,
+                 writeback_latency=2, execute_cycles=1, branch_penalty=2, btb_miss_penalty=1):
+        if not hit_latencies:
+            raise ValueError("At least one hit latency is required")
+        if any(latency < 0 for latency in hit_latencies):
+            raise ValueError(f"Hit latencies must be non-negative: {hit_latencies}")
+        if min(memory_latency, cycles_per_word, writeback_latency, execute_cycles, branch_penalty, btb_miss_penalty) < 0:
+            raise ValueError("Timing parameters must be non-negative")
+
+        self.hit_latencies = tuple(hit_latencies)  # Indexed by cache level (L1 first)
+        self.memory_latency = memory_latency        # Main memory access time per block
+        self.cycles_per_word = cycles_per_word      # Bus transfer time for each word of a block
+        self.writeback_latency = writeback_latency  # Fixed overhead of evicting a dirty block
+        self.execute_cycles = execute_cycles        # Base cycles charged per instruction
+        self.branch_penalty = branch_penalty        # Pipeline refill after a mispredicted branch
+        self.btb_miss_penalty = btb_miss_penalty    # Fetch bubble for a taken branch missing in the BTB
+
+    @classmethod
+    def from_dict(cls, params):
+        """Build a timing model from a dict of constructor arguments"""
+        params = dict(params)
+        if 'hit_latencies' in params:
+            params['hit_latencies'] = tuple(params['hit_latencies'])
+        return cls(**params)
+
+    @classmethod
+    def from_file(cls, filepath):
+        """Load timing parameters from a JSON file"""
+        with open(filepath, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+    def hit_latency(self, level):
+        """Cycles to look up a block at the given level (levels past the table reuse the last entry)"""
+        index = min(max(level, 1), len(self.hit_latencies)) - 1
+        return self.hit_latencies[index]
+
+    def transfer_cycles(self, block_size):
+        """Cycles needed to move one block over the bus"""
+        return max(1, block_size // 4) * self.cycles_per_word
+
+    def memory_penalty(self, block_size):
+        """Cycles to refill a block from main memory"""
+        return self.memory_latency + self.transfer_cycles(block_size)
+
+    def writeback_penalty(self, block_size, to_memory):
+        """Cycles to write a dirty block to the next level or main memory"""
+        penalty = self.writeback_latency + self.transfer_cycles(block_size)
+        if to_memory:
+            penalty += self.memory_latency
+        return penalty
+
+    def to_dict(self):
+        """Return the parameters as a JSON-serializable dict"""
+        return {
+            'hit_latencies': list(self.hit_latencies),
+            'memory_latency': self.memory_latency,
+            'cycles_per_word': self.cycles_per_word,
+            'writeback_latency': self.writeback_latency,
+            'execute_cycles': self.execute_cycles,
+            'branch_penalty': self.branch_penalty,
+            'btb_miss_penalty': self.btb_miss_penalty
+        }
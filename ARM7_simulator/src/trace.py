@@ -0,0 +1,245 @@
+# trace.py - Trace-driven front end: stream memory traces from disk into the cache hierarchy
+
+import argparse
+import gzip
+import json
+import lzma
+import os
+import struct
+import sys
+
+import memory_hierarchy as hierarchy_module
+from memory_hierarchy import init_memory_hierarchy, load_topology
+from timing import TimingModel
+from sweep import DEFAULT_SWEEP, load_sweep_spec, expand_sweep, config_name, hierarchy_arguments
+
+# Access kinds, numbered like Dinero labels
+READ = 0
+WRITE = 1
+IFETCH = 2
+
+# Compact binary format: magic header, then one little-endian (kind, address) record per access
+BINARY_MAGIC = b"ARMTRC1\n"
+BINARY_RECORD = struct.Struct("<BI")
+RECORDS_PER_CHUNK = 4096
+
+
+def open_trace(filepath, mode='rb'):
+    """Open a trace file, decompressing .gz and .xz files on the fly"""
+    if filepath.endswith('.gz'):
+        return gzip.open(filepath, mode)
+    if filepath.endswith('.xz'):
+        return lzma.open(filepath, mode)
+    return open(filepath, mode)
+
+
+def detect_format(filepath):
+    """Return 'bin' if the file starts with the binary trace header, otherwise 'din'"""
+    with open_trace(filepath) as f:
+        return 'bin' if f.read(len(BINARY_MAGIC)) == BINARY_MAGIC else 'din'
+
+
+def read_din(f):
+    """Yield (kind, address) from a Dinero 'din' trace: '<label> <hex address> [size]' per line
+
+    Labels 0/1/2 are data reads, data writes and instruction fetches; escape (3) and
+    flush (4) records and blank or comment lines are skipped.
+    """
+    for line_number, line in enumerate(f, start=1):
+        fields = line.split()
+        if not fields or fields[0].startswith(b'#'):
+            continue
+        try:
+            kind = int(fields[0])
+            if kind > IFETCH:
+                continue
+            address = int(fields[1], 16) & 0xFFFFFFFF
+        except (ValueError, IndexError):
+            raise ValueError(f"Malformed din record on line {line_number}: {line.strip()!r}")
+        yield kind, address
+
+
+def read_binary(f):
+    """Yield (kind, address) from a compact binary trace, reading fixed-size chunks"""
+    if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise ValueError("Not a binary trace (bad header)")
+    chunk_size = BINARY_RECORD.size * RECORDS_PER_CHUNK
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        usable = len(chunk) - len(chunk) % BINARY_RECORD.size
+        yield from BINARY_RECORD.iter_unpack(chunk[:usable])
+        if usable != len(chunk):
+            raise ValueError("Binary trace ends with a truncated record")
+
+
+def stream_trace(filepath, trace_format='auto', limit=None):
+    """Yield (kind, address) records from a trace file without loading it into memory"""
+    if trace_format == 'auto':
+        trace_format = detect_format(filepath)
+    reader = read_binary if trace_format == 'bin' else read_din
+    with open_trace(filepath) as f:
+        for count, record in enumerate(reader(f)):
+            if limit is not None and count >= limit:
+                return
+            yield record
+
+
+def write_binary_trace(records, filepath):
+    """Write (kind, address) records in the compact binary format, returns the record count"""
+    count = 0
+    with open_trace(filepath, 'wb') as f:
+        f.write(BINARY_MAGIC)
+        buffer = bytearray()
+        for kind, address in records:
+            buffer += BINARY_RECORD.pack(kind, address)
+            count += 1
+            if len(buffer) >= BINARY_RECORD.size * RECORDS_PER_CHUNK:
+                f.write(buffer)
+                buffer.clear()
+        f.write(buffer)
+    return count
+
+
+def replay(records, hierarchy):
+    """Feed trace records into a memory hierarchy, returns the number of records replayed"""
+    count = 0
+    for kind, address in records:
+        if kind == IFETCH:
+            hierarchy.read_instruction(address)
+            hierarchy.charge_instruction()
+        elif kind == WRITE:
+            hierarchy.write_data(address, 0)
+        else:
+            hierarchy.read_data(address)
+        count += 1
+    return count
+
+
+def run_trace(trace_file, trace_format='auto', limit=None, timing=None, **hierarchy_args):
+    """Replay a trace through a freshly built hierarchy, returns (records replayed, stats) or None"""
+    if not init_memory_hierarchy(timing=timing, **hierarchy_args):
+        return None
+    hierarchy = hierarchy_module.memory_hierarchy
+    count = replay(stream_trace(trace_file, trace_format, limit), hierarchy)
+    hierarchy.drain_write_buffers()
+    return count, hierarchy.get_total_stats()
+
+
+def run_trace_experiments(trace_file, trace_format='auto', limit=None, timing=None, sweep_file=None, rank_by='cost'):
+    """Replay a trace under every configuration of a sweep, streaming the trace once per configuration"""
+    axes = load_sweep_spec(sweep_file)[0] if sweep_file else dict(DEFAULT_SWEEP)
+    configurations, skipped = expand_sweep(axes)
+    from main import RANK_METRICS
+    metric = RANK_METRICS[rank_by]
+
+    print(f"\n{'='*80}")
+    print(f"TRACE-DRIVEN CACHE EXPERIMENTS FOR {trace_file}")
+    print(f"Testing {len(configurations)} different configurations ({skipped} invalid points skipped)")
+    print(f"{'='*80}")
+
+    results = []
+    for i, config in enumerate(configurations):
+        print(f"\nConfiguration {i+1}/{len(configurations)}: {config_name(config)}")
+        try:
+            outcome = run_trace(trace_file, trace_format, limit, timing, **hierarchy_arguments(config))
+        except (OSError, ValueError, EOFError, lzma.LZMAError) as e:
+            print(f"Error replaying trace: {str(e)}")
+            return 1
+        if outcome is None:
+            print("✗ Configuration failed")
+            continue
+        count, stats = outcome
+        result = dict(config)
+        result.update({
+            'config_id': i+1,
+            'config': config_name(config),
+            'records': count,
+            'cache_stats': {name: {key: cache[key] for key in ('hits', 'misses', 'writebacks', 'hit_rate', 'compulsory_misses',
+                                                               'capacity_misses', 'conflict_misses')}
+                            for name, cache in stats['caches'].items()},
+            'cost': stats['cost'],
+            'total_cycles': stats['total_cycles'],
+            'amat': stats['amat'],
+            'dram_stats': stats['dram'],
+            'energy': stats['energy']
+        })
+        results.append(result)
+        print(f"Records replayed: {count}")
+        print(f"Cost: {stats['cost']:.2f}")
+        print(f"Cycles: {stats['total_cycles']} (AMAT: {stats['amat']:.3f})")
+
+    best = min(results, key=metric) if results else None
+    output_file = f"cache_results_{os.path.basename(trace_file).split('.')[0]}.json"
+    try:
+        with open(output_file, 'w') as f:
+            json.dump({
+                'trace_file': trace_file,
+                'total_configurations_tested': len(results),
+                'sweep': axes,
+                'configurations': results,
+                'rank_by': rank_by,
+                'best_configuration': best
+            }, f, indent=2)
+        print(f"\nResults saved to {output_file}")
+    except Exception as e:
+        print(f"Error saving results: {str(e)}")
+
+    if best is not None:
+        print(f"\nBEST CONFIGURATION (by {rank_by}): {best['config']}")
+        print(f"Cost: {best['cost']:.2f}, Cycles: {best['total_cycles']}")
+    else:
+        print("No valid configurations found!")
+    return 0
+
+
+def parse_arguments(argv):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Replay a memory trace through the cache hierarchy")
+    parser.add_argument('trace_file', help="Trace file (din text or binary, optionally .gz/.xz compressed)")
+    parser.add_argument('--format', choices=('auto', 'din', 'bin'), default='auto', help="Trace format")
+    parser.add_argument('--limit', type=int, metavar='N', help="Replay at most N records")
+    parser.add_argument('--timing', metavar='FILE', help="JSON file with timing model parameters")
+    parser.add_argument('--hierarchy', metavar='FILE', help="JSON/TOML file describing the cache levels")
+    parser.add_argument('--experiments', action='store_true', help="Replay the trace under every sweep configuration")
+    parser.add_argument('--sweep', metavar='FILE', help="JSON/TOML file describing the experiment design space")
+    parser.add_argument('--rank-by', choices=('cost', 'cycles'), default='cost',
+                        help="Metric used to pick the best experiment configuration")
+    parser.add_argument('--convert', metavar='OUT', help="Write the trace in the binary format (.gz/.xz to compress) and exit")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_arguments(sys.argv[1:])
+    if not os.path.exists(args.trace_file):
+        print(f"Error: Trace file '{args.trace_file}' not found!")
+        return 1
+
+    try:
+        if args.convert:
+            count = write_binary_trace(stream_trace(args.trace_file, args.format, args.limit), args.convert)
+            print(f"Wrote {count} records to {args.convert}")
+            return 0
+
+        timing = TimingModel.from_file(args.timing) if args.timing else None
+        if args.experiments:
+            return run_trace_experiments(args.trace_file, args.format, args.limit, timing, args.sweep, args.rank_by)
+
+        levels = load_topology(args.hierarchy) if args.hierarchy else None
+        outcome = run_trace(args.trace_file, args.format, args.limit, timing, levels=levels)
+    except (OSError, ValueError, TypeError, EOFError, lzma.LZMAError) as e:
+        print(f"Error: {str(e)}")
+        return 1
+
+    if outcome is None:
+        print("Failed to initialize memory hierarchy")
+        return 1
+    count, stats = outcome
+    print(f"\nReplayed {count} trace records")
+    hierarchy_module.memory_hierarchy.print_stats()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# write_buffer.py - Coalescing write buffer between a cache and the next level
+
+from collections import OrderedDict
+
+
+class WriteBuffer:
+    """FIFO of pending block writes; stores to a block already in the buffer are merged.
+
+    The buffer drains one entry in the background every drain_interval accesses of
+    the owning cache. When a write needs a new entry and the buffer is full, the
+    cache stalls while the oldest entry is drained.
+    """
+
+    def __init__(self, depth, drain_interval=4):
+        if depth <= 0:
+            raise ValueError(f"Write buffer depth must be positive: {depth}")
+        if drain_interval <= 0:
+            raise ValueError(f"Write buffer drain interval must be positive: {drain_interval}")
+        self.depth = depth
+        self.drain_interval = drain_interval
+        self.owner = None  # Cache whose writes are buffered
+        self.entries = OrderedDict()  # block address -> {word address: data}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.writes = 0
+        self.coalesced = 0
+        self.stalls = 0
+        self.stall_cycles = 0
+        self.drained_entries = 0
+        self.max_occupancy = 0
+        self.ticks = 0
+
+    def block_address(self, address):
+        return address & ~(self.owner.block_size - 1)
+
+    def add(self, address, data):
+        """Buffer one word destined for the next level, returns stall cycles incurred.
+
+        The stall cycles are those the drained entry took at the levels below, already
+        charged there; they are returned for reporting only.
+        """
+        self.writes += 1
+        block_address = self.block_address(address)
+        stall = 0
+        if block_address in self.entries:
+            self.coalesced += 1
+        elif len(self.entries) >= self.depth:
+            # Buffer full: the core waits for the oldest entry to reach the next level
+            self.stalls += 1
+            stall = self.drain_oldest()
+            self.stall_cycles += stall
+        self.entries.setdefault(block_address, {})[address] = data
+        self.max_occupancy = max(self.max_occupancy, len(self.entries))
+        return stall
+
+    def tick(self):
+        """Advance background draining by one access of the owning cache"""
+        self.ticks += 1
+        if self.entries and self.ticks % self.drain_interval == 0:
+            # Background drains overlap with execution
+            self.owner.background_cycles += self.drain_oldest()
+
+    def drain_oldest(self):
+        """Send the oldest entry to the next level, returns the cycles it took there"""
+        block_address, words = self.entries.popitem(last=False)
+        return self.drain_words(words)
+
+    def drain_block(self, address):
+        """Drain any pending entry for the block containing address (before it is read)"""
+        words = self.entries.pop(self.block_address(address), None)
+        if words is not None:
+            self.drain_words(words)
+
+    def drain_words(self, words):
+        """Write one entry's words to the next level, returns the cycles it took at every level below"""
+        next_level = self.owner.next_level
+        before = next_level.chain_cycles() if next_level is not None else 0
+        for word_address, data in words.items():
+            self.owner.write_word_to_next_level(word_address, data)
+        self.drained_entries += 1
+        return (next_level.chain_cycles() - before) if next_level is not None else 0
+
+    def flush(self):
+        """Drain every pending entry at the end of a run; the drains overlap with nothing the core waits for"""
+        while self.entries:
+            self.owner.background_cycles += self.drain_oldest()
+
+    def get_stats(self):
+        return {
+            'depth': self.depth,
+            'writes': self.writes,
+            'coalesced': self.coalesced,
+            'stalls': self.stalls,
+            'stall_cycles': self.stall_cycles,
+            'drained_entries': self.drained_entries,
+            'max_occupancy': self.max_occupancy,
+            'pending': len(self.entries)
+        }